@@ -0,0 +1,176 @@
+import argparse
+import random
+import time
+from collections.abc import Callable
+from datetime import date
+
+from dataclasses import replace
+
+from postpwn.planner import PlanRequest, solve, solve_incremental, tune_granularity
+from postpwn.solvers import PlanItem, solve_day
+
+
+def build_request(
+    count: int, capacity: int, limits: tuple[int, ...], seed: int = 0
+) -> PlanRequest:
+    rng = random.Random(seed)
+    start = date(2025, 1, 5).toordinal()
+    items = [
+        PlanItem(
+            str(index),
+            rng.randint(1, max(capacity // 3, 1)),
+            rng.randint(1, 4),
+            start - rng.randint(0, 30),
+            rng.randint(-1, len(limits) - 1),
+        )
+        for index in range(count)
+    ]
+
+    return PlanRequest.from_items(items, (capacity,) * 7, start, limits)
+
+
+def bench_limits(sizes: list[int], capacities: list[int], budget: float) -> None:
+    print(
+        f"{'tasks':>7} {'capacity':>9} {'limits':>8} {'days':>6} {'seconds':>9}  budget"
+    )
+    for count in sizes:
+        for capacity in capacities:
+            for limits in [(), (4,), (4, 2)]:
+                request = build_request(count, capacity, limits)
+
+                started = time.perf_counter()
+                plan = solve(request)
+                elapsed = time.perf_counter() - started
+
+                days = len(set(plan.values()))
+                status = "ok" if elapsed <= budget else "OVER"
+                print(
+                    f"{count:>7} {capacity:>9} {len(limits):>8} {days:>6} {elapsed:>9.3f}  {status}"
+                )
+
+
+def plan_delay(request: PlanRequest, plan: dict[str, int]) -> int:
+    # Every day a task waits costs its value, so a plan that gets valuable
+    # tasks done sooner scores lower
+    return sum(
+        value * (plan[id] - request.start + 1)
+        for id, value in zip(request.ids, request.values)
+        if id in plan
+    )
+
+
+def bench_quality(sizes: list[int], capacities: list[int]) -> None:
+    # Each day packs as much value as it can, so compare the first day's value
+    # and the whole plan's value-weighted delay against the exact solver
+    print(
+        f"{'tasks':>7} {'capacity':>9} {'strategy':>9} {'seconds':>9} {'day one':>8} {'delay':>9} {'quality':>8}"
+    )
+    for count in sizes:
+        for capacity in capacities:
+            request = build_request(count, capacity, ())
+            items = tune_granularity(request).items()
+            day_capacity = tune_granularity(request).capacities[0]
+
+            exact_delay = 0
+            for strategy in ("exact", "greedy", "auto"):
+                started = time.perf_counter()
+                plan = solve(replace(request, strategy=strategy))
+                elapsed = time.perf_counter() - started
+
+                batch = solve_day(day_capacity, items, strategy=strategy)
+                value = sum(item.value for item in batch)
+                delay = plan_delay(request, plan)
+                exact_delay = exact_delay or delay
+                print(
+                    f"{count:>7} {capacity:>9} {strategy:>9} {elapsed:>9.3f} {value:>8} {delay:>9} {exact_delay / delay:>8.1%}"
+                )
+
+
+def bench_incremental(sizes: list[int], capacities: list[int]) -> None:
+    # A single completed task between runs. Completing the task due last is
+    # the best case for reusing days, and completing one due first, without
+    # minimize_churn, re-solves every day
+    print(
+        f"{'tasks':>7} {'capacity':>9} {'completed':>10} {'full':>9} {'delta':>9} {'speedup':>8}"
+    )
+    for count in sizes:
+        for capacity in capacities:
+            for completed, minimize_churn, pick in (
+                ("last", True, max),
+                ("first", False, min),
+            ):
+                bench_completion(count, capacity, completed, minimize_churn, pick)
+
+
+def bench_completion(
+    count: int,
+    capacity: int,
+    completed: str,
+    minimize_churn: bool,
+    pick: Callable[..., PlanItem],
+) -> None:
+    request = build_request(count, capacity, ())
+    request = replace(
+        request,
+        dues=tuple(due + 15 for due in request.dues),
+        minimize_churn=minimize_churn,
+    )
+    _, table = solve_incremental(request)
+
+    done = pick(request.items(), key=lambda item: (item.due, item.id))
+    smaller = replace(
+        PlanRequest.from_items(
+            [item for item in request.items() if item != done],
+            request.capacities,
+            request.start,
+        ),
+        minimize_churn=minimize_churn,
+    )
+
+    started = time.perf_counter()
+    _ = solve(smaller)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _ = solve_incremental(smaller, table)
+    delta = time.perf_counter() - started
+
+    print(
+        f"{count:>7} {capacity:>9} {completed:>10} {full:>9.3f} {delta:>9.3f} {full / delta:>7.1f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the planner against a cron time budget."
+    )
+    _ = parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    _ = parser.add_argument("--capacities", type=int, nargs="+", default=[10, 50])
+    _ = parser.add_argument(
+        "--budget", type=float, default=60, help="Seconds available per cron tick"
+    )
+    _ = parser.add_argument(
+        "--quality",
+        action="store_true",
+        help="Compare greedy packing against the exact solver",
+    )
+    _ = parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Compare re-solving after a one task change against a full solve",
+    )
+    args = parser.parse_args()
+
+    if args.incremental:
+        bench_incremental(args.sizes, args.capacities)
+        return
+
+    if args.quality:
+        bench_quality(args.sizes, args.capacities)
+        return
+
+    bench_limits(args.sizes, args.capacities, args.budget)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import logging
 from .cli import cli
+from .log import TEXT_FORMAT
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s %(name)s [%(levelname)s]: %(message)s"
-)
+logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT)
 
 
 def main() -> None:
@@ -51,6 +51,17 @@ logger.setLevel(logging.INFO)
 
 
 class TodoistAPIProtocol(Protocol):
+    async def get_tasks(
+        self,
+        *,
+        project_id: str | None = None,
+        section_id: str | None = None,
+        parent_id: str | None = None,
+        label: str | None = None,
+        ids: list[str] | None = None,
+        limit: Annotated[int, Ge(1), Le(200)] | None = None,
+    ) -> AsyncGenerator[list[Task], None]: ...
+
     async def filter_tasks(
         self,
         *,
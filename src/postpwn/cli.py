@@ -1,33 +1,60 @@
 import asyncio
 import logging
 import os
-import re
 from asyncio import AbstractEventLoop
+from contextlib import nullcontext
 from datetime import date, datetime
-from typing import TypedDict, Unpack
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, TypedDict, Unpack
 from zoneinfo import ZoneInfo
 
 import click
-from apscheduler.schedulers.asyncio import (  # pyright: ignore[reportMissingTypeStubs]
-    AsyncIOScheduler,
-)
-from apscheduler.triggers.cron import (  # pyright: ignore[reportMissingTypeStubs]
-    CronTrigger,
-)
 from dotenv import load_dotenv
-from pydantic import ValidationError
 from todoist_api_python.api_async import TodoistAPIAsync
 
 from postpwn.api import TodoistAPIProtocol
-from postpwn.rescheduler import reschedule
-from postpwn.types import Rule, ScheduleConfig, WeightConfig
-from postpwn.validation import CRON_SCHEDULE_REGEX
+from postpwn.config import ConfigWatcher, load_config
+from postpwn.cron import CronRunner, CronSchedule, CronSyntaxError, SchedulerKind
+from postpwn.health import HealthServer, RunMonitor
+from postpwn.history import RunHistory, format_runs
+from postpwn.log import LogFormat, configure_logging
+from postpwn.plan_cache import PlanCache
+from postpwn.planner import Planner, make_executor
+from postpwn.rescheduler import combine_rulesets, fetch_tasks, reschedule
+from postpwn.retry import RetryPolicy
+from postpwn.sharding import ShardCoordinator, lease_seconds
+from postpwn.simulate import format_outcomes, parse_weight, scenarios, simulate
+from postpwn.snapshot import Snapshot, SnapshotAPI, take_snapshot
+from postpwn.solvers import Strategy
+from postpwn.types import (
+    DurationWeights,
+    Rule,
+    Ruleset,
+    WeightConfig,
+    WorkingHours,
+)
+from postpwn.webhooks import (
+    DEBOUNCE_SECONDS,
+    Debouncer,
+    TaskBacklog,
+    WebhookReceiver,
+    server_filters,
+)
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import (  # pyright: ignore[reportMissingTypeStubs]
+        AsyncIOScheduler,
+    )
 
 _ = load_dotenv()
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Assignee terms need the current user, so this filter is always evaluated by
+# the server
+DEFAULT_FILTER = "!assigned to:others & !no date & !recurring & no deadline"
+
 
 class RescheduleParams(TypedDict):
     filter: str
@@ -36,6 +63,83 @@ class RescheduleParams(TypedDict):
     token: str | None
     time_zone: str
     schedule: str | None
+    workers: int | None
+    solve_timeout: float | None
+    plan_cache: str | None
+    solver: Strategy
+    history: str | None
+    minimize_churn: bool
+    meet_deadlines: bool
+    group_subtasks: bool
+    verify_incremental: bool
+    memory_budget: int | None
+    health_port: int | None
+    shards: int | None
+    lease_db: str | None
+    replica_id: str | None
+    log_format: LogFormat
+    log_level: str
+    log_sample: float
+    replay: str | None
+    local_filters: bool
+    webhook_port: int | None
+    webhook_secret: str | None
+    debounce: float
+    scheduler: SchedulerKind
+
+
+def make_job(
+    api: TodoistAPIProtocol,
+    max_weight: WeightConfig | int,
+    filter: str,
+    rules: list[Rule] | None,
+    dry_run: bool,
+    time_zone: str,
+    curr_date: date | None = None,
+    rulesets: list[Ruleset] | None = None,
+    planner: Planner | None = None,
+    duration_weights: DurationWeights | None = None,
+    history: RunHistory | None = None,
+    monitor: RunMonitor | None = None,
+    watcher: ConfigWatcher | None = None,
+    shards: ShardCoordinator | None = None,
+    local_filters: bool = False,
+    working_hours: WorkingHours | None = None,
+    group_subtasks: bool = False,
+) -> Callable[[], Awaitable[None]]:
+    async def reschedule_job():
+        nonlocal max_weight, rules, rulesets, duration_weights, working_hours
+        # Pick up rules file changes between runs, keeping the planner's
+        # caches and the API client warm
+        if watcher is not None:
+            config = watcher.refresh()
+            max_weight = config.max_weight
+            rules = config.rules
+            rulesets = config.rulesets
+            duration_weights = config.duration_weights
+            working_hours = config.working_hours
+
+        with monitor.watch() if monitor else nullcontext() as stats:
+            await reschedule(
+                api=api,
+                max_weight=max_weight,
+                curr_date=curr_date,
+                time_zone=time_zone,
+                rules=rules,
+                filter=filter,
+                dry_run=dry_run,
+                rulesets=rulesets,
+                planner=planner,
+                duration_weights=duration_weights,
+                history=history,
+                stats=stats,
+                shards=shards,
+                local_filters=local_filters,
+                working_hours=working_hours,
+                group_subtasks=group_subtasks,
+            )
+
+    return reschedule_job
 
 
 async def run_schedule(
@@ -47,40 +151,137 @@ async def run_schedule(
     time_zone: str,
     schedule: str,
     curr_date: date | None = None,
-) -> AsyncIOScheduler:
+    rulesets: list[Ruleset] | None = None,
+    planner: Planner | None = None,
+    duration_weights: DurationWeights | None = None,
+    history: RunHistory | None = None,
+    monitor: RunMonitor | None = None,
+    watcher: ConfigWatcher | None = None,
+    shards: ShardCoordinator | None = None,
+    local_filters: bool = False,
+    backlog: TaskBacklog | None = None,
+    scheduler: SchedulerKind = "apscheduler",
+    working_hours: WorkingHours | None = None,
+    group_subtasks: bool = False,
+    lock: asyncio.Lock | None = None,
+) -> "AsyncIOScheduler | CronRunner":
     logger.info(f"Running on schedule: {schedule}")
-    scheduler = AsyncIOScheduler()
+    cron = CronSchedule.parse(schedule)
+    lock = lock or asyncio.Lock()
 
-    async def reschedule_job():
-        await reschedule(
-            api=api,
-            max_weight=max_weight,
-            curr_date=curr_date,
-            time_zone=time_zone,
-            rules=rules,
-            filter=filter,
-            dry_run=dry_run,
-        )
+    reschedule_job = make_job(
+        backlog or api,
+        max_weight,
+        filter,
+        rules,
+        dry_run,
+        time_zone,
+        curr_date,
+        rulesets,
+        planner,
+        duration_weights,
+        history,
+        monitor,
+        watcher,
+        shards,
+        local_filters,
+        working_hours,
+        group_subtasks,
+    )
+
+    async def scheduled_job():
+        async with lock:
+            # Scheduled runs resync the backlog, catching up on any webhook
+            # deliveries that were missed
+            if backlog is not None:
+                await backlog.load()
+            await reschedule_job()
+
+    if scheduler == "native":
+        runner = CronRunner(cron, time_zone, scheduled_job)
+        if monitor is not None:
+            monitor.next_run = lambda: runner.next_run_time
+        runner.start()
+        return runner
+
+    # Only imported when used, the native loop runs without it
+    from apscheduler.schedulers.asyncio import (  # pyright: ignore[reportMissingTypeStubs]
+        AsyncIOScheduler,
+    )
+    from apscheduler.triggers.combining import (  # pyright: ignore[reportMissingTypeStubs]
+        OrTrigger,
+    )
+    from apscheduler.triggers.cron import (  # pyright: ignore[reportMissingTypeStubs]
+        CronTrigger,
+    )
 
-    _ = scheduler.add_job(  # pyright: ignore[reportUnknownMemberType]
-        reschedule_job,
-        CronTrigger.from_crontab(  # pyright: ignore[reportUnknownMemberType]
-            schedule, timezone=ZoneInfo(time_zone)
-        ),
+    # Built from the parsed schedule rather than the raw text, so both
+    # schedulers run the same validated crontab schedule
+    triggers = [
+        CronTrigger(**fields, timezone=ZoneInfo(time_zone))
+        for fields in cron.trigger_fields()
+    ]
+    apscheduler = AsyncIOScheduler()
+    job = apscheduler.add_job(  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+        scheduled_job,
+        triggers[0] if len(triggers) == 1 else OrTrigger(triggers),
     )
+    if monitor is not None:
+        monitor.next_run = lambda: job.next_run_time  # pyright: ignore[reportUnknownMemberType, reportUnknownLambdaType]
+
+    apscheduler.start()
+
+    return apscheduler
+
+
+async def run_webhooks(
+    backlog: TaskBacklog,
+    job: Callable[[], Awaitable[None]],
+    secret: str,
+    port: int,
+    debounce: float = DEBOUNCE_SECONDS,
+    lock: asyncio.Lock | None = None,
+    filters: list[str] | None = None,
+) -> tuple[WebhookReceiver, Debouncer]:
+    lock = lock or asyncio.Lock()
 
-    scheduler.start()
+    # Only filters the backlog can evaluate are planned from memory, the
+    # rest are queried from the server on every event-driven run
+    for filter in server_filters(filters or []):
+        logger.warning(
+            f"'{filter}' can't be evaluated locally, so event-driven runs query the server for it"
+        )
+
+    # Shared with scheduled runs, which reload the backlog this run plans from
+    async def locked_job() -> None:
+        async with lock:
+            await job()
+
+    debouncer = Debouncer(locked_job, debounce)
 
-    return scheduler
+    def on_event(event_name: str, event_data: dict[str, Any]) -> None:
+        if backlog.apply(event_name, event_data):
+            logger.debug("Backlog changed by %s, planning soon", event_name)
+            debouncer.trigger()
 
+    async with lock:
+        await backlog.load()
+    receiver = WebhookReceiver(secret, on_event, port)
+    await receiver.start()
 
-@click.command(
-    help="Optimally reschedules your tasks according to your filters and rules."
+    # Plan once up front, later runs only follow changes to the backlog
+    debouncer.trigger()
+    return receiver, debouncer
+
+
+@click.group(
+    help="Optimally reschedules your tasks according to your filters and rules.",
+    invoke_without_command=True,
 )
 @click.option(
     "--filter",
     help="Todoist filter to select tasks to reschedule.",
-    default="!assigned to:others & !no date & !recurring & no deadline",
+    default=DEFAULT_FILTER,
     show_default=True,
     type=str,
 )
@@ -117,16 +318,284 @@ async def run_schedule(
     default=None,
     type=str,
 )
-def cli(**kwargs: Unpack[RescheduleParams]) -> None:
+@click.option(
+    "--scheduler",
+    help="What runs --schedule: a built-in cron loop, or APScheduler.",
+    default="apscheduler",
+    show_default=True,
+    type=click.Choice(["native", "apscheduler"]),
+)
+@click.option(
+    "--workers",
+    help="Worker processes used to plan independent rulesets in parallel. Defaults to the number of CPUs.",
+    default=None,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--solve-timeout",
+    help="Seconds to allow for planning before the run is aborted.",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option(
+    "--plan-cache",
+    help="Directory for persisting solved plans between runs.",
+    default=None,
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--solver",
+    help="Daily planning strategy. 'auto' solves exactly while the backlog is small enough and approximates beyond that.",
+    default="auto",
+    show_default=True,
+    type=click.Choice(["auto", "exact", "greedy"]),
+)
+@click.option(
+    "--minimize-churn",
+    help="Leave tasks already on future days in place unless their day is over capacity.",
+    default=False,
+    show_default=True,
+    is_flag=True,
+    type=bool,
+)
+@click.option(
+    "--meet-deadlines",
+    help="Plan tasks with a deadline on or before it, ahead of other tasks once they can't wait any longer.",
+    default=False,
+    show_default=True,
+    is_flag=True,
+    type=bool,
+)
+@click.option(
+    "--group-subtasks",
+    help="Plan each task together with its subtasks, moving them all to the same day.",
+    default=False,
+    show_default=True,
+    is_flag=True,
+    type=bool,
+)
+@click.option(
+    "--verify-incremental",
+    help="Check every plan reusing days from the last run against a full solve.",
+    default=False,
+    show_default=True,
+    is_flag=True,
+    type=bool,
+)
+@click.option(
+    "--memory-budget",
+    help="MiB a run may use. Days whose solver tables wouldn't fit are solved approximately, and each run's peak usage is recorded.",
+    default=None,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--health-port",
+    help="Port to serve /healthz and /readyz on while running on a schedule.",
+    default=None,
+    type=click.IntRange(min=0, max=65535),
+)
+@click.option(
+    "--webhook-port",
+    help="Port to receive Todoist webhooks on, planning as soon as tasks change instead of only on a schedule.",
+    default=None,
+    type=click.IntRange(min=0, max=65535),
+)
+@click.option(
+    "--webhook-secret",
+    help="Client secret of the Todoist app, used to verify webhooks. Fetched from TODOIST_CLIENT_SECRET.",
+    default=os.getenv("TODOIST_CLIENT_SECRET"),
+    type=str,
+)
+@click.option(
+    "--debounce",
+    help="Seconds without further webhooks to wait for before planning.",
+    default=DEBOUNCE_SECONDS,
+    show_default=True,
+    type=click.FloatRange(min=0),
+)
+@click.option(
+    "--shards",
+    help="Split rulesets into this many shards, each planned by exactly one replica sharing --lease-db.",
+    default=None,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--lease-db",
+    help="Path to a SQLite database shared by replicas to lease shards.",
+    default=None,
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--replica-id",
+    help="Stable name of this replica when sharding, so a restart keeps its leases. Defaults to the host name, so set it when running several replicas on one host.",
+    default=None,
+    type=str,
+)
+@click.option(
+    "--log-format",
+    help="Write logs as plain text or as one JSON object per line.",
+    default="text",
+    show_default=True,
+    type=click.Choice(["text", "json"]),
+)
+@click.option(
+    "--log-level",
+    help="Lowest level to log. Per-task lines are only logged at DEBUG.",
+    default="INFO",
+    show_default=True,
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+)
+@click.option(
+    "--log-sample",
+    help="Fraction of per-task lines to log at INFO, for spot checks of large runs.",
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(min=0, max=1),
+)
+@click.option(
+    "--local-filters",
+    help="Fetch all tasks once and evaluate filters locally, querying the server only for filters it can't evaluate.",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--replay",
+    help="Plan the tasks recorded in a snapshot instead of fetching them, as a dry run.",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--history",
+    help="Path to a SQLite database recording stats for every run.",
+    default=None,
+    type=click.Path(dir_okay=False),
+)
+@click.pass_context
+def cli(ctx: click.Context, **kwargs: Unpack[RescheduleParams]) -> None:
+    configure_logging(
+        kwargs["log_format"], kwargs["log_level"].upper(), kwargs["log_sample"]
+    )
     logger.debug(kwargs)
 
-    api = TodoistAPIAsync(kwargs["token"] if kwargs["token"] else "")
+    if ctx.invoked_subcommand is not None:
+        ctx.obj = kwargs
+        return
+
     loop = asyncio.get_event_loop()
 
+    if kwargs["replay"]:
+        # Plan the recorded backlog as of the day it was recorded, so
+        # replays are reproducible. Nothing is sent, so a replay is a dry run
+        # and never marks the backlog as applied in the plan cache or history
+        kwargs["dry_run"] = True
+        snapshot = Snapshot(kwargs["replay"])
+        return postpwn(SnapshotAPI(snapshot), loop, snapshot.taken_on, **kwargs)
+
+    api = TodoistAPIAsync(kwargs["token"] if kwargs["token"] else "")
     curr_date = datetime.now(tz=ZoneInfo(kwargs["time_zone"])).date()
     return postpwn(api, loop, curr_date, **kwargs)
 
 
+@cli.command("history", help="Show stats for recent runs recorded with --history.")
+@click.option(
+    "--limit",
+    help="Number of recent runs to show.",
+    default=20,
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.pass_obj
+def show_history(params: RescheduleParams, limit: int) -> None:
+    if not params["history"]:
+        raise click.UsageError("--history is required to show the run history.")
+
+    click.echo(format_runs(RunHistory(params["history"]).recent(limit)))
+
+
+@cli.command(
+    "snapshot", help="Record the tasks matching every filter to replay with --replay."
+)
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.pass_obj
+def record_snapshot(params: RescheduleParams, output: str) -> None:
+    config = load_config(params["rules"])
+    filters = [params["filter"], *(ruleset.filter for ruleset in config.rulesets)]
+
+    api = TodoistAPIAsync(params["token"] if params["token"] else "")
+    taken_on = datetime.now(tz=ZoneInfo(params["time_zone"])).date()
+    asyncio.run(take_snapshot(api, filters, output, taken_on))
+
+
+@cli.command(
+    "simulate",
+    help="Plan the backlog under a grid of capacities and rule weights without changing any tasks.",
+)
+@click.option(
+    "--capacity-scale",
+    help="Multiply every day's capacity by this factor. Repeat to try several.",
+    multiple=True,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option(
+    "--weight",
+    help="Try a rule with other weights, as FILTER=WEIGHT[,WEIGHT...]. Repeat for more rules.",
+    multiple=True,
+    type=str,
+)
+@click.pass_obj
+def run_simulation(
+    params: RescheduleParams, capacity_scale: tuple[float, ...], weight: tuple[str, ...]
+) -> None:
+    try:
+        weights = dict(parse_weight(option) for option in weight)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--weight") from e
+
+    config = load_config(params["rules"])
+    rulesets = combine_rulesets(
+        params["filter"],
+        config.max_weight,
+        config.rules,
+        config.duration_weights,
+        config.rulesets,
+    )
+
+    if params["replay"]:
+        snapshot = Snapshot(params["replay"])
+        api: TodoistAPIProtocol = SnapshotAPI(snapshot)
+        today = snapshot.taken_on
+    else:
+        api = TodoistAPIAsync(params["token"] if params["token"] else "")
+        today = datetime.now(tz=ZoneInfo(params["time_zone"])).date()
+
+    # Fetched once, every scenario is planned from the same backlog
+    ruleset_tasks = asyncio.run(
+        fetch_tasks(api, rulesets, today, RetryPolicy(), params["local_filters"])
+    )
+
+    executor = make_executor(params["workers"]) if params["workers"] != 1 else None
+    try:
+        outcomes = simulate(
+            rulesets,
+            ruleset_tasks,
+            today,
+            scenarios(list(capacity_scale), weights),
+            executor,
+            params["solver"],
+            params["minimize_churn"],
+            params["meet_deadlines"],
+            params["group_subtasks"],
+            params["memory_budget"] * 2**20
+            if params["memory_budget"] is not None
+            else None,
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    click.echo(format_outcomes(outcomes))
+
+
 def postpwn(
     api: TodoistAPIProtocol,
     loop: AbstractEventLoop,
@@ -135,67 +604,171 @@ def postpwn(
 ) -> None:
     today = curr_date.date() if isinstance(curr_date, datetime) else curr_date
 
-    if kwargs["rules"] and os.path.exists(kwargs["rules"]):
-        logger.info(f"Loading rules from {kwargs['rules']}")
-        try:
-            with open(kwargs["rules"]) as f:
-                schedule_config = ScheduleConfig.model_validate_json(f.read())
-                max_weight = schedule_config.max_weight
-                rules = schedule_config.rules
-        except ValidationError as e:
-            raise ValueError(
-                f"Invalid rules file '{kwargs['rules']}': {e.error_count()} validation error(s) found.\n{e}"
-            ) from e
-    else:
-        logger.info("No rules provided, using defaults.")
-        max_weight = 10
-        rules = None
-
-    if rules:
-        weight_limit = (
-            max_weight
-            if isinstance(max_weight, int)
-            else max(max_weight.model_dump().values())
+    watcher = ConfigWatcher(kwargs["rules"])
+    max_weight = watcher.config.max_weight
+    rules = watcher.config.rules
+    rulesets = watcher.config.rulesets
+    duration_weights = watcher.config.duration_weights
+    working_hours = watcher.config.working_hours
+
+    logger.info(f"Rules: {rules}")
+
+    # Independent rulesets are CPU-bound to plan, so spread them across cores
+    planner = Planner(
+        make_executor(kwargs["workers"])
+        if rulesets and kwargs["workers"] != 1
+        else None,
+        timeout=kwargs["solve_timeout"],
+        cache=PlanCache(kwargs["plan_cache"]),
+        strategy=kwargs["solver"],
+        minimize_churn=kwargs["minimize_churn"],
+        verify=kwargs["verify_incremental"],
+        meet_deadlines=kwargs["meet_deadlines"],
+        memory_budget=kwargs["memory_budget"] * 2**20
+        if kwargs["memory_budget"] is not None
+        else None,
+    )
+    history = RunHistory(kwargs["history"]) if kwargs["history"] else None
+
+    try:
+        cron = CronSchedule.parse(kwargs["schedule"]) if kwargs["schedule"] else None
+    except CronSyntaxError as e:
+        raise ValueError("Invalid cron schedule.") from e
+
+    shards = None
+    if kwargs["shards"] is not None:
+        if not kwargs["lease_db"]:
+            raise ValueError("--lease-db is required when sharding.")
+        shards = ShardCoordinator(
+            kwargs["shards"],
+            kwargs["lease_db"],
+            kwargs["replica_id"],
+            lease_seconds(cron, kwargs["time_zone"]),
         )
 
-        for rule in rules:
-            if (rule.weight or 0) > weight_limit:
-                raise ValueError(
-                    f"Invalid rule config: {rule.filter} exceeds max weight {weight_limit}"
-                )
+    if kwargs["webhook_port"] is not None and not kwargs["webhook_secret"]:
+        raise ValueError("--webhook-secret is required to receive webhooks.")
 
-    logger.info(f"Rules: {rules}")
+    if kwargs["schedule"] or kwargs["webhook_port"] is not None:
+        monitor = None
+        health_server = None
+        if kwargs["health_port"] is not None:
+            monitor = RunMonitor()
+            health_server = HealthServer(monitor, kwargs["health_port"])
+            loop.run_until_complete(health_server.start())
 
-    if kwargs["schedule"]:
-        if not re.match(CRON_SCHEDULE_REGEX, kwargs["schedule"]):
-            raise ValueError("Invalid cron schedule.")
+        backlog = (
+            TaskBacklog(api, kwargs["time_zone"])
+            if kwargs["webhook_port"] is not None
+            else None
+        )
 
-        schedule = loop.run_until_complete(
-            run_schedule(
-                api=api,
-                max_weight=max_weight,
-                rules=rules,
-                filter=kwargs["filter"],
-                dry_run=kwargs["dry_run"],
-                time_zone=kwargs["time_zone"],
-                schedule=kwargs["schedule"],
+        # Scheduled and event-driven runs share the planner, caches and
+        # backlog, so they take turns
+        lock = asyncio.Lock()
+        schedule = None
+        if kwargs["schedule"]:
+            schedule = loop.run_until_complete(
+                run_schedule(
+                    api=api,
+                    max_weight=max_weight,
+                    rules=rules,
+                    filter=kwargs["filter"],
+                    dry_run=kwargs["dry_run"],
+                    time_zone=kwargs["time_zone"],
+                    schedule=kwargs["schedule"],
+                    rulesets=rulesets,
+                    planner=planner,
+                    duration_weights=duration_weights,
+                    history=history,
+                    monitor=monitor,
+                    watcher=watcher,
+                    shards=shards,
+                    local_filters=kwargs["local_filters"],
+                    backlog=backlog,
+                    scheduler=kwargs["scheduler"],
+                    working_hours=working_hours,
+                    group_subtasks=kwargs["group_subtasks"],
+                    lock=lock,
+                )
             )
-        )
+
+        receiver = None
+        if backlog is not None:
+            if monitor is not None:
+                monitor.event_driven = True
+            receiver, _ = loop.run_until_complete(
+                run_webhooks(
+                    backlog,
+                    make_job(
+                        api=backlog,
+                        max_weight=max_weight,
+                        rules=rules,
+                        filter=kwargs["filter"],
+                        dry_run=kwargs["dry_run"],
+                        time_zone=kwargs["time_zone"],
+                        rulesets=rulesets,
+                        planner=planner,
+                        duration_weights=duration_weights,
+                        history=history,
+                        monitor=monitor,
+                        watcher=watcher,
+                        shards=shards,
+                        local_filters=kwargs["local_filters"],
+                        working_hours=working_hours,
+                        group_subtasks=kwargs["group_subtasks"],
+                    ),
+                    kwargs["webhook_secret"] or "",
+                    kwargs["webhook_port"] or 0,
+                    kwargs["debounce"],
+                    lock,
+                    [
+                        kwargs["filter"],
+                        *(ruleset.filter for ruleset in rulesets or []),
+                    ],
+                )
+            )
+
         try:
             loop.run_forever()
         except (KeyboardInterrupt, SystemExit):
-            schedule.shutdown()
+            if schedule is not None:
+                schedule.shutdown()
+            if receiver is not None:
+                loop.run_until_complete(receiver.close())
+            if health_server is not None:
+                loop.run_until_complete(health_server.close())
             loop.close()
+        finally:
+            planner.shutdown()
+            if shards is not None:
+                shards.close()
         return
 
-    loop.run_until_complete(
-        reschedule(
-            api=api,
-            max_weight=max_weight,
-            time_zone=kwargs["time_zone"],
-            curr_date=today,
-            rules=rules,
-            filter=kwargs["filter"],
-            dry_run=kwargs["dry_run"],
+    if kwargs["health_port"] is not None:
+        logger.warning(
+            "--health-port only applies when running on a schedule or from webhooks"
         )
-    )
+
+    try:
+        loop.run_until_complete(
+            reschedule(
+                api=api,
+                max_weight=max_weight,
+                time_zone=kwargs["time_zone"],
+                curr_date=today,
+                rules=rules,
+                filter=kwargs["filter"],
+                dry_run=kwargs["dry_run"],
+                rulesets=rulesets,
+                planner=planner,
+                duration_weights=duration_weights,
+                history=history,
+                shards=shards,
+                local_filters=kwargs["local_filters"],
+                working_hours=working_hours,
+                group_subtasks=kwargs["group_subtasks"],
+            )
+        )
+    finally:
+        planner.shutdown()
@@ -0,0 +1,112 @@
+import logging
+import os
+
+from pydantic import ValidationError
+
+from postpwn.filters import FilterSyntaxError, compile_filter, is_label_rule
+from postpwn.types import Rule, ScheduleConfig, WeightConfig
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def default_config() -> ScheduleConfig:
+    # Without a rules file every task is planned with no weight, which the
+    # validated model can't express since it requires a list of rules
+    return ScheduleConfig.model_construct(
+        max_weight=10,
+        rules=None,
+        duration_weights=None,
+        working_hours=None,
+        rulesets=[],
+    )
+
+
+def validate_rules(max_weight: WeightConfig | int, rules: list[Rule] | None) -> None:
+    if not rules:
+        return
+
+    weight_limit = (
+        max_weight
+        if isinstance(max_weight, int)
+        else max(max_weight.model_dump().values())
+    )
+
+    for rule in rules:
+        if (rule.weight or 0) > weight_limit:
+            raise ValueError(
+                f"Invalid rule config: {rule.filter} exceeds max weight {weight_limit}"
+            )
+
+        # Rule filters are only ever evaluated locally, unlike ruleset
+        # filters there is no server query to fall back on
+        if not is_label_rule(rule.filter):
+            try:
+                _ = compile_filter(rule.filter)
+            except FilterSyntaxError as e:
+                raise ValueError(f"Invalid rule config: {e}") from e
+
+
+def load_config(path: str | None) -> ScheduleConfig:
+    if not path or not os.path.exists(path):
+        logger.info("No rules provided, using defaults.")
+        return default_config()
+
+    logger.info(f"Loading rules from {path}")
+    try:
+        with open(path) as f:
+            config = ScheduleConfig.model_validate_json(f.read())
+    except ValidationError as e:
+        raise ValueError(
+            f"Invalid rules file '{path}': {e.error_count()} validation error(s) found.\n{e}"
+        ) from e
+
+    validate_rules(config.max_weight, config.rules)
+    for ruleset in config.rulesets:
+        validate_rules(ruleset.max_weight, ruleset.rules)
+
+    hours = config.working_hours
+    if hours is not None and hours.end <= hours.start:
+        raise ValueError(
+            f"Invalid rules file '{path}': working hours end at {hours.end} before they start at {hours.start}"
+        )
+
+    return config
+
+
+class ConfigWatcher:
+    def __init__(self, path: str | None) -> None:
+        self.path = path
+        self.version = self._version()
+        self.config = load_config(path)
+
+    def _version(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path) if self.path else None
+        except OSError:
+            return None
+
+        return (stat.st_mtime_ns, stat.st_size) if stat else None
+
+    def refresh(self) -> ScheduleConfig:
+        # Polled between runs, so a run always sees a single consistent config
+        version = self._version()
+        if version == self.version:
+            return self.config
+
+        if version is None:
+            logger.error(f"Keeping the previous rules, {self.path} is missing")
+            return self.config
+
+        self.version = version
+        try:
+            config = load_config(self.path)
+        except (OSError, ValueError) as e:
+            logger.error(
+                f"Keeping the previous rules, reloading {self.path} failed: {e}"
+            )
+            return self.config
+
+        logger.info(f"Reloaded rules from {self.path}")
+        self.config = config
+        return config
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+from calendar import monthrange
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Literal
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+type SchedulerKind = Literal["native", "apscheduler"]
+
+MONTHS = {
+    name: index
+    for index, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun"]
+        + ["jul", "aug", "sep", "oct", "nov", "dec"],
+        start=1,
+    )
+}
+WEEKDAYS = {
+    name: index
+    for index, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])
+}
+
+WEEKDAY_NAMES = list(WEEKDAYS)
+
+# Names rather than numbers for weekdays, which APScheduler counts from Monday
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * sun",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# Sleeping in short steps notices the wall clock jumping, e.g. after the host
+# was suspended
+MAX_SLEEP_SECONDS = 60.0
+
+
+class CronSyntaxError(ValueError):
+    pass
+
+
+def join(values: frozenset[int]) -> str:
+    return ",".join(str(value) for value in sorted(values))
+
+
+def parse_value(text: str, field: str, names: dict[str, int]) -> int:
+    if text.lower() in names:
+        return names[text.lower()]
+
+    if not text.isdigit():
+        raise CronSyntaxError(f"Unexpected '{text}' in the {field} field")
+
+    return int(text)
+
+
+def parse_field(
+    text: str, field: str, low: int, high: int, names: dict[str, int] | None = None
+) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        range_text, slash, step_text = part.partition("/")
+        step = 1
+        if slash:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise CronSyntaxError(
+                    f"Invalid step '{step_text}' in the {field} field"
+                )
+            step = int(step_text)
+
+        if range_text == "*":
+            start, end = low, high
+        else:
+            first, dash, last = range_text.partition("-")
+            start = end = parse_value(first, field, names or {})
+            if dash:
+                end = parse_value(last, field, names or {})
+            elif slash:
+                # "5/15" runs from 5 to the end of the range
+                end = high
+
+        if not low <= start <= end <= high:
+            raise CronSyntaxError(
+                f"'{part}' is outside {low}-{high} in the {field} field"
+            )
+        values.update(range(start, end + 1, step))
+
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    # Sunday is 0
+    weekdays: frozenset[int]
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        text = " ".join(expression.split())
+        text = MACROS.get(text.lower(), text)
+        if text.startswith("@"):
+            raise CronSyntaxError(f"Unsupported schedule {text}")
+
+        fields = text.split(" ")
+        if len(fields) != 5:
+            raise CronSyntaxError(f"Expected 5 fields, got {len(fields)}")
+
+        minute, hour, day, month, weekday = fields
+        schedule = cls(
+            expression=text,
+            minutes=parse_field(minute, "minute", 0, 59),
+            hours=parse_field(hour, "hour", 0, 23),
+            days=parse_field(day, "day of month", 1, 31),
+            months=parse_field(month, "month", 1, 12, MONTHS),
+            # Both 0 and 7 are Sunday
+            weekdays=frozenset(
+                value % 7 for value in parse_field(weekday, "weekday", 0, 7, WEEKDAYS)
+            ),
+            any_day=day.startswith("*"),
+            any_weekday=weekday.startswith("*"),
+        )
+
+        longest_month = max(monthrange(2000, month)[1] for month in schedule.months)
+        if schedule.any_weekday and min(schedule.days) > longest_month:
+            raise CronSyntaxError(f"{text} never runs")
+
+        return schedule
+
+    def matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+
+        on_day = day.day in self.days
+        on_weekday = (day.weekday() + 1) % 7 in self.weekdays
+        # Like crontab, when both are restricted either one is enough
+        if self.any_day or self.any_weekday:
+            return on_day and on_weekday
+        return on_day or on_weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        time_zone = moment.tzinfo
+        after = moment.astimezone(timezone.utc)
+        times = [(hour, minute) for hour in self.hours for minute in self.minutes]
+
+        day = moment.date()
+        while True:
+            if self.matches_day(day):
+                # Wall clock times are compared in UTC. Times skipped by a DST
+                # change run an hour later, and repeated ones only run the
+                # first time
+                runs = [
+                    run
+                    for hour, minute in times
+                    if (
+                        run := datetime(
+                            day.year, day.month, day.day, hour, minute, tzinfo=time_zone
+                        ).astimezone(timezone.utc)
+                    )
+                    > after
+                ]
+                if runs:
+                    return min(runs).astimezone(time_zone)
+
+            day += timedelta(days=1)
+
+    def trigger_fields(self) -> list[dict[str, str]]:
+        # For APScheduler, which counts weekdays from Monday and needs both
+        # day fields to match. Weekdays go by name, and a schedule that runs
+        # on either day field becomes two triggers
+        fields = {
+            "minute": join(self.minutes),
+            "hour": join(self.hours),
+            "month": join(self.months),
+        }
+        days = join(self.days)
+        weekdays = ",".join(WEEKDAY_NAMES[day] for day in sorted(self.weekdays))
+        if self.any_day or self.any_weekday:
+            return [{**fields, "day": days, "day_of_week": weekdays}]
+
+        return [
+            {**fields, "day": days, "day_of_week": "*"},
+            {**fields, "day": "*", "day_of_week": weekdays},
+        ]
+
+    def longest_gap(self, moment: datetime, runs: int = 100) -> timedelta:
+        # Enough runs to take in a week of hourly runs on weekdays only
+        gap = timedelta()
+        run = self.next_after(moment)
+        for _ in range(runs):
+            following = self.next_after(run)
+            gap = max(gap, following - run)
+            run = following
+
+        return gap
+
+
+class CronRunner:
+    def __init__(
+        self,
+        schedule: CronSchedule,
+        time_zone: str,
+        job: Callable[[], Awaitable[None]],
+        clock: Callable[[tzinfo], datetime] = datetime.now,
+    ) -> None:
+        self.schedule = schedule
+        self.time_zone = ZoneInfo(time_zone)
+        self.job = job
+        self.clock = clock
+        self.next_run_time: datetime | None = None
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self.next_run_time = self.schedule.next_after(self.clock(self.time_zone))
+        self.task = asyncio.ensure_future(self._run())
+        logger.debug(f"Next run at {self.next_run_time}")
+
+    def shutdown(self) -> None:
+        if self.task is not None:
+            _ = self.task.cancel()
+        self.next_run_time = None
+
+    async def _sleep_until(self, moment: datetime) -> None:
+        while (remaining := (moment - self.clock(self.time_zone)).total_seconds()) > 0:
+            await asyncio.sleep(min(remaining, MAX_SLEEP_SECONDS))
+
+    async def _run(self) -> None:
+        while self.next_run_time is not None:
+            run_at = self.next_run_time
+            await self._sleep_until(run_at)
+
+            # Known before running, so readiness checks see the upcoming run
+            # while this one is in progress
+            self.next_run_time = self.schedule.next_after(run_at)
+            try:
+                await self.job()
+            except Exception:
+                logger.exception("Scheduled run failed")
+
+            # Runs missed while this one was going are skipped, not queued up
+            now = self.clock(self.time_zone)
+            if self.next_run_time <= now:
+                self.next_run_time = self.schedule.next_after(now)
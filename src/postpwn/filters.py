@@ -0,0 +1,211 @@
+import fnmatch
+import re
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from todoist_api_python.models import Task
+
+# Predicate over a task, given the date the run plans from
+type Filter = Callable[[Task, date], bool]
+
+TOKEN_PATTERN = re.compile(r"\s*([&|!(),])\s*|([^&|!(),]+)")
+DAYS_PATTERN = re.compile(r"(?:next )?(\d+) days?")
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def due_date(task: Task) -> date | None:
+    if task.due is None:
+        return None
+
+    due = task.due.date  # pyright: ignore[reportUnknownMemberType]
+    return due.date() if isinstance(due, datetime) else due  # pyright: ignore[reportUnknownVariableType, reportReturnType]
+
+
+def deadline_date(task: Task) -> date | None:
+    if task.deadline is None:
+        return None
+
+    deadline = task.deadline.date
+    return deadline.date() if isinstance(deadline, datetime) else deadline
+
+
+def parse_date(text: str) -> Callable[[date], date]:
+    relative = {"today": 0, "tomorrow": 1, "yesterday": -1}
+    if text in relative:
+        offset = timedelta(days=relative[text])
+        return lambda today: today + offset
+
+    try:
+        parsed = date.fromisoformat(text)
+    except ValueError as e:
+        raise FilterSyntaxError(f"Unsupported date '{text}' in filter") from e
+
+    return lambda _: parsed
+
+
+def compare_dates(
+    get_date: Callable[[Task], date | None], operator: str, text: str
+) -> Filter:
+    target = parse_date(text.strip())
+    comparisons: dict[str, Callable[[date, date], bool]] = {
+        "": lambda value, other: value == other,
+        "before": lambda value, other: value < other,
+        "after": lambda value, other: value > other,
+    }
+    compare = comparisons[operator]
+
+    def matches(task: Task, today: date) -> bool:
+        value = get_date(task)
+        return value is not None and compare(value, target(today))
+
+    return matches
+
+
+def compile_term(term: str) -> Filter:
+    # Todoist accepts both "assigned to:others" and "assigned to: others"
+    text = re.sub(r"\s*:\s*", ": ", " ".join(term.lower().split()))
+
+    if text in ("all", ""):
+        return lambda task, today: True
+
+    if text.startswith("@") or text.startswith("label: "):
+        pattern = term.strip().removeprefix("@")
+        if text.startswith("label: "):
+            pattern = pattern.split(":", 1)[1].strip()
+        return lambda task, today: any(
+            fnmatch.fnmatchcase(label, pattern) for label in task.labels or []
+        )
+    if text == "no labels":
+        return lambda task, today: not task.labels
+
+    if re.fullmatch(r"p[1-4]", text):
+        # p1 is the most urgent, which the API reports as priority 4
+        priority = 5 - int(text[1])
+        return lambda task, today: task.priority == priority
+
+    if text in ("no date", "no due date"):
+        return lambda task, today: task.due is None
+    if text == "recurring":
+        return lambda task, today: task.due is not None and task.due.is_recurring
+    if text in ("overdue", "od"):
+        return lambda task, today: (due := due_date(task)) is not None and due < today
+    if text in ("today", "tomorrow", "yesterday"):
+        return compare_dates(due_date, "", text)
+    if days := DAYS_PATTERN.fullmatch(text):
+        span = timedelta(days=int(days.group(1)))
+        return lambda task, today: (
+            (due := due_date(task)) is not None and today <= due < today + span
+        )
+
+    if match := re.fullmatch(r"(due|date|deadline)( before| after)?: (.+)", text):
+        field, operator, value = match.groups()
+        return compare_dates(
+            deadline_date if field == "deadline" else due_date,
+            (operator or "").strip(),
+            value,
+        )
+    if text == "no deadline":
+        return lambda task, today: task.deadline is None
+
+    if text == "assigned":
+        return lambda task, today: task.assignee_id is not None
+    if text.startswith("assigned to:") or text.startswith("assigned by:"):
+        # Tasks don't say who the current user is, so only the server can
+        # tell who "me" and "others" are
+        raise FilterSyntaxError(f"'{term.strip()}' needs the current user")
+
+    if text.startswith("search:"):
+        needle = text.removeprefix("search: ")
+        return lambda task, today: needle in task.content.lower()
+
+    raise FilterSyntaxError(f"Unsupported filter term '{term.strip()}'")
+
+
+class Parser:
+    def __init__(self, query: str) -> None:
+        self.tokens = [
+            operator or text
+            for operator, text in TOKEN_PATTERN.findall(query)
+            if (operator or text).strip()
+        ]
+        self.position = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise FilterSyntaxError("Unexpected end of filter")
+
+        self.position += 1
+        return token
+
+    def parse(self) -> Filter:
+        if not self.tokens:
+            return lambda task, today: True
+
+        # Todoist shows comma separated queries as separate lists, a task
+        # belongs to the backlog if it is in any of them
+        queries = [self.parse_or()]
+        while self.peek() == ",":
+            _ = self.take()
+            queries.append(self.parse_or())
+
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"Unexpected '{self.peek()}' in filter")
+
+        return lambda task, today: any(query(task, today) for query in queries)
+
+    def parse_or(self) -> Filter:
+        options = [self.parse_and()]
+        while self.peek() == "|":
+            _ = self.take()
+            options.append(self.parse_and())
+
+        if len(options) == 1:
+            return options[0]
+        return lambda task, today: any(option(task, today) for option in options)
+
+    def parse_and(self) -> Filter:
+        parts = [self.parse_not()]
+        while self.peek() == "&":
+            _ = self.take()
+            parts.append(self.parse_not())
+
+        if len(parts) == 1:
+            return parts[0]
+        return lambda task, today: all(part(task, today) for part in parts)
+
+    def parse_not(self) -> Filter:
+        token = self.take()
+
+        if token == "!":
+            negated = self.parse_not()
+            return lambda task, today: not negated(task, today)
+
+        if token == "(":
+            inner = self.parse_or()
+            if self.take() != ")":
+                raise FilterSyntaxError("Unbalanced parentheses in filter")
+            return inner
+
+        if token in "&|),":
+            raise FilterSyntaxError(f"Unexpected '{token}' in filter")
+
+        return compile_term(token)
+
+
+@lru_cache(maxsize=256)
+def compile_filter(query: str) -> Filter:
+    return Parser(query).parse()
+
+
+def is_label_rule(query: str) -> bool:
+    # Plain `@label` rules are looked up by label name, which may contain
+    # spaces and characters that aren't valid in a filter
+    return query.startswith("@") and not any(operator in query for operator in "&|!(),")
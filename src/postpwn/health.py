@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any
+
+from postpwn.history import RunStats
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# A run taking longer than this is reported as stalled by the liveness check
+STALL_AFTER_SECONDS = 15 * 60
+
+
+class RunMonitor:
+    def __init__(self, stall_after: float = STALL_AFTER_SECONDS) -> None:
+        self.stall_after = stall_after
+        self.current: RunStats | None = None
+        self.last_success: datetime | None = None
+        self.last_failure: datetime | None = None
+        self.last_error: str | None = None
+        self.next_run: Callable[[], datetime | None] = lambda: None
+        # Runs follow webhooks rather than a schedule, so there is never a
+        # next run to wait for
+        self.event_driven = False
+
+    @contextmanager
+    def watch(self) -> Iterator[RunStats]:
+        stats = RunStats()
+        self.current = stats
+        try:
+            yield stats
+        except Exception as e:
+            self.last_failure = datetime.now(timezone.utc)
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        else:
+            self.last_success = datetime.now(timezone.utc)
+        finally:
+            self.current = None
+
+    def running_for(self) -> float | None:
+        if self.current is None:
+            return None
+
+        return (datetime.now(timezone.utc) - self.current.started_at).total_seconds()
+
+    def liveness(self) -> tuple[bool, dict[str, Any]]:
+        running_for = self.running_for()
+        stalled = running_for is not None and running_for > self.stall_after
+        return not stalled, {
+            "status": "stalled" if stalled else "ok",
+            "running_for": running_for,
+        }
+
+    def readiness(self) -> tuple[bool, dict[str, Any]]:
+        next_run = self.next_run()
+        failing = self.last_failure is not None and (
+            self.last_success is None or self.last_failure > self.last_success
+        )
+
+        phase = None
+        if self.current is not None:
+            phase = self.current.current_phase or "running"
+
+        scheduled = next_run is not None or self.event_driven
+        return scheduled and not failing, {
+            "phase": phase or "idle",
+            "next_run": next_run.isoformat() if next_run else None,
+            "last_success": self.last_success.isoformat()
+            if self.last_success
+            else None,
+            "last_failure": self.last_failure.isoformat()
+            if self.last_failure
+            else None,
+            "last_error": self.last_error,
+        }
+
+
+class HealthServer:
+    def __init__(self, monitor: RunMonitor, port: int, host: str = "0.0.0.0") -> None:
+        self.monitor = monitor
+        self.port = port
+        self.host = host
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Serving health checks on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            # Drain the headers, the checks don't need any of them
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) > 1 else ""
+
+            if path == "/healthz":
+                ok, body = self.monitor.liveness()
+                status = "200 OK" if ok else "503 Service Unavailable"
+            elif path == "/readyz":
+                ok, body = self.monitor.readiness()
+                status = "200 OK" if ok else "503 Service Unavailable"
+            else:
+                status, body = "404 Not Found", {"error": "not found"}
+
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.debug(f"Health check connection dropped: {e}")
+        finally:
+            writer.close()
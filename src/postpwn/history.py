@@ -0,0 +1,186 @@
+import logging
+import sqlite3
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from pathlib import Path
+
+from postpwn.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass
+class RunStats:
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    plan_seconds: float = 0.0
+    apply_seconds: float = 0.0
+    tasks: int = 0
+    plans: int = 0
+    skipped_plans: int = 0
+    planned: int = 0
+    moves: int = 0
+    api_calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    # Peak bytes allocated during the run, when memory is being traced
+    peak_memory: int | None = None
+    dry_run: bool = False
+    error: str | None = None
+    # Phase in progress, for observing a live run; not recorded
+    current_phase: str | None = field(default=None, init=False, compare=False)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        self.current_phase = name
+        try:
+            yield
+        finally:
+            self.current_phase = None
+            attribute = f"{name}_seconds"
+            setattr(
+                self,
+                attribute,
+                getattr(self, attribute) + time.perf_counter() - started,
+            )
+
+
+COLUMNS = tuple(f.name for f in fields(RunStats) if f.init)
+
+
+class RunHistory:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            _ = conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at TEXT NOT NULL,
+                    seconds REAL NOT NULL,
+                    fetch_seconds REAL NOT NULL,
+                    plan_seconds REAL NOT NULL,
+                    apply_seconds REAL NOT NULL,
+                    tasks INTEGER NOT NULL,
+                    plans INTEGER NOT NULL,
+                    skipped_plans INTEGER NOT NULL,
+                    planned INTEGER NOT NULL,
+                    moves INTEGER NOT NULL,
+                    api_calls INTEGER NOT NULL,
+                    retries INTEGER NOT NULL,
+                    failures INTEGER NOT NULL,
+                    peak_memory INTEGER,
+                    dry_run INTEGER NOT NULL,
+                    error TEXT
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            yield conn
+
+    def record(self, stats: RunStats) -> None:
+        values = [getattr(stats, column) for column in COLUMNS]
+        values[0] = stats.started_at.isoformat()
+
+        with self._connect() as conn:
+            _ = conn.execute(
+                f"INSERT INTO runs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                values,
+            )
+
+    def recent(self, limit: int = 20) -> list[RunStats]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM runs ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+        runs: list[RunStats] = []
+        for row in rows:
+            stats = RunStats(*row)
+            stats.started_at = datetime.fromisoformat(row[0])
+            stats.dry_run = bool(stats.dry_run)
+            runs.append(stats)
+
+        return runs
+
+
+@contextmanager
+def track_run(
+    history: RunHistory | None,
+    retry_policy: RetryPolicy,
+    dry_run: bool,
+    stats: RunStats | None = None,
+    memory_budget: int | None = None,
+) -> Iterator[RunStats]:
+    stats = stats if stats is not None else RunStats()
+    stats.dry_run = dry_run
+    started = time.perf_counter()
+
+    # Tracing slows every allocation down, so it's only on with a budget to
+    # report against. Only this process is traced, not planner workers
+    tracing = memory_budget is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif memory_budget is not None:
+        tracemalloc.reset_peak()
+
+    try:
+        yield stats
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stats.seconds = time.perf_counter() - started
+        stats.api_calls = retry_policy.calls
+        stats.retries = retry_policy.retries
+        stats.failures = retry_policy.failures
+
+        if memory_budget is not None:
+            _, stats.peak_memory = tracemalloc.get_traced_memory()
+            if tracing:
+                tracemalloc.stop()
+
+            log = logger.warning if stats.peak_memory > memory_budget else logger.info
+            log(
+                f"Run used at most {stats.peak_memory / 2**20:.1f} MiB of its {memory_budget / 2**20:.1f} MiB memory budget"
+            )
+
+        if history is not None:
+            try:
+                history.record(stats)
+            except sqlite3.Error as e:
+                # Losing a history row must never fail the run itself
+                logger.warning(f"Could not record run history in {history.path}: {e}")
+
+
+def format_runs(runs: list[RunStats]) -> str:
+    lines = [
+        f"{'started':<20} {'secs':>7} {'fetch':>7} {'plan':>7} {'apply':>7} "
+        f"{'tasks':>6} {'moves':>6} {'tasks/s':>8} {'calls':>6} {'retries':>7} "
+        f"{'fails':>6} {'MiB':>7}  status"
+    ]
+    for run in runs:
+        status = "error" if run.error else "dry run" if run.dry_run else "ok"
+        throughput = run.tasks / run.seconds if run.seconds else 0
+        peak = f"{run.peak_memory / 2**20:.1f}" if run.peak_memory is not None else "-"
+        lines.append(
+            f"{run.started_at:%Y-%m-%d %H:%M:%S}  {run.seconds:>7.2f} "
+            f"{run.fetch_seconds:>7.2f} {run.plan_seconds:>7.2f} {run.apply_seconds:>7.2f} "
+            f"{run.tasks:>6} {run.moves:>6} {throughput:>8.1f} {run.api_calls:>6} "
+            f"{run.retries:>7} {run.failures:>6} {peak:>7}  {status}"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Literal
+
+type LogFormat = Literal["text", "json"]
+
+TEXT_FORMAT = "%(asctime)s %(name)s [%(levelname)s]: %(message)s"
+
+# Attributes every record has, anything else was passed through `extra`
+RECORD_ATTRIBUTES = set(
+    logging.LogRecord("", logging.INFO, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "taskName"}
+
+# Fraction of per-task lines emitted at INFO when DEBUG is off
+sample_rate = 0.0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(
+    format: LogFormat = "text", level: str = "INFO", sample: float = 0.0
+) -> None:
+    global sample_rate
+    sample_rate = sample
+
+    formatter = JsonFormatter() if format == "json" else logging.Formatter(TEXT_FORMAT)
+    root = logging.getLogger()
+    for handler in root.handlers:
+        handler.setFormatter(formatter)
+
+    # Every module pins its own logger to INFO, so lower them together
+    for name, logger in logging.Logger.manager.loggerDict.items():
+        if name.startswith("postpwn") and isinstance(logger, logging.Logger):
+            logger.setLevel(level)
+    root.setLevel(level)
+
+
+def sampled(key: str) -> bool:
+    if sample_rate <= 0:
+        return False
+
+    # Hash rather than random so a task is either always or never sampled
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest) / 2**64 < sample_rate
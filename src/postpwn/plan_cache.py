@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPlan:
+    plan: dict[str, int]
+    # The inputs this entry is keyed by already match the plan, so there is
+    # nothing to apply
+    settled: bool = False
+
+
+class PlanCache:
+    def __init__(self, directory: str | None = None, max_entries: int = 128) -> None:
+        self.directory = Path(directory) if directory else None
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CachedPlan] = OrderedDict()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> CachedPlan | None:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        cached = self._read(key)
+        if cached is not None:
+            self._remember(key, cached)
+
+        return cached
+
+    def put(self, key: str, cached: CachedPlan) -> None:
+        self._remember(key, cached)
+        self._write(key, cached)
+
+    def _remember(self, key: str, cached: CachedPlan) -> None:
+        self.entries[key] = cached
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            _ = self.entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path | None:
+        return self.directory / f"{key}.json" if self.directory else None
+
+    def _read(self, key: str) -> CachedPlan | None:
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+
+        try:
+            data = json.loads(path.read_text())
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached plan {path}: {e}")
+            return None
+
+        return CachedPlan(plan=data["plan"], settled=data["settled"])
+
+    def _write(self, key: str, cached: CachedPlan) -> None:
+        path = self._path(key)
+        if path is None or self.directory is None:
+            return
+
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp_path = path.with_suffix(".tmp")
+        _ = tmp_path.write_text(
+            json.dumps({"plan": cached.plan, "settled": cached.settled})
+        )
+        _ = tmp_path.replace(path)
+
+        files = sorted(self.directory.glob("*.json"), key=lambda f: f.stat().st_mtime)
+        for stale in files[: max(len(files) - self.max_entries, 0)]:
+            stale.unlink(missing_ok=True)
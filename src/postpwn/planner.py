@@ -0,0 +1,581 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import date
+
+from postpwn.plan_cache import CachedPlan, PlanCache
+from postpwn.solvers import (
+    EXACT_BUDGET,
+    NO_DUE,
+    PlanItem,
+    Strategy,
+    canonical_key,
+    exact_bytes,
+    fits_memory,
+    solve_day,
+)
+from postpwn.types import WeightConfig
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Task id -> date ordinal the task is planned for
+type Plan = dict[str, int]
+
+# Largest daily capacity the DP is run at before weights are coarsened
+MAX_DP_CAPACITY = 1024
+
+# Rough size of one planned item, its id and the lists it is kept in
+ITEM_BYTES = 256
+
+
+@dataclass(frozen=True, slots=True)
+class PlanRequest:
+    # Columnar so requests stay small when pickled to worker processes
+    ids: tuple[str, ...]
+    weights: tuple[int, ...]
+    values: tuple[int, ...]
+    dues: tuple[int, ...]
+    groups: tuple[int, ...]
+    deadlines: tuple[int, ...]
+    capacities: tuple[int, ...]
+    start: int
+    # Maximum number of items per day for each group
+    limits: tuple[int, ...] = ()
+    strategy: Strategy = "exact"
+    # Leave tasks on future days where they are unless their day overflows
+    minimize_churn: bool = False
+    # Plan tasks on or before their deadlines where capacity allows
+    meet_deadlines: bool = False
+    # Approximate bytes planning may use, beyond which days are solved with
+    # smaller tables
+    memory_budget: int | None = None
+    # Identifies the backlog across runs so its day tables can be reused,
+    # without being part of the fingerprint
+    name: str = ""
+
+    @classmethod
+    def from_items(
+        cls,
+        items: list[PlanItem],
+        capacities: tuple[int, ...],
+        start: int,
+        limits: tuple[int, ...] = (),
+        name: str = "",
+    ) -> "PlanRequest":
+        items = sorted(items, key=canonical_key)
+        return cls(
+            ids=tuple(item.id for item in items),
+            weights=tuple(item.weight for item in items),
+            values=tuple(item.value for item in items),
+            dues=tuple(item.due for item in items),
+            groups=tuple(item.group for item in items),
+            deadlines=tuple(item.deadline for item in items),
+            capacities=capacities,
+            start=start,
+            limits=limits,
+            name=name,
+        )
+
+    def fingerprint(self) -> str:
+        # Order-independent, so the same backlog fetched in a different page
+        # order still maps to the same plan
+        items = sorted(
+            zip(
+                self.ids,
+                self.weights,
+                self.values,
+                self.dues,
+                self.groups,
+                self.deadlines,
+            )
+        )
+        digest = hashlib.blake2b(
+            repr(
+                (
+                    items,
+                    self.capacities,
+                    self.start,
+                    self.limits,
+                    self.strategy,
+                    self.minimize_churn,
+                    self.meet_deadlines,
+                    self.memory_budget,
+                )
+            ).encode(),
+            digest_size=16,
+        )
+        return digest.hexdigest()
+
+    def settled(self, plan: Plan) -> "PlanRequest":
+        return replace(
+            self,
+            dues=tuple(plan.get(id, due) for id, due in zip(self.ids, self.dues)),
+        )
+
+    def items(self) -> list[PlanItem]:
+        return [
+            PlanItem(*fields)
+            for fields in zip(
+                self.ids,
+                self.weights,
+                self.values,
+                self.dues,
+                self.groups,
+                self.deadlines,
+            )
+        ]
+
+
+@dataclass(frozen=True, slots=True)
+class DayTable:
+    # Solver settings the days were planned with, tables from other settings
+    # are never reused
+    settings: str
+    # Day ordinal -> hash of the items the day picked from, and the ids chosen
+    days: dict[int, tuple[int, tuple[str, ...]]]
+    # Id -> hash, due and planned day ordinal of every item that was planned
+    items: dict[str, tuple[int, int, int]]
+
+
+def item_hash(item: PlanItem) -> int:
+    digest = hashlib.blake2b(repr(item).encode(), digest_size=8).digest()
+    return int.from_bytes(digest)
+
+
+def weekday_capacities(weight_config: WeightConfig | int) -> tuple[int, ...]:
+    if isinstance(weight_config, int):
+        return (weight_config,) * 7
+
+    return (
+        weight_config.monday,
+        weight_config.tuesday,
+        weight_config.wednesday,
+        weight_config.thursday,
+        weight_config.friday,
+        weight_config.saturday,
+        weight_config.sunday,
+    )
+
+
+def get_weekday_weight(weight_config: WeightConfig | int, date: date) -> int:
+    return weekday_capacities(weight_config)[date.weekday()]
+
+
+def tune_granularity(request: PlanRequest) -> PlanRequest:
+    largest = max(request.capacities, default=0)
+    if largest <= 0:
+        return request
+
+    # Dividing everything by the common step is lossless, and keeps
+    # minute-level weights from blowing up the (capacity + 1) DP arrays
+    step = math.gcd(*request.weights, *request.capacities)
+    if largest // step > MAX_DP_CAPACITY:
+        # Coarsen further. Weights round up and capacities round down, so a
+        # day can be left up to a step short of its capacity but isn't
+        # overfilled
+        step *= math.ceil(largest // step / MAX_DP_CAPACITY)
+    if step <= 1:
+        return request
+
+    # Days smaller than a step keep room for one step rather than dropping
+    # out of the plan, the only case where a day can take more than it holds
+    capacities = tuple(
+        max(capacity // step, 1) if capacity > 0 else 0
+        for capacity in request.capacities
+    )
+    weights = tuple(
+        min(-(-weight // step), max(capacities)) if weight <= largest else weight
+        for weight in request.weights
+    )
+    logger.info(f"Planning with a weight granularity of {step}")
+
+    return replace(request, weights=weights, capacities=capacities)
+
+
+def latest_days(
+    items: list[PlanItem], capacities: tuple[int, ...], start: int
+) -> dict[str, int]:
+    # The last day each task with a deadline can wait for while every task
+    # with a later deadline still fits before its own. Filling days backwards
+    # from the furthest deadline (EDF in reverse) visits each task once and
+    # each day at most once, after sorting
+    dated = sorted(
+        (item for item in items if item.deadline != NO_DUE),
+        key=lambda item: (item.deadline, item.value, item.id),
+        reverse=True,
+    )
+    latest: dict[str, int] = {}
+    day = NO_DUE
+    left = 0
+    for index, item in enumerate(dated):
+        if item.deadline < day:
+            day = item.deadline
+            left = capacities[date.fromordinal(day).weekday()]
+
+        while left < item.weight and day >= start:
+            day -= 1
+            left = capacities[date.fromordinal(day).weekday()]
+
+        if day < start:
+            # Everything left can't make its deadline, so it all goes as early
+            # as possible
+            latest.update((rest.id, start - 1) for rest in dated[index:])
+            break
+
+        left -= item.weight
+        latest[item.id] = day
+
+    return latest
+
+
+def keep_in_place(
+    items: list[PlanItem], day: int, urgent: set[str] | None = None
+) -> list[PlanItem]:
+    # Tasks due later are left alone until their own day, where a bonus larger
+    # than every other task's value combined keeps as many of them in place as
+    # fit, so only the overflow is moved
+    eligible = [
+        item
+        for item in items
+        if item.due <= day or item.due == NO_DUE or item.id in (urgent or set())
+    ]
+    bonus = sum(item.value for item in eligible) + 1
+    return [
+        replace(item, value=item.value + bonus) if item.due == day else item
+        for item in eligible
+    ]
+
+
+def exact_day(
+    request: PlanRequest, capacity: int, candidates: int, memory_budget: int | None
+) -> bool:
+    # Completed tasks may have been lighter than any left, so the day's table
+    # is sized as if every task weighed one
+    if request.limits or not fits_memory(
+        exact_bytes(capacity, candidates), memory_budget
+    ):
+        return False
+
+    return request.strategy == "exact" or (
+        request.strategy == "auto" and candidates * (capacity + 1) <= EXACT_BUDGET
+    )
+
+
+def solve(request: PlanRequest, cancelled: threading.Event | None = None) -> Plan:
+    plan, _ = solve_incremental(request, None, cancelled)
+    return plan
+
+
+def solve_incremental(
+    request: PlanRequest,
+    previous: DayTable | None = None,
+    cancelled: threading.Event | None = None,
+) -> tuple[Plan, DayTable]:
+    request = tune_granularity(request)
+    if not request.meet_deadlines:
+        # Deadlines are ignored entirely, down to tie-breaking between tasks
+        request = replace(request, deadlines=(NO_DUE,) * len(request.ids))
+
+    # Identical backlogs must give identical plans whatever order they were
+    # fetched in, or every tick would rewrite tasks between equivalent days
+    items = sorted(request.items(), key=canonical_key)
+
+    # Tasks that can't fit in any day would otherwise be carried forward
+    # forever, so leave them where they are
+    largest = max(request.capacities, default=0)
+    remaining = [item for item in items if largest > 0 and item.weight <= largest]
+    if len(remaining) < len(request.ids):
+        logger.warning(
+            f"{len(request.ids) - len(remaining)} task(s) don't fit in any day's capacity and will be left in place"
+        )
+
+    settings = repr(
+        (
+            request.capacities,
+            request.limits,
+            request.strategy,
+            request.minimize_churn,
+            request.meet_deadlines,
+            request.memory_budget,
+        )
+    )
+    if previous is None or previous.settings != settings:
+        previous = DayTable(settings, {}, {})
+
+    # A cache of each day's choice, not an incremental DP. A day's choice
+    # only depends on its capacity and the items it can pick from, so when
+    # those match the last solve the day is reused as is. Any other day is
+    # solved in full, and without minimize_churn a change on an early day
+    # changes the candidates of every day after it, so all of them are
+    # solved again. Changes late in the plan are the ones that save work
+    hashes = {item.id: item_hash(item) for item in remaining}
+    removed = [
+        (id, *fields) for id, fields in previous.items.items() if id not in hashes
+    ]
+
+    latest = (
+        latest_days(remaining, request.capacities, request.start)
+        if request.meet_deadlines
+        else {}
+    )
+    late = sum(latest_day < request.start for latest_day in latest.values())
+    if late:
+        logger.warning(
+            f"{late} task(s) can't be planned by their deadline and will be planned as early as possible"
+        )
+
+    # Whatever the items themselves take up is out of each day's share
+    day_budget = None
+    if request.memory_budget is not None:
+        day_budget = max(request.memory_budget - len(items) * ITEM_BYTES, 0)
+        if not day_budget:
+            logger.warning(
+                f"{len(items)} task(s) take up the whole memory budget, planning every day greedily"
+            )
+
+    # Tasks that can't wait any longer to make their deadlines, added as the
+    # days pass their latest day
+    by_latest = sorted(latest, key=lambda id: latest[id])
+    urgent: set[str] = set()
+    next_urgent = 0
+
+    plan: Plan = {}
+    days: dict[int, tuple[int, tuple[str, ...]]] = {}
+    solved_days = 0
+    day = request.start
+    while len(remaining) != 0:
+        while next_urgent < len(by_latest) and latest[by_latest[next_urgent]] <= day:
+            urgent.add(by_latest[next_urgent])
+            next_urgent += 1
+
+        candidates = remaining
+        if request.minimize_churn:
+            candidates = keep_in_place(remaining, day, urgent)
+            if not candidates:
+                day = min(
+                    min(item.due, latest.get(item.id, NO_DUE)) for item in remaining
+                )
+                continue
+
+        if urgent:
+            # Outweighs every other task combined, so the day takes as many
+            # urgent tasks as fit before anything else
+            bonus = sum(item.value for item in candidates) + 1
+            candidates = [
+                replace(item, value=item.value + bonus) if item.id in urgent else item
+                for item in candidates
+            ]
+
+        capacity = request.capacities[date.fromordinal(day).weekday()]
+        # Urgent tasks count twice, as their bonus changes the day's choice
+        candidates_hash = (
+            sum(hashes[item.id] for item in candidates)
+            + sum(hashes[item.id] for item in candidates if item.id in urgent)
+        ) % 2**64
+        last_hash, chosen = previous.days.get(day, (None, None))
+
+        if chosen is not None and last_hash != candidates_hash:
+            # Completed tasks the day could pick from but didn't leave its
+            # choice as is, as the exact DP only ever switches to strictly
+            # better selections, which can't have used them
+            gone = [
+                (id, removed_hash)
+                for id, removed_hash, due, planned in removed
+                if planned >= day
+                and (not request.minimize_churn or due <= day or due == NO_DUE)
+            ]
+            unchanged = (
+                not any(id in chosen for id, _ in gone)
+                and exact_day(
+                    request, capacity, len(candidates) + len(gone), day_budget
+                )
+                and (candidates_hash + sum(gone_hash for _, gone_hash in gone)) % 2**64
+                == last_hash
+            )
+            if not unchanged:
+                chosen = None
+
+        if chosen is None:
+            batch = solve_day(
+                capacity,
+                candidates,
+                request.limits,
+                cancelled,
+                request.strategy,
+                day_budget,
+            )
+            chosen = tuple(item.id for item in batch)
+            solved_days += 1
+
+        days[day] = (candidates_hash, chosen)
+        for id in chosen:
+            plan[id] = day
+        urgent.difference_update(chosen)
+        remaining = [item for item in remaining if item.id not in plan]
+
+        day += 1
+
+    if previous.days:
+        logger.info(f"Re-solved {solved_days} of {len(days)} day(s)")
+
+    planned_items = {
+        item.id: (hashes[item.id], item.due, plan[item.id])
+        for item in items
+        if item.id in plan
+    }
+    return plan, DayTable(settings, days, planned_items)
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+def make_executor(workers: int | None = None) -> Executor:
+    # Without a GIL, threads solve in parallel and skip pickling the requests
+    if not gil_enabled():
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planner")
+
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+
+
+class Planner:
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        timeout: float | None = None,
+        cache: PlanCache | None = None,
+        strategy: Strategy = "auto",
+        minimize_churn: bool = False,
+        verify: bool = False,
+        meet_deadlines: bool = False,
+        memory_budget: int | None = None,
+    ) -> None:
+        self.executor = executor
+        self.timeout = timeout
+        self.cache = cache or PlanCache()
+        self.strategy: Strategy = strategy
+        self.minimize_churn = minimize_churn
+        self.meet_deadlines = meet_deadlines
+        self.memory_budget = memory_budget
+        # Check incremental solves against a full solve, at twice the cost
+        self.verify = verify
+        self.tables: dict[str, DayTable] = {}
+
+    def _configure(self, request: PlanRequest) -> PlanRequest:
+        return replace(
+            request,
+            strategy=self.strategy,
+            minimize_churn=self.minimize_churn,
+            meet_deadlines=self.meet_deadlines,
+            memory_budget=self.memory_budget,
+        )
+
+    def is_settled(self, request: PlanRequest) -> bool:
+        cached = self.cache.get(self._configure(request).fingerprint())
+        return cached is not None and cached.settled
+
+    def settle(self, request: PlanRequest, plan: Plan) -> None:
+        # Once applied, the backlog matches the plan, so an unchanged backlog
+        # on the next tick needs neither a solve nor any updates
+        settled = self._configure(request).settled(plan)
+        self.cache.put(settled.fingerprint(), CachedPlan(plan, True))
+
+    async def solve(self, requests: list[PlanRequest]) -> list[Plan]:
+        requests = [self._configure(request) for request in requests]
+        keys = [request.fingerprint() for request in requests]
+        plans: list[Plan | None] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            plans.append(cached.plan if cached else None)
+
+        misses = [index for index, plan in enumerate(plans) if plan is None]
+        if len(misses) < len(requests):
+            logger.info(f"Reusing {len(requests) - len(misses)} cached plan(s)")
+
+        solved = await self._solve([requests[index] for index in misses])
+        for index, plan in zip(misses, solved):
+            plans[index] = plan
+            self.cache.put(keys[index], CachedPlan(plan))
+
+        return [plan for plan in plans if plan is not None]
+
+    async def _solve(self, requests: list[PlanRequest]) -> list[Plan]:
+        if not requests:
+            return []
+
+        previous = [
+            self.tables.get(request.name) if request.name else None
+            for request in requests
+        ]
+        results = await self._run(list(zip(requests, previous)))
+        plans = [plan for plan, _ in results]
+        for request, (_, table) in zip(requests, results):
+            if request.name:
+                self.tables[request.name] = table
+
+        if self.verify:
+            incremental = [
+                index for index, table in enumerate(previous) if table is not None
+            ]
+            full = await self._run([(requests[index], None) for index in incremental])
+            for index, (plan, table) in zip(incremental, full):
+                if plan != plans[index]:
+                    logger.error(
+                        f"Incremental plan for {requests[index].name} differs from a full solve, using the full solve"
+                    )
+                    plans[index] = plan
+                    self.tables[requests[index].name] = table
+
+        return plans
+
+    async def _run(
+        self, calls: list[tuple[PlanRequest, DayTable | None]]
+    ) -> list[tuple[Plan, DayTable]]:
+        if not calls:
+            return []
+
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        # Planning is CPU-bound, so keep it off the event loop. Worker
+        # processes can't observe the cancellation event, but any of their
+        # pending futures are dropped when the solve is cancelled.
+        if isinstance(self.executor, ProcessPoolExecutor) and len(calls) > 1:
+            logger.info(f"Solving {len(calls)} plans in parallel")
+            futures = [
+                loop.run_in_executor(self.executor, solve_incremental, request, table)
+                for request, table in calls
+            ]
+        else:
+            executor = (
+                self.executor if isinstance(self.executor, ThreadPoolExecutor) else None
+            )
+            futures = [
+                loop.run_in_executor(
+                    executor, solve_incremental, request, table, cancelled
+                )
+                for request, table in calls
+            ]
+
+        try:
+            return list(await asyncio.wait_for(asyncio.gather(*futures), self.timeout))
+        except TimeoutError as e:
+            raise TimeoutError(
+                f"Planning did not finish within {self.timeout} seconds"
+            ) from e
+        finally:
+            # Stops any solve still running in a thread after a timeout or
+            # cancellation; a no-op once every solve has finished
+            cancelled.set()
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
@@ -1,24 +1,36 @@
 import asyncio
 import logging
-import os
+import math
 from collections import defaultdict
-from datetime import date, datetime, timedelta
-from typing import Any, Coroutine, Unpack
+from collections.abc import AsyncGenerator
+from datetime import date, datetime, time
+from typing import Awaitable, Callable, Unpack
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
-from tenacity import (
-    WrappedFn,
-    after_log,
-    before_log,
-    retry,
-    stop_after_attempt,
-    wait_exponential_jitter,
-)
 from todoist_api_python.models import Due, Task
 
 from postpwn.api import TodoistAPIProtocol, UpdateTaskInput
-from postpwn.types import Rule, WeightConfig
+from postpwn.filters import (
+    Filter,
+    FilterSyntaxError,
+    compile_filter,
+    deadline_date,
+    is_label_rule,
+)
+from postpwn.history import RunHistory, RunStats, track_run
+from postpwn.log import sampled
+from postpwn.planner import (
+    PlanItem,
+    Planner,
+    NO_DUE,
+    PlanRequest,
+    weekday_capacities,
+)
+from postpwn.retry import RetryPolicy
+from postpwn.sharding import ShardCoordinator
+from postpwn.slots import plan_slots
+from postpwn.types import DurationWeights, Rule, Ruleset, WeightConfig, WorkingHours
 from postpwn.weighted_task import WeightedTask
 
 _ = load_dotenv()
@@ -27,59 +39,80 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-def weighted_adapter(task: Task, rules: list[Rule] | None) -> WeightedTask | None:
-    if rules is None:
-        return WeightedTask(task, 0)
-
-    filter_map: dict[str, int] = {
-        rule.filter[1:]: rule.weight for rule in rules if rule.weight is not None
-    }
-
-    if not task.labels:
-        logger.info("Task has no labels, ignoring...")
+def get_duration_weight(
+    task: Task, duration_weights: DurationWeights | None
+) -> int | None:
+    if duration_weights is None or task.duration is None:
         return None
 
-    label = next((label for label in task.labels if label in filter_map), None)
-    if not label:
-        logger.info("Task has no matching labels, ignoring...")
-        return None
+    minutes = task.duration.amount
+    if task.duration.unit == "day":
+        minutes *= duration_weights.minutes_per_day
 
-    weight = filter_map[label]
+    # Round up into buckets so short tasks still take up capacity
+    return math.ceil(minutes / duration_weights.minutes_per_weight)
 
-    return WeightedTask(task, weight)
 
+def weighted_adapter(
+    task: Task,
+    rules: list[Rule] | None,
+    duration_weights: DurationWeights | None = None,
+    today: date | None = None,
+) -> WeightedTask | None:
+    duration_weight = get_duration_weight(task, duration_weights)
 
-def fill_my_sack(
-    max_weight: int,
-    tasks: list[WeightedTask],
-) -> list[WeightedTask]:
-    values = [0 for _ in range(max_weight + 1)]
-    selected: list[list[WeightedTask]] = [[] for _ in range(max_weight + 1)]
+    if rules is None:
+        return WeightedTask(task, duration_weight or 0)
 
-    for task in tasks:
-        for curr_capacity in range(max_weight, 0, -1):
-            if task.weight > curr_capacity:
-                continue
+    active_rules = [
+        rule for rule in rules if rule.weight is not None or rule.limit is not None
+    ]
+    filter_map: dict[str, Rule] = {
+        rule.filter[1:]: rule for rule in active_rules if is_label_rule(rule.filter)
+    }
+    filter_rules = [rule for rule in active_rules if not is_label_rule(rule.filter)]
 
-            take = values[curr_capacity - task.weight] + task.priority
-            dont_take = values[curr_capacity]
+    if not task.labels and not filter_rules and duration_weight is None:
+        logger.debug("Task %s has no labels, ignoring...", task.id)
+        return None
 
-            if take <= dont_take:
-                continue
+    label = next((label for label in task.labels or [] if label in filter_map), None)
+    rule = (
+        filter_map[label]
+        if label
+        else next(
+            (
+                rule
+                for rule in filter_rules
+                if compile_filter(rule.filter)(task, today or date.today())
+            ),
+            None,
+        )
+    )
+    if rule is None:
+        if duration_weight is not None:
+            return WeightedTask(task, duration_weight)
 
-            values[curr_capacity] = take
-            selected[curr_capacity] = selected[curr_capacity - task.weight].copy()
-            selected[curr_capacity].append(task)
+        logger.debug("Task %s has no matching rules, ignoring...", task.id)
+        return None
 
-    return selected[max_weight]
+    # Rules with only a limit cap how many tasks land on a day without
+    # taking up any of its weight capacity
+    return WeightedTask(
+        task,
+        duration_weight if duration_weight is not None else rule.weight or 0,
+        rule.filter if rule.limit is not None else None,
+    )
 
 
-def get_update_params(new_date: date, due: Due) -> UpdateTaskInput:
+def get_update_params(
+    new_date: date, due: Due, at: time | None = None
+) -> UpdateTaskInput:
     update_params: UpdateTaskInput = {}
 
     if isinstance(due.date, datetime):  # pyright: ignore[reportUnknownMemberType]
-        time = datetime.strptime(str(due.date), "%Y-%m-%d %H:%M:%S").time()  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
-        new_datetime = datetime.strptime(f"{new_date} {time}", "%Y-%m-%d %H:%M:%S")
+        due_time = at or datetime.strptime(str(due.date), "%Y-%m-%d %H:%M:%S").time()  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
+        new_datetime = datetime.strptime(f"{new_date} {due_time}", "%Y-%m-%d %H:%M:%S")
         update_params["due_datetime"] = new_datetime
     else:
         new_datetime = datetime.strptime(str(new_date), "%Y-%m-%d")
@@ -91,21 +124,9 @@ def get_update_params(new_date: date, due: Due) -> UpdateTaskInput:
     return update_params
 
 
-def get_weekday_weight(weight_config: WeightConfig | int, date: date) -> int:
-    if isinstance(weight_config, int):
-        return weight_config
-
-    weekday_mapping = [
-        weight_config.monday,
-        weight_config.tuesday,
-        weight_config.wednesday,
-        weight_config.thursday,
-        weight_config.friday,
-        weight_config.saturday,
-        weight_config.sunday,
-    ]
-
-    return weekday_mapping[date.weekday()]
+# Serves tasks already in memory in the API's paginated shape
+async def yield_tasks(tasks: list[Task]) -> AsyncGenerator[list[Task], None]:
+    yield tasks
 
 
 async def filter_tasks(api: TodoistAPIProtocol, query: str) -> list[Task]:
@@ -118,20 +139,242 @@ async def filter_tasks(api: TodoistAPIProtocol, query: str) -> list[Task]:
     return tasks
 
 
+async def get_all_tasks(api: TodoistAPIProtocol) -> list[Task]:
+    tasks: list[Task] = []
+
+    task_generator = await api.get_tasks()
+    async for task_list in task_generator:
+        tasks.extend(task_list)
+
+    return tasks
+
+
+async def fetch_ruleset_tasks(
+    api: TodoistAPIProtocol,
+    rulesets: list[Ruleset],
+    today: date,
+    retry_policy: RetryPolicy,
+) -> list[list[Task]]:
+    get_tasks_with_retry = build_retry(filter_tasks, retry_policy)
+
+    local_filters: list[Filter | None] = []
+    for ruleset in rulesets:
+        try:
+            local_filters.append(compile_filter(ruleset.filter))
+        except FilterSyntaxError as e:
+            logger.warning(f"Querying the server for {ruleset.filter}: {e}")
+            local_filters.append(None)
+
+    # One bulk fetch serves every filter that can be evaluated locally, only
+    # the ones using unsupported syntax still cost a query each
+    fetch_all = any(local_filter is not None for local_filter in local_filters)
+    get_all_with_retry = build_retry(get_all_tasks, retry_policy)
+    results = await asyncio.gather(
+        *([get_all_with_retry(api)] if fetch_all else []),
+        *(
+            get_tasks_with_retry(api, ruleset.filter)
+            for ruleset, local_filter in zip(rulesets, local_filters)
+            if local_filter is None
+        ),
+    )
+    all_tasks = results.pop(0) if fetch_all else []
+
+    server_results = iter(results)
+    return [
+        [task for task in all_tasks if local_filter(task, today)]
+        if local_filter is not None
+        else next(server_results)
+        for local_filter in local_filters
+    ]
+
+
 async def update_task(
     api: TodoistAPIProtocol, task_id: str, **update_params: Unpack[UpdateTaskInput]
 ):
     return await api.update_task(task_id, **update_params)
 
 
-def build_retry(func: WrappedFn) -> WrappedFn:
-    return retry(
-        reraise=True,
-        wait=wait_exponential_jitter(max=120),
-        stop=stop_after_attempt(int(os.getenv("RETRY_ATTEMPTS", "3"))),
-        before=before_log(logger, logging.INFO),
-        after=after_log(logger, logging.INFO),
-    )(func)
+def build_retry[**P, R](
+    func: Callable[P, Awaitable[R]], policy: RetryPolicy | None = None
+) -> Callable[P, Awaitable[R]]:
+    return (policy or RetryPolicy()).wrap(func)
+
+
+def limit_groups(rules: list[Rule] | None) -> tuple[dict[str, int], tuple[int, ...]]:
+    limited_rules = [rule for rule in rules or [] if rule.limit is not None]
+    groups = {rule.filter: index for index, rule in enumerate(limited_rules)}
+    return groups, tuple(rule.limit or 0 for rule in limited_rules)
+
+
+def to_plan_item(task: WeightedTask, groups: dict[str, int]) -> PlanItem:
+    due_date = task.due.date if task.due else date.max  # pyright: ignore[reportUnknownMemberType]
+    if isinstance(due_date, datetime):
+        due_date = due_date.date()
+    deadline = deadline_date(task)
+
+    return PlanItem(
+        task.id,
+        task.weight,
+        task.priority,
+        due_date.toordinal(),  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
+        groups[task.limit_label] if task.limit_label else -1,
+        deadline.toordinal() if deadline else NO_DUE,
+    )
+
+
+def family_roots(tasks: list[WeightedTask]) -> dict[str, str]:
+    # Each task's topmost ancestor among the tasks being planned, found by
+    # following parent ids once per task rather than scanning for children
+    parents = {task.id: task.parent_id for task in tasks}
+    roots: dict[str, str] = {}
+    for task in tasks:
+        path: list[str] = []
+        id = task.id
+        while id not in roots:
+            path.append(id)
+            parent = parents[id]
+            if parent is None or parent not in parents or parent in path:
+                roots[id] = id
+                break
+            id = parent
+
+        for member in path:
+            roots[member] = roots[id]
+
+    return roots
+
+
+def merge_family(root: PlanItem, members: list[PlanItem]) -> PlanItem:
+    # A family moves as one, as heavy as all of its tasks together and as
+    # urgent as the most urgent of them
+    family = [root, *members]
+    return PlanItem(
+        root.id,
+        sum(item.weight for item in family),
+        max(item.value for item in family),
+        min(item.due for item in family),
+        root.group,
+        min(item.deadline for item in family),
+    )
+
+
+def group_families(
+    items: list[PlanItem], roots: dict[str, str]
+) -> tuple[list[PlanItem], dict[str, list[str]]]:
+    members: dict[str, list[PlanItem]] = defaultdict(list)
+    for item in items:
+        if roots[item.id] != item.id:
+            members[roots[item.id]].append(item)
+
+    grouped = [
+        merge_family(item, members[item.id]) if item.id in members else item
+        for item in items
+        if roots[item.id] == item.id
+    ]
+    return grouped, {
+        root: [item.id for item in family] for root, family in members.items()
+    }
+
+
+def combine_rulesets(
+    filter: str,
+    max_weight: WeightConfig | int,
+    rules: list[Rule] | None,
+    duration_weights: DurationWeights | None,
+    rulesets: list[Ruleset] | None,
+) -> list[Ruleset]:
+    # The top-level filter comes straight from the CLI and may be empty, so
+    # it skips the validation applied to rulesets from the rules file
+    return [
+        Ruleset.model_construct(
+            filter=filter,
+            max_weight=max_weight,
+            rules=rules,
+            duration_weights=duration_weights,
+        ),
+        *(rulesets or []),
+    ]
+
+
+async def fetch_tasks(
+    api: TodoistAPIProtocol,
+    rulesets: list[Ruleset],
+    today: date,
+    retry_policy: RetryPolicy,
+    local_filters: bool = False,
+) -> list[list[Task]]:
+    if local_filters:
+        return await fetch_ruleset_tasks(api, rulesets, today, retry_policy)
+
+    get_tasks_with_retry = build_retry(filter_tasks, retry_policy)
+    return await asyncio.gather(
+        *(get_tasks_with_retry(api, ruleset.filter) for ruleset in rulesets)
+    )
+
+
+def build_requests(
+    rulesets: list[Ruleset],
+    ruleset_tasks: list[list[Task]],
+    today: date,
+    owned: list[bool] | None = None,
+    group_subtasks: bool = False,
+) -> tuple[dict[str, WeightedTask], list[PlanRequest], dict[str, list[str]]]:
+    weighted_tasks_by_id: dict[str, WeightedTask] = {}
+    plan_requests: list[PlanRequest] = []
+    # Root id -> ids of the subtasks planned along with it
+    families: dict[str, list[str]] = {}
+    for ruleset, tasks, own in zip(
+        rulesets, ruleset_tasks, owned or [True] * len(rulesets)
+    ):
+        # Add weights based on rules, skipping tasks already claimed by an
+        # earlier ruleset so plans never move the same task twice
+        weighted_tasks_results = [
+            weighted_adapter(task, ruleset.rules, ruleset.duration_weights, today)
+            for task in tasks
+            if task.id not in weighted_tasks_by_id
+        ]
+
+        # Filter out None values
+        weighted_tasks: list[WeightedTask] = [
+            task for task in weighted_tasks_results if task is not None
+        ]
+        ignored = len(weighted_tasks_results) - len(weighted_tasks)
+        if ignored:
+            logger.info(
+                "Ignoring %d task(s) without matching rules for %s",
+                ignored,
+                ruleset.filter,
+                extra={"ignored": ignored, "ruleset": ruleset.filter},
+            )
+
+        weighted_tasks_by_id.update((task.id, task) for task in weighted_tasks)
+        if not own:
+            continue
+
+        groups, limits = limit_groups(ruleset.rules)
+        items = [to_plan_item(task, groups) for task in weighted_tasks]
+        if group_subtasks:
+            items, ruleset_families = group_families(
+                items, family_roots(weighted_tasks)
+            )
+            families.update(ruleset_families)
+
+        plan_requests.append(
+            PlanRequest.from_items(
+                items,
+                weekday_capacities(ruleset.max_weight),
+                today.toordinal(),
+                limits,
+                ruleset.filter,
+            )
+        )
+
+    if families:
+        logger.info(
+            f"Planning {sum(len(members) for members in families.values())} subtask(s) with their parents"
+        )
+
+    return weighted_tasks_by_id, plan_requests, families
 
 
 async def reschedule(
@@ -142,64 +385,146 @@ async def reschedule(
     curr_date: date | None,
     rules: list[Rule] | None = None,
     dry_run: bool = False,
+    rulesets: list[Ruleset] | None = None,
+    planner: Planner | None = None,
+    duration_weights: DurationWeights | None = None,
+    retry_policy: RetryPolicy | None = None,
+    history: RunHistory | None = None,
+    stats: RunStats | None = None,
+    shards: ShardCoordinator | None = None,
+    local_filters: bool = False,
+    working_hours: WorkingHours | None = None,
+    group_subtasks: bool = False,
 ) -> None:
-    get_tasks_with_retry = build_retry(filter_tasks)
-
-    tasks = await get_tasks_with_retry(api, filter)
-
-    # Add weights based on rules
-    weighted_tasks_results = [weighted_adapter(task, rules) for task in tasks]
-
-    # Filter out None values
-    weighted_tasks: list[WeightedTask] = [
-        task for task in weighted_tasks_results if task is not None
-    ]
-
-    weighted_tasks.sort(
-        key=lambda task: datetime.fromisoformat(str(task.due.date))  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
-        if task.due
-        else datetime.max.date(),
-    )
-
-    new_schedule: dict[date, list[WeightedTask]] = defaultdict(list)
-    reschedule_date = curr_date or datetime.now(tz=ZoneInfo(time_zone)).date()
-    while len(weighted_tasks) != 0:
-        weight = get_weekday_weight(max_weight, reschedule_date)
-        next_batch = fill_my_sack(weight, weighted_tasks)
-
-        new_schedule[reschedule_date].extend(next_batch)
-        weighted_tasks = [task for task in weighted_tasks if task not in next_batch]
-
-        reschedule_date += timedelta(days=1)
-
-    update_coroutines: list[Coroutine[Any, Any, Task]] = []
-    for new_date, weighted_tasks in new_schedule.items():
-        for task in weighted_tasks:
-            # (p and ((q and r) or (s and t)))
-            # (!p or ((!q or !r) and (!s or !t)))
-            if not task.due or (
-                task.due.date == new_date  # pyright: ignore[reportUnknownMemberType]
-                and (
-                    not isinstance(task.due.date, datetime)  # pyright: ignore[reportUnknownMemberType]
-                    or task.due.date.date() == new_date  # pyright: ignore[reportUnknownMemberType]
-                )
-            ):
-                continue
+    planner = planner or Planner()
+    # One policy for the whole run, so retries share a budget and back off
+    # together instead of each request hammering the API on its own
+    retry_policy = retry_policy or RetryPolicy()
+
+    with track_run(
+        history, retry_policy, dry_run, stats, planner.memory_budget
+    ) as stats:
+        all_rulesets = combine_rulesets(
+            filter, max_weight, rules, duration_weights, rulesets
+        )
+
+        owned = (
+            shards.owned([ruleset.filter for ruleset in all_rulesets])
+            if shards is not None
+            else [True] * len(all_rulesets)
+        )
+        if not any(owned):
+            logger.info("No rulesets belong to this replica's shards, skipping run")
+            return
+
+        # Earlier rulesets claim their tasks first, so they are fetched even
+        # when another replica plans them, or a task could be moved twice
+        last_owned = max(index for index, own in enumerate(owned) if own)
+        all_rulesets = all_rulesets[: last_owned + 1]
+
+        reschedule_date = curr_date or datetime.now(tz=ZoneInfo(time_zone)).date()
+
+        with stats.phase("fetch"):
+            ruleset_tasks = await fetch_tasks(
+                api, all_rulesets, reschedule_date, retry_policy, local_filters
+            )
 
-            update_params = get_update_params(new_date, task.due)
+        weighted_tasks_by_id, plan_requests, families = build_requests(
+            all_rulesets, ruleset_tasks, reschedule_date, owned, group_subtasks
+        )
 
+        pending_requests = [
+            request for request in plan_requests if not planner.is_settled(request)
+        ]
+        if len(pending_requests) < len(plan_requests):
             logger.info(
-                f"Rescheduling {task.content} from {task.due.date} to {update_params['due_date'] if 'due_date' in update_params else update_params['due_datetime']}"  # pyright: ignore[reportUnknownMemberType, reportTypedDictNotRequiredAccess]
+                f"Backlog unchanged since the last run, skipping {len(plan_requests) - len(pending_requests)} plan(s)"
             )
 
-            if dry_run:
-                continue
+        with stats.phase("plan"):
+            plans = await planner.solve(pending_requests)
 
-            update_task_with_retry = build_retry(update_task)
-            update_coroutines.append(
-                update_task_with_retry(api, task.id, **update_params)
+        stats.tasks = len(weighted_tasks_by_id)
+        stats.plans = len(plan_requests)
+        stats.skipped_plans = len(plan_requests) - len(pending_requests)
+
+        new_schedule: dict[date, list[WeightedTask]] = defaultdict(list)
+        for plan in plans:
+            for task_id, ordinal in plan.items():
+                # Subtasks follow their family's root to its day
+                new_schedule[date.fromordinal(ordinal)].extend(
+                    weighted_tasks_by_id[id]
+                    for id in (task_id, *families.get(task_id, ()))
+                )
+        stats.planned = sum(len(tasks) for tasks in new_schedule.values())
+
+        # Moved timed tasks are given free slots around the tasks already on
+        # their new day, rather than all keeping their old times
+        slots = (
+            plan_slots(
+                new_schedule,
+                (task for tasks in ruleset_tasks for task in tasks),
+                working_hours,
             )
+            if working_hours is not None
+            else {}
+        )
+
+        # Decided once, so the loop below only formats lines that are emitted
+        log_moves = logger.isEnabledFor(logging.DEBUG)
+        update_task_with_retry = build_retry(update_task, retry_policy)
+        update_coroutines: list[Awaitable[Task]] = []
+        for new_date, weighted_tasks in sorted(new_schedule.items()):
+            for task in weighted_tasks:
+                # (p and ((q and r) or (s and t)))
+                # (!p or ((!q or !r) and (!s or !t)))
+                if not task.due or (
+                    task.due.date == new_date  # pyright: ignore[reportUnknownMemberType]
+                    and (
+                        not isinstance(task.due.date, datetime)  # pyright: ignore[reportUnknownMemberType]
+                        or task.due.date.date() == new_date  # pyright: ignore[reportUnknownMemberType]
+                    )
+                ):
+                    continue
+
+                update_params = get_update_params(
+                    new_date, task.due, slots.get(task.id)
+                )
+                stats.moves += 1
+
+                if log_moves or sampled(task.id):
+                    logger.log(
+                        logging.DEBUG if log_moves else logging.INFO,
+                        "Rescheduling %s from %s to %s",
+                        task.content,
+                        task.due.date,  # pyright: ignore[reportUnknownMemberType]
+                        update_params.get("due_datetime") or new_date,
+                        extra={"task_id": task.id},
+                    )
+
+                if dry_run:
+                    continue
+
+                update_coroutines.append(
+                    update_task_with_retry(api, task.id, **update_params)
+                )
 
-    # Wait for all update tasks to complete
-    if update_coroutines:
-        await asyncio.gather(*update_coroutines)
+        logger.info(
+            "Rescheduling %d of %d planned task(s) across %d day(s)",
+            stats.moves,
+            stats.planned,
+            len(new_schedule),
+            extra={"moves": stats.moves, "planned": stats.planned},
+        )
+
+        # Wait for all update tasks to complete
+        if update_coroutines:
+            with stats.phase("apply"):
+                await asyncio.gather(*update_coroutines)
+
+        if not dry_run:
+            for request, plan in zip(pending_requests, plans):
+                planner.settle(request, plan)
+
+        if shards is not None:
+            shards.hand_over()
@@ -0,0 +1,189 @@
+import asyncio
+import functools
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+from requests import HTTPError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# Gap between calls after the first throttled response, doubled by each one
+# after that and shrunk a little by every success
+MIN_INTERVAL = 0.01
+MAX_INTERVAL = 2.0
+SPEEDUP = 0.999
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def throttled(error: Exception) -> bool:
+    response = error.response if isinstance(error, HTTPError) else None
+    return response is not None and response.status_code == 429
+
+
+def retry_after(error: Exception) -> float | None:
+    response = error.response if isinstance(error, HTTPError) else None
+    header = response.headers.get("Retry-After") if response is not None else None
+
+    try:
+        return float(header) if header else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        attempts: int | None = None,
+        max_retries: int | None = None,
+        max_elapsed: float | None = None,
+        failure_threshold: int = 10,
+        cooldown: float = 60,
+        max_delay: float = 120,
+        max_in_flight: int | None = None,
+    ) -> None:
+        self.attempts = attempts or int(os.getenv("RETRY_ATTEMPTS", "3"))
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("RETRY_BUDGET", "100"))
+        )
+        self.max_elapsed = (
+            max_elapsed
+            if max_elapsed is not None
+            else float(os.getenv("RETRY_MAX_SECONDS", "600"))
+        )
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_delay = max_delay
+        # Calls waiting here haven't been sent yet, so a throttled response
+        # can still slow them down. Only this many can already be on their way
+        self.in_flight = asyncio.Semaphore(
+            max_in_flight or int(os.getenv("RETRY_MAX_IN_FLIGHT", "16"))
+        )
+
+        self.started = time.monotonic()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        # Shared by every request, so one throttled response slows them all
+        self.resume_at = 0.0
+        # Calls are let through one interval apart, so waiters don't all hit
+        # the API the moment a backoff ends
+        self.interval = 0.0
+        self.next_call = 0.0
+        self.opened_at: float | None = None
+
+    def wrap[**P, R](
+        self, func: Callable[P, Awaitable[R]]
+    ) -> Callable[P, Awaitable[R]]:
+        @functools.wraps(func)
+        async def wrapped(*args: P.args, **kwargs: P.kwargs) -> R:
+            return await self.call(func, *args, **kwargs)
+
+        return wrapped
+
+    async def call[R](
+        self, func: Callable[..., Awaitable[R]], *args: Any, **kwargs: Any
+    ) -> R:
+        attempt = 1
+        while True:
+            try:
+                async with self.in_flight:
+                    self.check_circuit()
+                    await self.wait_for_backoff()
+                    self.calls += 1
+                    result = await func(*args, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                self.record_failure(e)
+                if not self.may_retry(attempt):
+                    raise
+
+                self.retries += 1
+                logger.info(
+                    f"Retrying {getattr(func, '__name__', func)} after attempt {attempt} failed: {e}"
+                )
+                attempt += 1
+                continue
+
+            self.record_success()
+            return result
+
+    def check_circuit(self) -> None:
+        if self.opened_at is None:
+            return
+
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError(
+                f"Todoist API failed {self.consecutive_failures} times in a row, not calling it for another {remaining:.0f} seconds"
+            )
+
+        # Half-open: let calls through again, a single failure re-opens it
+        self.opened_at = None
+
+    async def wait_for_backoff(self) -> None:
+        now = time.monotonic()
+        start = max(now, self.resume_at, self.next_call)
+        self.next_call = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def record_failure(self, error: Exception) -> None:
+        self.failures += 1
+        # A throttled API is still up, so it is paced rather than counted
+        # towards opening the circuit
+        if not throttled(error):
+            self.consecutive_failures += 1
+        now = time.monotonic()
+
+        # Failures of calls made before the backoff started are the same
+        # episode, and only slow calls down once
+        if now >= self.resume_at:
+            self.interval = min(max(self.interval * 2, MIN_INTERVAL), MAX_INTERVAL)
+
+        delay = retry_after(error)
+        if delay is None:
+            exponent = min(max(self.consecutive_failures - 1, 0), 16)
+            delay = 2**exponent + random.uniform(0, 1)
+        else:
+            delay += random.uniform(0, delay / 2)
+        self.resume_at = max(self.resume_at, now + min(delay, self.max_delay))
+
+        if self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(
+                    f"Todoist API failed {self.consecutive_failures} times in a row, pausing calls for {self.cooldown} seconds"
+                )
+            self.opened_at = now
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.interval = (
+            self.interval * SPEEDUP if self.interval > MIN_INTERVAL / 2 else 0.0
+        )
+
+    def may_retry(self, attempt: int) -> bool:
+        if attempt >= self.attempts or self.opened_at is not None:
+            return False
+
+        if self.retries >= self.max_retries:
+            logger.warning(f"Retry budget of {self.max_retries} retries used up")
+            return False
+
+        if time.monotonic() - self.started >= self.max_elapsed:
+            logger.warning(f"Retry deadline of {self.max_elapsed} seconds passed")
+            return False
+
+        return True
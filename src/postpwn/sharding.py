@@ -0,0 +1,220 @@
+import bisect
+import hashlib
+import logging
+import math
+import socket
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from postpwn.cron import CronSchedule
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Long enough to outlast a run, so a lease only lapses when its replica is gone
+LEASE_SECONDS = 60 * 60
+
+
+def lease_seconds(schedule: CronSchedule | None, time_zone: str) -> float:
+    # Replicas only renew their leases when they run, so leases outlast the
+    # longest wait between two runs. Otherwise every lease lapses between
+    # ticks and the first replica to run takes every shard
+    if schedule is None:
+        return LEASE_SECONDS
+
+    gap = schedule.longest_gap(datetime.now(ZoneInfo(time_zone)))
+    return max(LEASE_SECONDS, 2 * gap.total_seconds())
+
+
+def stable_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    def __init__(self, shards: int, vnodes: int = 64) -> None:
+        self.shards = shards
+        # Consistent hashing keeps most keys on the same shard when the shard
+        # count changes, so resharding doesn't reshuffle every ruleset
+        points = sorted(
+            (stable_hash(f"{shard}:{vnode}"), shard)
+            for shard in range(shards)
+            for vnode in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.owners = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        index = bisect.bisect(self.hashes, stable_hash(key)) % len(self.hashes)
+        return self.owners[index]
+
+
+class LeaseStore:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._transaction() as conn:
+            _ = conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    shard INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            _ = conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS replicas (
+                    owner TEXT PRIMARY KEY,
+                    seen_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(
+            sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        ) as conn:
+            # Take the write lock up front so replicas claim shards one at a time
+            _ = conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                _ = conn.execute("ROLLBACK")
+                raise
+            _ = conn.execute("COMMIT")
+
+    def heartbeat(self, owner: str) -> None:
+        with self._transaction() as conn:
+            self._heartbeat(conn, owner, time.time())
+
+    def _heartbeat(self, conn: sqlite3.Connection, owner: str, now: float) -> None:
+        _ = conn.execute(
+            "INSERT INTO replicas (owner, seen_at) VALUES (?, ?) "
+            "ON CONFLICT (owner) DO UPDATE SET seen_at = excluded.seen_at",
+            (owner, now),
+        )
+
+    def claim(self, owner: str, shards: int, ttl: float) -> tuple[set[int], set[int]]:
+        now = time.time()
+        with self._transaction() as conn:
+            self._heartbeat(conn, owner, now)
+
+            (live,) = conn.execute(
+                "SELECT COUNT(*) FROM replicas WHERE seen_at > ?", (now - ttl,)
+            ).fetchone()
+            fair_share = math.ceil(shards / max(live, 1))
+
+            leases: dict[int, str] = dict(
+                conn.execute(
+                    "SELECT shard, owner FROM leases WHERE expires_at > ?", (now,)
+                ).fetchall()
+            )
+
+            # Each replica prefers its own order of shards, so replicas
+            # spread out instead of racing for the same ones
+            preference = sorted(
+                range(shards), key=lambda shard: stable_hash(f"{owner}:{shard}")
+            )
+            held = [shard for shard in preference if leases.get(shard) == owner]
+            free = [shard for shard in preference if shard not in leases]
+
+            keep = held[:fair_share]
+            claimed = keep + free[: fair_share - len(keep)]
+            # Shards beyond the fair share are still planned this run and
+            # only handed over once it is done, so none is skipped
+            surplus = held[fair_share:]
+
+            _ = conn.executemany(
+                "INSERT INTO leases (shard, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (shard) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                [(shard, owner, now + ttl) for shard in claimed + surplus],
+            )
+
+        return set(claimed + surplus), set(surplus)
+
+    def hand_over(self, owner: str, surplus: set[int], shards: int, ttl: float) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            live = [
+                replica
+                for (replica,) in conn.execute(
+                    "SELECT owner FROM replicas WHERE seen_at > ? AND owner != ?",
+                    (now - ttl, owner),
+                ).fetchall()
+            ]
+            if not live:
+                return
+
+            counts = {replica: 0 for replica in live}
+            for (replica,) in conn.execute(
+                "SELECT owner FROM leases WHERE expires_at > ?", (now,)
+            ).fetchall():
+                if replica in counts:
+                    counts[replica] += 1
+            fair_share = math.ceil(shards / (len(live) + 1))
+
+            # Leases move straight to a replica short of its share, so every
+            # shard always has an owner planning it
+            for shard in sorted(surplus):
+                replica = min(counts, key=lambda replica: (counts[replica], replica))
+                if counts[replica] >= fair_share:
+                    break
+
+                _ = conn.execute(
+                    "UPDATE leases SET owner = ?, expires_at = ? "
+                    "WHERE shard = ? AND owner = ?",
+                    (replica, now + ttl, shard, owner),
+                )
+                counts[replica] += 1
+                logger.info(f"Handed shard {shard} over to replica {replica}")
+
+    def release(self, owner: str) -> None:
+        with self._transaction() as conn:
+            _ = conn.execute("DELETE FROM leases WHERE owner = ?", (owner,))
+            _ = conn.execute("DELETE FROM replicas WHERE owner = ?", (owner,))
+
+
+class ShardCoordinator:
+    def __init__(
+        self,
+        shards: int,
+        lease_db: str | Path,
+        owner: str | None = None,
+        ttl: float = LEASE_SECONDS,
+    ) -> None:
+        self.ring = HashRing(shards)
+        self.leases = LeaseStore(lease_db)
+        # Stable across restarts, so a restarted replica keeps its own leases
+        # rather than waiting for them to lapse
+        self.owner = owner or socket.gethostname()
+        self.ttl = ttl
+        self.surplus: set[int] = set()
+
+        # Announce this replica straight away so the first claims already
+        # split shards between every replica that has started
+        self.leases.heartbeat(self.owner)
+
+    def owned(self, keys: list[str]) -> list[bool]:
+        shards, self.surplus = self.leases.claim(self.owner, self.ring.shards, self.ttl)
+        logger.info(f"Replica {self.owner} holds shard(s) {sorted(shards)}")
+
+        return [self.ring.shard_for(key) in shards for key in keys]
+
+    def hand_over(self) -> None:
+        if self.surplus:
+            self.leases.hand_over(self.owner, self.surplus, self.ring.shards, self.ttl)
+            self.surplus = set()
+
+    def close(self) -> None:
+        # Frees this replica's shards for the others straight away instead of
+        # leaving them leased until their leases lapse
+        self.leases.release(self.owner)
+        logger.info(f"Replica {self.owner} released its shards")
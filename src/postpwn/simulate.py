@@ -0,0 +1,215 @@
+import itertools
+import logging
+import math
+from collections import defaultdict
+from concurrent.futures import Executor
+from dataclasses import dataclass, field, replace
+from datetime import date
+
+from todoist_api_python.models import Task
+
+from postpwn.planner import NO_DUE, Plan, PlanRequest, solve
+from postpwn.rescheduler import build_requests
+from postpwn.solvers import Strategy
+from postpwn.types import Rule, Ruleset, WeightConfig
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Days of load shown for each scenario
+LOAD_DAYS = 7
+
+
+@dataclass(frozen=True)
+class Scenario:
+    capacity_scale: float = 1.0
+    # Rule filter -> weight used instead of the one in the rules file
+    weights: dict[str, int] = field(default_factory=dict[str, int])
+
+    def label(self) -> str:
+        overrides = [f"{filter}={weight}" for filter, weight in self.weights.items()]
+        return " ".join([f"x{self.capacity_scale:g}", *overrides])
+
+
+@dataclass(frozen=True)
+class Outcome:
+    scenario: Scenario
+    tasks: int
+    days_to_clear: int
+    moved: int
+    unplanned: int
+    # Planned weight on each day from the first planned day on
+    load: list[int]
+
+
+def parse_weight(option: str) -> tuple[str, list[int]]:
+    filter, separator, weights = option.rpartition("=")
+    if not separator or not filter:
+        raise ValueError(f"Expected FILTER=WEIGHT[,WEIGHT...], got '{option}'")
+
+    try:
+        parsed = [int(weight) for weight in weights.split(",")]
+    except ValueError as e:
+        raise ValueError(f"Weights for {filter} must be whole numbers") from e
+
+    # Held to the same bounds as Rule.weight, which model_copy doesn't validate
+    if any(weight < 1 for weight in parsed):
+        raise ValueError(f"Weights for {filter} must be at least 1")
+
+    return filter, parsed
+
+
+def scenarios(
+    capacity_scales: list[float], weights: dict[str, list[int]]
+) -> list[Scenario]:
+    filters = list(weights)
+    return [
+        Scenario(scale, dict(zip(filters, combination)))
+        for scale in capacity_scales or [1.0]
+        for combination in itertools.product(*weights.values())
+    ]
+
+
+def scale_capacity(max_weight: WeightConfig | int, scale: float) -> WeightConfig | int:
+    if isinstance(max_weight, int):
+        return math.floor(max_weight * scale)
+
+    return WeightConfig(
+        **{
+            day: math.floor(capacity * scale)
+            for day, capacity in max_weight.model_dump().items()
+        }
+    )
+
+
+def apply_scenario(rulesets: list[Ruleset], scenario: Scenario) -> list[Ruleset]:
+    def reweigh(rules: list[Rule] | None) -> list[Rule] | None:
+        if rules is None:
+            return None
+
+        return [
+            rule.model_copy(update={"weight": scenario.weights[rule.filter]})
+            if rule.filter in scenario.weights
+            else rule
+            for rule in rules
+        ]
+
+    return [
+        ruleset.model_copy(
+            update={
+                "max_weight": scale_capacity(
+                    ruleset.max_weight, scenario.capacity_scale
+                ),
+                "rules": reweigh(ruleset.rules),
+            }
+        )
+        for ruleset in rulesets
+    ]
+
+
+def measure(
+    scenario: Scenario,
+    requests: list[PlanRequest],
+    plans: list[Plan],
+    start: int,
+    families: dict[str, list[str]] | None = None,
+) -> Outcome:
+    load: dict[int, int] = defaultdict(int)
+    moved = 0
+    tasks = 0
+    planned = 0
+    for request, plan in zip(requests, plans):
+        for id, weight, due in zip(request.ids, request.weights, request.dues):
+            # Subtasks grouped with their parent are counted with it
+            size = 1 + len((families or {}).get(id, ()))
+            tasks += size
+            if id not in plan:
+                continue
+
+            planned += size
+            load[plan[id]] += weight
+            # Tasks without a due date are never given one
+            moved += size * (due != NO_DUE and plan[id] != due)
+
+    last_day = max(load, default=start - 1)
+    return Outcome(
+        scenario=scenario,
+        tasks=tasks,
+        days_to_clear=last_day - start + 1,
+        moved=moved,
+        unplanned=tasks - planned,
+        load=[load[day] for day in range(start, last_day + 1)],
+    )
+
+
+def simulate(
+    rulesets: list[Ruleset],
+    ruleset_tasks: list[list[Task]],
+    today: date,
+    candidates: list[Scenario],
+    executor: Executor | None = None,
+    strategy: Strategy = "auto",
+    minimize_churn: bool = False,
+    meet_deadlines: bool = False,
+    group_subtasks: bool = False,
+    memory_budget: int | None = None,
+) -> list[Outcome]:
+    # Requests are built up front, so the workers only ever plan
+    batches: list[list[PlanRequest]] = []
+    scenario_families: list[dict[str, list[str]]] = []
+    for scenario in candidates:
+        _, requests, families = build_requests(
+            apply_scenario(rulesets, scenario),
+            ruleset_tasks,
+            today,
+            group_subtasks=group_subtasks,
+        )
+        scenario_families.append(families)
+        batches.append(
+            [
+                replace(
+                    request,
+                    strategy=strategy,
+                    minimize_churn=minimize_churn,
+                    meet_deadlines=meet_deadlines,
+                    memory_budget=memory_budget,
+                )
+                for request in requests
+            ]
+        )
+
+    flat = [request for requests in batches for request in requests]
+    logger.info(f"Simulating {len(candidates)} scenario(s) across {len(flat)} plan(s)")
+    plans = iter(executor.map(solve, flat) if executor else map(solve, flat))
+
+    return [
+        measure(
+            scenario,
+            requests,
+            [next(plans) for _ in requests],
+            today.toordinal(),
+            families,
+        )
+        for scenario, requests, families in zip(candidates, batches, scenario_families)
+    ]
+
+
+def format_outcomes(outcomes: list[Outcome]) -> str:
+    width = max(
+        [len("scenario"), *(len(outcome.scenario.label()) for outcome in outcomes)]
+    )
+    lines = [
+        f"{'scenario':<{width}} {'tasks':>6} {'days':>5} {'moved':>6} "
+        f"{'unplanned':>9} {'peak':>5}  daily load"
+    ]
+    for outcome in outcomes:
+        load = " ".join(str(weight) for weight in outcome.load[:LOAD_DAYS])
+        if len(outcome.load) > LOAD_DAYS:
+            load += " ..."
+        lines.append(
+            f"{outcome.scenario.label():<{width}} {outcome.tasks:>6} "
+            f"{outcome.days_to_clear:>5} {outcome.moved:>6} {outcome.unplanned:>9} "
+            f"{max(outcome.load, default=0):>5}  {load}"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,132 @@
+import logging
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, datetime, time
+
+from todoist_api_python.models import Task
+
+from postpwn.filters import due_date
+from postpwn.types import WorkingHours
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def due_time(task: Task) -> time | None:
+    due = task.due.date if task.due else None  # pyright: ignore[reportUnknownMemberType]
+    return due.time() if isinstance(due, datetime) else None
+
+
+def task_minutes(task: Task, default: int) -> int | None:
+    if task.duration is None:
+        return default
+
+    # Tasks lasting days don't fit in a single day's slots
+    return task.duration.amount if task.duration.unit == "minute" else None
+
+
+class FreeSlots:
+    # Free intervals of one day in minutes after midnight, kept sorted and
+    # disjoint. Bisection finds the gap around a time, but placing a task
+    # still scans outwards over gaps too short for it and splices the lists,
+    # so it is O(gaps). A day has at most 720 gaps, too few for an interval
+    # tree to pay off
+    def __init__(self, start: int, end: int) -> None:
+        self.starts: list[int] = [start] if start < end else []
+        self.ends: list[int] = [end] if start < end else []
+
+    def reserve(self, start: int, end: int) -> None:
+        first = bisect_right(self.ends, start)
+        last = first
+        starts: list[int] = []
+        ends: list[int] = []
+        while last < len(self.starts) and self.starts[last] < end:
+            if self.starts[last] < start:
+                starts.append(self.starts[last])
+                ends.append(start)
+            if self.ends[last] > end:
+                starts.append(end)
+                ends.append(self.ends[last])
+            last += 1
+
+        self.starts[first:last] = starts
+        self.ends[first:last] = ends
+
+    def place(self, duration: int, preferred: int) -> int | None:
+        index = bisect_right(self.ends, preferred)
+
+        # As close to the preferred time as possible, later if there's room
+        # and otherwise earlier
+        for gap in range(index, len(self.starts)):
+            start = max(self.starts[gap], preferred)
+            if start + duration <= self.ends[gap]:
+                self.reserve(start, start + duration)
+                return start
+
+        for gap in range(min(index, len(self.starts) - 1), -1, -1):
+            start = min(self.ends[gap], preferred) - duration
+            if start >= self.starts[gap]:
+                self.reserve(start, start + duration)
+                return start
+
+        return None
+
+
+def allocate_slots(
+    fixed: Iterable[Task], moving: Iterable[Task], hours: WorkingHours
+) -> dict[str, time]:
+    slots = FreeSlots(minutes(hours.start), minutes(hours.end))
+    for task in fixed:
+        at = due_time(task)
+        length = task_minutes(task, hours.default_duration)
+        if at is not None and length is not None:
+            slots.reserve(minutes(at), minutes(at) + length)
+
+    placed: dict[str, time] = {}
+    # Higher priorities get first pick of the day
+    for task in sorted(
+        moving, key=lambda task: (-task.priority, due_time(task) or time())
+    ):
+        at = due_time(task)
+        length = task_minutes(task, hours.default_duration)
+        if at is None or length is None:
+            continue
+
+        start = slots.place(length, minutes(at))
+        if start is None:
+            logger.debug("No free slot for %s, keeping its time", task.content)
+            continue
+
+        placed[task.id] = time(start // 60, start % 60)
+
+    return placed
+
+
+def plan_slots(
+    schedule: dict[date, list[Task]], backlog: Iterable[Task], hours: WorkingHours
+) -> dict[str, time]:
+    moving: dict[date, list[Task]] = defaultdict(list)
+    moved: set[str] = set()
+    for day, tasks in schedule.items():
+        for task in tasks:
+            if due_time(task) is not None and due_date(task) != day:
+                moving[day].append(task)
+                moved.add(task.id)
+
+    # Timed tasks staying put keep their slots, whether or not they were planned
+    fixed: dict[date, list[Task]] = defaultdict(list)
+    for task in backlog:
+        day = due_date(task)
+        if day in moving and task.id not in moved and due_time(task) is not None:
+            fixed[day].append(task)
+
+    placed: dict[str, time] = {}
+    for day, tasks in moving.items():
+        placed.update(allocate_slots(fixed[day], tasks, hours))
+
+    return placed
@@ -0,0 +1,340 @@
+import asyncio
+import json
+import logging
+import mmap
+import sys
+from array import array
+from collections.abc import AsyncGenerator, Callable
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+from typing import Any
+
+from todoist_api_python.models import Deadline, Due, Duration, Task
+
+from postpwn.api import TodoistAPIProtocol
+from postpwn.filters import FilterSyntaxError, compile_filter, due_date
+from postpwn.rescheduler import build_retry, filter_tasks, yield_tasks
+from postpwn.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Ends in the format version, bumped whenever the layout changes
+MAGIC = b"POSTPWN1"
+ALIGNMENT = 8
+
+# Stand-in for the timestamps the planner never looks at
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+type Column = tuple[str, array[int]]
+
+
+def pad(size: int) -> int:
+    return -size % ALIGNMENT
+
+
+def string_column(values: list[str]) -> list[Column]:
+    # Strings are one UTF-8 blob plus offsets, so a reader slices them out
+    # without parsing anything
+    encoded = [value.encode() for value in values]
+    offsets = array("Q", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return [("Q", offsets), ("B", array("B", b"".join(encoded)))]
+
+
+def encode_columns(tasks: list[Task]) -> dict[str, list[Column]]:
+    dues = [task.due for task in tasks]
+    due_times = [
+        due.date if due and isinstance(due.date, datetime) else None  # pyright: ignore[reportUnknownMemberType]
+        for due in dues
+    ]
+    label_counts = array("Q", [0])
+    for task in tasks:
+        label_counts.append(label_counts[-1] + len(task.labels or []))
+
+    return {
+        "id": string_column([task.id for task in tasks]),
+        "content": string_column([task.content for task in tasks]),
+        "labels": [
+            ("Q", label_counts),
+            *string_column([label for task in tasks for label in task.labels or []]),
+        ],
+        "priority": [("B", array("B", [task.priority for task in tasks]))],
+        "due": [
+            (
+                "i",
+                array(
+                    "i", [(due_date(task) or date.min).toordinal() for task in tasks]
+                ),
+            )
+        ],
+        # Seconds after midnight for tasks due at a time, -1 for a whole day
+        "due_time": [
+            (
+                "i",
+                array(
+                    "i",
+                    [
+                        value.hour * 3600 + value.minute * 60 + value.second  # pyright: ignore[reportUnknownMemberType]
+                        if value
+                        else -1
+                        for value in due_times
+                    ],
+                ),
+            )
+        ],
+        "due_string": string_column([due.string if due else "" for due in dues]),
+        "recurring": [
+            ("B", array("B", [bool(due and due.is_recurring) for due in dues]))
+        ],
+        "deadline": [
+            (
+                "i",
+                array(
+                    "i",
+                    [
+                        task.deadline.date.toordinal()
+                        if task.deadline
+                        else date.min.toordinal()
+                        for task in tasks
+                    ],
+                ),
+            )
+        ],
+        # Minutes for minute durations, negative days for day durations
+        "duration": [
+            (
+                "i",
+                array(
+                    "i",
+                    [
+                        0
+                        if task.duration is None
+                        else task.duration.amount
+                        if task.duration.unit == "minute"
+                        else -task.duration.amount
+                        for task in tasks
+                    ],
+                ),
+            )
+        ],
+        "assignee_id": string_column([task.assignee_id or "" for task in tasks]),
+        "creator_id": string_column([task.creator_id for task in tasks]),
+        "parent_id": string_column([task.parent_id or "" for task in tasks]),
+    }
+
+
+def write_snapshot(
+    path: str | Path,
+    tasks: list[Task],
+    queries: dict[str, list[str]],
+    taken_on: date,
+) -> None:
+    rows = {task.id: index for index, task in enumerate(tasks)}
+    columns = encode_columns(tasks)
+    for index, ids in enumerate(queries.values()):
+        columns[f"query:{index}"] = [("I", array("I", [rows[id] for id in ids]))]
+
+    # Offsets are relative to the end of the header, which is padded so
+    # every array starts on an aligned boundary when the file is mapped
+    layout: dict[str, list[tuple[str, int, int]]] = {}
+    offset = 0
+    for name, parts in columns.items():
+        layout[name] = []
+        for typecode, values in parts:
+            size = len(values) * values.itemsize
+            layout[name].append((typecode, offset, len(values)))
+            offset += size + pad(size)
+
+    header = json.dumps(
+        {
+            "rows": len(tasks),
+            "taken_on": taken_on.isoformat(),
+            "byteorder": sys.byteorder,
+            "queries": list(queries),
+            "columns": layout,
+        }
+    ).encode()
+    header += b" " * pad(len(MAGIC) + 4 + len(header))
+
+    with open(path, "wb") as f:
+        _ = f.write(MAGIC + len(header).to_bytes(4, "little") + header)
+        for parts in columns.values():
+            for _, values in parts:
+                values.tofile(f)
+                _ = f.write(b"\0" * pad(len(values) * values.itemsize))
+
+    logger.info(f"Wrote {len(tasks)} task(s) and {len(queries)} filter(s) to {path}")
+
+
+class Snapshot:
+    def __init__(self, path: str | Path) -> None:
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a postpwn snapshot")
+
+        length = int.from_bytes(self.buffer[len(MAGIC) : len(MAGIC) + 4], "little")
+        start = len(MAGIC) + 4
+        header = json.loads(self.buffer[start : start + length])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(
+                f"{path} was written on a {header['byteorder']}-endian host"
+            )
+
+        self.rows: int = header["rows"]
+        self.taken_on = date.fromisoformat(header["taken_on"])
+        self.queries: list[str] = header["queries"]
+        self.layout: dict[str, list[list[Any]]] = header["columns"]
+        self.data = memoryview(self.buffer)[start + length :]
+
+    def column(self, name: str) -> list[memoryview]:
+        # Views straight into the mapped file, nothing is copied or parsed
+        return [
+            self.data[offset : offset + count * array(typecode).itemsize].cast(typecode)
+            for typecode, offset, count in self.layout[name]
+        ]
+
+    def strings(self, name: str) -> Callable[[int], str]:
+        *_, offsets, blob = self.column(name)
+        return lambda row: bytes(blob[offsets[row] : offsets[row + 1]]).decode()
+
+    def tasks(self) -> list[Task]:
+        ids = self.strings("id")
+        contents = self.strings("content")
+        due_strings = self.strings("due_string")
+        assignees = self.strings("assignee_id")
+        creators = self.strings("creator_id")
+        parents = self.strings("parent_id")
+        label_counts, *_ = self.column("labels")
+        labels = self.strings("labels")
+        (priorities,) = self.column("priority")
+        (dues,) = self.column("due")
+        (due_times,) = self.column("due_time")
+        (recurring,) = self.column("recurring")
+        (deadlines,) = self.column("deadline")
+        (durations,) = self.column("duration")
+        no_date = date.min.toordinal()
+
+        tasks: list[Task] = []
+        for row in range(self.rows):
+            due = None
+            if dues[row] != no_date:
+                due_on = date.fromordinal(dues[row])
+                due = Due(
+                    date=due_on
+                    if due_times[row] < 0
+                    else datetime.combine(
+                        due_on,
+                        time(
+                            due_times[row] // 3600,
+                            due_times[row] // 60 % 60,
+                            due_times[row] % 60,
+                        ),
+                    ),
+                    string=due_strings(row),
+                    is_recurring=bool(recurring[row]),
+                )
+
+            tasks.append(
+                Task(
+                    id=ids(row),
+                    content=contents(row),
+                    description="",
+                    project_id="",
+                    section_id=None,
+                    parent_id=parents(row) or None,
+                    labels=[
+                        labels(index)
+                        for index in range(label_counts[row], label_counts[row + 1])
+                    ],
+                    priority=priorities[row],
+                    due=due,
+                    deadline=Deadline(date=date.fromordinal(deadlines[row]))
+                    if deadlines[row] != no_date
+                    else None,
+                    duration=Duration(
+                        abs(durations[row]), "minute" if durations[row] > 0 else "day"
+                    )
+                    if durations[row]
+                    else None,
+                    is_collapsed=False,
+                    order=row,
+                    assignee_id=assignees(row) or None,
+                    assigner_id=None,
+                    completed_at=None,
+                    creator_id=creators(row),
+                    created_at=EPOCH,
+                    updated_at=EPOCH,
+                )
+            )
+
+        return tasks
+
+    def query(self, index: int) -> memoryview:
+        (rows,) = self.column(f"query:{index}")
+        return rows
+
+
+class SnapshotAPI:
+    def __init__(self, snapshot: Snapshot) -> None:
+        self.snapshot = snapshot
+        self.tasks = snapshot.tasks()
+        self.by_id = {task.id: task for task in self.tasks}
+        self.updates: list[tuple[str, dict[str, Any]]] = []
+
+    async def get_tasks(self, **_: Any) -> AsyncGenerator[list[Task], None]:
+        return yield_tasks(self.tasks)
+
+    async def filter_tasks(
+        self,
+        *,
+        query: str | None = None,
+        lang: str | None = None,
+        limit: int | None = None,
+    ) -> AsyncGenerator[list[Task], None]:
+        if query in self.snapshot.queries:
+            rows = self.snapshot.query(self.snapshot.queries.index(query))
+            return yield_tasks([self.tasks[row] for row in rows])
+
+        # Filters that weren't recorded can still be replayed if they can be
+        # evaluated locally
+        try:
+            matches = compile_filter(query or "")
+        except FilterSyntaxError as e:
+            raise ValueError(f"Filter {query} is not in the snapshot: {e}") from e
+
+        return yield_tasks(
+            [task for task in self.tasks if matches(task, self.snapshot.taken_on)]
+        )
+
+    async def update_task(self, task_id: str, **update_params: Any) -> Task:
+        # Replays never write back, the updates are only recorded
+        self.updates.append((task_id, update_params))
+        return self.by_id[task_id]
+
+
+async def take_snapshot(
+    api: TodoistAPIProtocol,
+    filters: list[str],
+    path: str | Path,
+    taken_on: date,
+    retry_policy: RetryPolicy | None = None,
+) -> None:
+    get_tasks_with_retry = build_retry(filter_tasks, retry_policy or RetryPolicy())
+    results = await asyncio.gather(
+        *(get_tasks_with_retry(api, filter) for filter in filters)
+    )
+
+    tasks = {task.id: task for ruleset_tasks in results for task in ruleset_tasks}
+    write_snapshot(
+        path,
+        list(tasks.values()),
+        {
+            filter: [task.id for task in ruleset_tasks]
+            for filter, ruleset_tasks in zip(filters, results)
+        },
+        taken_on,
+    )
@@ -0,0 +1,317 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Literal
+
+type Strategy = Literal["auto", "exact", "greedy"]
+
+# Above this many DP cell updates per day, the automatic strategy switches
+# from the exact DP to greedy packing
+EXACT_BUDGET = 2_000_000
+EXACT_LIMITED_BUDGET = 5_000_000
+
+# Rough size of one DP cell: its value, its selection and the pointers to
+# both. The exact DP's selections also grow by a pointer per item they hold
+CELL_BYTES = 96
+
+# Ordinal of a missing due date or deadline
+NO_DUE = date.max.toordinal()
+
+# Persistent linked list of selected items, so DP cells share their tails
+# instead of copying whole selections
+type Selection = tuple["PlanItem", "Selection"] | None
+
+
+class PlanCancelled(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class PlanItem:
+    id: str
+    weight: int
+    value: int
+    due: int
+    # Index of the count limit this item counts against, -1 for none
+    group: int = -1
+    deadline: int = NO_DUE
+
+
+def canonical_key(item: PlanItem) -> tuple[int, int, int, str]:
+    # Solvers only replace a choice with a strictly better one, so among
+    # equally good days the items earliest in this order win: earliest due,
+    # then earliest deadline, then highest priority, then id
+    return (item.due, item.deadline, -item.value, item.id)
+
+
+def check_cancelled(cancelled: threading.Event | None) -> None:
+    if cancelled is not None and cancelled.is_set():
+        raise PlanCancelled()
+
+
+def unwind(selection: Selection) -> list[PlanItem]:
+    items: list[PlanItem] = []
+    while selection is not None:
+        item, selection = selection
+        items.append(item)
+
+    items.reverse()
+    return items
+
+
+def fill_my_sack(
+    max_weight: int,
+    tasks: list[PlanItem],
+    cancelled: threading.Event | None = None,
+) -> list[PlanItem]:
+    values = [0 for _ in range(max_weight + 1)]
+    selected: list[list[PlanItem]] = [[] for _ in range(max_weight + 1)]
+
+    for task in tasks:
+        check_cancelled(cancelled)
+
+        for curr_capacity in range(max_weight, 0, -1):
+            if task.weight > curr_capacity:
+                continue
+
+            take = values[curr_capacity - task.weight] + task.value
+            dont_take = values[curr_capacity]
+
+            if take <= dont_take:
+                continue
+
+            values[curr_capacity] = take
+            selected[curr_capacity] = selected[curr_capacity - task.weight].copy()
+            selected[curr_capacity].append(task)
+
+    return selected[max_weight]
+
+
+def greedy_sack(max_weight: int, tasks: list[PlanItem]) -> list[PlanItem]:
+    if max_weight <= 0:
+        return []
+
+    fitting = [task for task in tasks if task.weight <= max_weight]
+    by_density = sorted(
+        fitting,
+        key=lambda task: task.value / task.weight if task.weight else float("inf"),
+        reverse=True,
+    )
+
+    remaining_weight = max_weight
+    batch: list[PlanItem] = []
+    for task in by_density:
+        if task.weight <= remaining_weight:
+            batch.append(task)
+            remaining_weight -= task.weight
+
+    # Packing by density alone can be arbitrarily bad when one valuable task
+    # is crowded out, so fall back to the single best task when it wins
+    best_single = max(fitting, key=lambda task: task.value, default=None)
+    if best_single is not None and best_single.value > sum(t.value for t in batch):
+        return [best_single]
+
+    return batch
+
+
+def fits_memory(size: int, memory_budget: int | None) -> bool:
+    return memory_budget is None or size <= memory_budget
+
+
+def exact_bytes(max_weight: int, longest: int) -> int:
+    # Every capacity keeps its own copy of the selection reaching it
+    return (max_weight + 1) * (CELL_BYTES + 8 * min(longest, max_weight))
+
+
+def choose_strategy(max_weight: int, tasks: list[PlanItem]) -> Strategy:
+    if len(tasks) * (max_weight + 1) <= EXACT_BUDGET:
+        return "exact"
+    return "greedy"
+
+
+def within_memory(
+    max_weight: int,
+    tasks: list[PlanItem],
+    strategy: Strategy,
+    memory_budget: int | None,
+) -> Strategy:
+    # The exact DP keeps one selection per unit of capacity, greedy none
+    lightest = max(min((task.weight for task in tasks), default=1), 1)
+    longest = min(len(tasks), max_weight // lightest)
+    if strategy == "exact" and not fits_memory(
+        exact_bytes(max_weight, longest), memory_budget
+    ):
+        strategy = "greedy"
+    return strategy
+
+
+def best_by_weight(
+    max_weight: int,
+    tasks: list[PlanItem],
+    limit: int | None,
+    cancelled: threading.Event | None,
+) -> tuple[list[int], list[Selection]]:
+    # values[k][w] is the best value of at most k items weighing at most w
+    rows = min(limit, len(tasks)) if limit is not None else 1
+    values = [[0] * (max_weight + 1) for _ in range(rows + 1)]
+    selected: list[list[Selection]] = [
+        [None] * (max_weight + 1) for _ in range(rows + 1)
+    ]
+
+    for task in tasks:
+        check_cancelled(cancelled)
+
+        for count in range(rows, 0, -1):
+            # Without a limit there is a single row that feeds itself
+            source = count - 1 if limit is not None else count
+            for curr_capacity in range(max_weight, task.weight - 1, -1):
+                take = values[source][curr_capacity - task.weight] + task.value
+                if take <= values[count][curr_capacity]:
+                    continue
+
+                values[count][curr_capacity] = take
+                selected[count][curr_capacity] = (
+                    task,
+                    selected[source][curr_capacity - task.weight],
+                )
+
+    return values[rows], selected[rows]
+
+
+def fill_limited_sack(
+    max_weight: int,
+    tasks: list[PlanItem],
+    limits: tuple[int, ...],
+    cancelled: threading.Event | None = None,
+) -> list[PlanItem]:
+    if max_weight <= 0:
+        return []
+
+    groups: dict[int, list[PlanItem]] = defaultdict(list)
+    for task in tasks:
+        groups[task.group].append(task)
+
+    # Items only ever count against one limit, so each group is solved on its
+    # own and the per-group tables are merged over the shared weight capacity
+    values, merged = best_by_weight(max_weight, groups.pop(-1, []), None, cancelled)
+
+    for group, group_tasks in sorted(groups.items()):
+        group_values, group_selected = best_by_weight(
+            max_weight, group_tasks, limits[group], cancelled
+        )
+
+        next_values = values.copy()
+        next_merged = merged.copy()
+        for curr_capacity in range(max_weight + 1):
+            for group_weight in range(curr_capacity + 1):
+                take = values[curr_capacity - group_weight] + group_values[group_weight]
+                if take <= next_values[curr_capacity]:
+                    continue
+
+                next_values[curr_capacity] = take
+                combined = merged[curr_capacity - group_weight]
+                for item in unwind(group_selected[group_weight]):
+                    combined = (item, combined)
+                next_merged[curr_capacity] = combined
+
+        values, merged = next_values, next_merged
+
+    return unwind(merged[max_weight])
+
+
+def greedy_limited_sack(
+    max_weight: int,
+    tasks: list[PlanItem],
+    limits: tuple[int, ...],
+) -> list[PlanItem]:
+    if max_weight <= 0:
+        return []
+
+    # Rank by value per unit of normalized resource use, as in the LP
+    # relaxation with one constraint per limit plus the weight capacity
+    def density(task: PlanItem) -> float:
+        usage = task.weight / max_weight
+        if task.group >= 0:
+            usage += 1 / limits[task.group]
+        return task.value / usage if usage else float("inf")
+
+    remaining_weight = max_weight
+    remaining_counts = list(limits)
+    batch: list[PlanItem] = []
+    for task in sorted(tasks, key=density, reverse=True):
+        if task.weight > remaining_weight:
+            continue
+        if task.group >= 0 and remaining_counts[task.group] == 0:
+            continue
+
+        batch.append(task)
+        remaining_weight -= task.weight
+        if task.group >= 0:
+            remaining_counts[task.group] -= 1
+
+    return batch
+
+
+def limited_cost(
+    max_weight: int, tasks: list[PlanItem], limits: tuple[int, ...]
+) -> int:
+    counts: dict[int, int] = defaultdict(int)
+    for task in tasks:
+        counts[task.group] += 1
+
+    rows = sum(
+        count * min(limits[group], count) if group >= 0 else count
+        for group, count in counts.items()
+    )
+    merges = sum(1 for group in counts if group >= 0) * (max_weight + 1) // 2
+    return (rows + merges) * (max_weight + 1)
+
+
+def limited_bytes(
+    max_weight: int, tasks: list[PlanItem], limits: tuple[int, ...]
+) -> int:
+    counts: dict[int, int] = defaultdict(int)
+    for task in tasks:
+        counts[task.group] += 1
+
+    # One group's table is alive at a time, next to the merged table and the
+    # copy it is merged into
+    rows = max(
+        (min(limits[group], count) for group, count in counts.items() if group >= 0),
+        default=0,
+    )
+    return (rows + 4) * (max_weight + 1) * CELL_BYTES
+
+
+def solve_day(
+    max_weight: int,
+    tasks: list[PlanItem],
+    limits: tuple[int, ...] = (),
+    cancelled: threading.Event | None = None,
+    strategy: Strategy = "exact",
+    memory_budget: int | None = None,
+) -> list[PlanItem]:
+    if not limits or all(task.group < 0 for task in tasks):
+        if strategy == "auto":
+            strategy = choose_strategy(max_weight, tasks)
+        strategy = within_memory(max_weight, tasks, strategy, memory_budget)
+
+        if strategy == "greedy":
+            check_cancelled(cancelled)
+            return greedy_sack(max_weight, tasks)
+        return fill_my_sack(max_weight, tasks, cancelled)
+
+    # Limited days are either solved exactly or packed greedily
+    if (
+        strategy != "greedy"
+        and (
+            strategy == "exact"
+            or limited_cost(max_weight, tasks, limits) <= EXACT_LIMITED_BUDGET
+        )
+        and fits_memory(limited_bytes(max_weight, tasks, limits), memory_budget)
+    ):
+        return fill_limited_sack(max_weight, tasks, limits, cancelled)
+
+    check_cancelled(cancelled)
+    return greedy_limited_sack(max_weight, tasks, limits)
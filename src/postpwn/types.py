@@ -1,3 +1,4 @@
+from datetime import time
 from typing import Annotated
 
 from pydantic import BaseModel, Field, StringConstraints
@@ -27,6 +28,46 @@ class WeightConfig(BaseModel):
     saturday: int
 
 
+class DurationWeights(BaseModel):
+    minutes_per_weight: int = Field(
+        15, gt=0, description="Minutes of task duration per unit of weight"
+    )
+    minutes_per_day: int = Field(
+        480, gt=0, description="Working minutes counted for each day of duration"
+    )
+
+
+class WorkingHours(BaseModel):
+    start: time = Field(time(9), description="Start of the working day")
+    end: time = Field(time(17), description="End of the working day")
+    default_duration: int = Field(
+        30, gt=0, description="Minutes taken by timed tasks without a duration"
+    )
+
+
+class Ruleset(BaseModel):
+    filter: Annotated[
+        str,
+        StringConstraints(strip_whitespace=True, min_length=1),
+        Field(description="Todoist filter selecting tasks for this ruleset"),
+    ]
+    max_weight: WeightConfig | int
+    rules: list[Rule] | None = None
+    duration_weights: DurationWeights | None = None
+
+
 class ScheduleConfig(BaseModel):
     max_weight: WeightConfig | int
     rules: list[Rule]
+    duration_weights: DurationWeights | None = Field(
+        None,
+        description="Derive weights from task durations, falling back to rules",
+    )
+    working_hours: WorkingHours | None = Field(
+        None,
+        description="Give moved timed tasks free slots within these hours",
+    )
+    rulesets: list[Ruleset] = Field(
+        default_factory=list,
+        description="Additional rulesets planned independently of the top-level rules",
+    )
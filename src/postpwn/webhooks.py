@@ -0,0 +1,250 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from dataclass_wizard.errors import JSONWizardError
+from todoist_api_python.models import Task
+
+from postpwn.api import TodoistAPIProtocol
+from postpwn.filters import FilterSyntaxError, compile_filter
+from postpwn.rescheduler import filter_tasks, get_all_tasks, yield_tasks
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SIGNATURE_HEADER = "x-todoist-hmac-sha256"
+DELIVERY_HEADER = "x-todoist-delivery-id"
+
+# Bursts of edits, like reordering a project, arrive as many events a few
+# milliseconds apart, so wait for a quiet spell before planning
+DEBOUNCE_SECONDS = 5.0
+
+# Far beyond any task event, bodies are read before their signature can be
+# checked so anything larger is turned away unread
+MAX_BODY_BYTES = 1024 * 1024
+
+REMOVED_EVENTS = {"item:completed", "item:deleted"}
+TASK_EVENTS = {"item:added", "item:updated", "item:uncompleted", *REMOVED_EVENTS}
+
+
+def sign(secret: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    return signature is not None and hmac.compare_digest(sign(secret, body), signature)
+
+
+def server_filters(filters: list[str]) -> list[str]:
+    unsupported: list[str] = []
+    for filter in filters:
+        try:
+            _ = compile_filter(filter)
+        except FilterSyntaxError:
+            unsupported.append(filter)
+
+    return unsupported
+
+
+class TaskBacklog:
+    def __init__(self, api: TodoistAPIProtocol, time_zone: str = "Etc/UTC") -> None:
+        self.api = api
+        self.time_zone = time_zone
+        self.tasks: dict[str, Task] = {}
+
+    async def load(self) -> None:
+        tasks = await get_all_tasks(self.api)
+        self.tasks = {task.id: task for task in tasks}
+        logger.info(f"Loaded {len(self.tasks)} task(s) into the backlog")
+
+    def apply(self, event_name: str, event_data: dict[str, Any]) -> bool:
+        if event_name not in TASK_EVENTS:
+            logger.debug("Ignoring %s event", event_name)
+            return False
+
+        try:
+            task = Task.from_dict(event_data)
+        except JSONWizardError as e:
+            raise ValueError(f"Invalid task in {event_name} event: {e}") from e
+        current = self.tasks.get(task.id)
+        # Deliveries can be retried and arrive out of order, so an older
+        # version of a task never overwrites a newer one
+        if current is not None and task.updated_at < current.updated_at:
+            logger.debug("Ignoring stale %s event for task %s", event_name, task.id)
+            return False
+
+        removed = (
+            event_name in REMOVED_EVENTS
+            or event_data.get("checked")
+            or event_data.get("is_deleted")
+        )
+        if removed:
+            return self.tasks.pop(task.id, None) is not None
+
+        if current == task:
+            return False
+
+        self.tasks[task.id] = task
+        return True
+
+    # The backlog stands in for the API during a run, answering reads from
+    # memory and passing writes through
+
+    async def get_tasks(self, **_: Any) -> AsyncGenerator[list[Task], None]:
+        return yield_tasks(list(self.tasks.values()))
+
+    async def filter_tasks(
+        self,
+        *,
+        query: str | None = None,
+        lang: str | None = None,
+        limit: int | None = None,
+    ) -> AsyncGenerator[list[Task], None]:
+        try:
+            matches = compile_filter(query or "")
+        except FilterSyntaxError as e:
+            logger.warning(f"Querying the server for {query}: {e}")
+            return yield_tasks(await filter_tasks(self.api, query or ""))
+
+        today = datetime.now(tz=ZoneInfo(self.time_zone)).date()
+        return yield_tasks(
+            [task for task in self.tasks.values() if matches(task, today)]
+        )
+
+    async def update_task(self, task_id: str, **update_params: Any) -> Task:
+        task = await self.api.update_task(task_id, **update_params)
+        self.tasks[task_id] = task
+        return task
+
+
+class Debouncer:
+    def __init__(
+        self, action: Callable[[], Awaitable[None]], delay: float = DEBOUNCE_SECONDS
+    ) -> None:
+        self.action = action
+        self.delay = delay
+        self.timer: asyncio.TimerHandle | None = None
+        self.running: asyncio.Task[None] | None = None
+        self.pending = False
+
+    def trigger(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = asyncio.get_running_loop().call_later(self.delay, self._fire)
+
+    def _fire(self) -> None:
+        self.timer = None
+        # Never plan twice at once, events arriving mid-run are coalesced
+        # into a single follow-up run
+        if self.running is not None and not self.running.done():
+            self.pending = True
+            return
+
+        self.running = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        try:
+            await self.action()
+        except Exception:
+            logger.exception("Event-driven run failed")
+
+        if self.pending:
+            self.pending = False
+            self.trigger()
+
+    def idle(self) -> bool:
+        return self.timer is None and (self.running is None or self.running.done())
+
+
+class WebhookReceiver:
+    def __init__(
+        self,
+        secret: str,
+        on_event: Callable[[str, dict[str, Any]], None],
+        port: int,
+        host: str = "0.0.0.0",
+    ) -> None:
+        self.secret = secret
+        self.on_event = on_event
+        self.port = port
+        self.host = host
+        self.server: asyncio.Server | None = None
+        self.deliveries: deque[str] = deque(maxlen=1024)
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Receiving webhooks on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def _receive(self, method: str, headers: dict[str, str], body: bytes) -> str:
+        if method != "POST":
+            return "405 Method Not Allowed"
+
+        if not verify_signature(self.secret, body, headers.get(SIGNATURE_HEADER)):
+            logger.warning("Rejecting webhook with an invalid signature")
+            return "401 Unauthorized"
+
+        delivery = headers.get(DELIVERY_HEADER)
+        if delivery is not None:
+            if delivery in self.deliveries:
+                return "200 OK"
+            self.deliveries.append(delivery)
+
+        try:
+            payload = json.loads(body)
+            event_name = payload["event_name"]
+            event_data = payload["event_data"]
+        except (ValueError, KeyError, TypeError):
+            return "400 Bad Request"
+
+        try:
+            self.on_event(event_name, event_data)
+        except ValueError as e:
+            logger.warning(f"Rejecting webhook with an invalid event: {e}")
+            return "400 Bad Request"
+        return "200 OK"
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            headers: dict[str, str] = {}
+            while line := (await reader.readline()).strip():
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                logger.warning(f"Rejecting a webhook body of {length} bytes")
+                status = "413 Content Too Large"
+            else:
+                body = await reader.readexactly(length)
+                method = request_line.decode("latin-1").split(" ")[0]
+
+                # Todoist only waits a few seconds for a response, so events
+                # are acknowledged straight away and planned later
+                status = self._receive(method, headers, body)
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n"
+                "Connection: close\r\n\r\n".encode()
+            )
+            await writer.drain()
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            logger.debug(f"Webhook connection dropped: {e}")
+        finally:
+            writer.close()
@@ -2,11 +2,13 @@ from dataclasses import dataclass
 from todoist_api_python.models import Task
 
 
-@dataclass(eq=True, order=True)
+@dataclass(eq=True)
 class WeightedTask(Task):
     weight: int = 1
+    # Label of the rule whose daily count limit this task counts against
+    limit_label: str | None = None
 
-    def __init__(self, task: Task, weight: int):
+    def __init__(self, task: Task, weight: int, limit_label: str | None = None):
         super().__init__(  # pyright: ignore[reportUnknownMemberType]
             id=task.id,
             content=task.content,
@@ -30,3 +32,4 @@ class WeightedTask(Task):
         )
 
         self.weight = weight
+        self.limit_label = limit_label
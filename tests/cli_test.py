@@ -36,7 +36,7 @@ async def test_schedule_registers_job_and_executes() -> None:
 
     try:
         # Verify job was scheduled
-        jobs = scheduler.get_jobs()  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+        jobs = scheduler.get_jobs()  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType, reportAttributeAccessIssue]
         assert len(jobs) == 1  # pyright: ignore[reportUnknownArgumentType]
 
         job = jobs[0]  # pyright: ignore[reportUnknownVariableType]
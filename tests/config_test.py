@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+
+from postpwn.cli import run_schedule
+from postpwn.config import ConfigWatcher
+
+
+def write_rules(path: Path, max_weight: int, mtime: int) -> None:
+    _ = path.write_text(
+        json.dumps(
+            {"max_weight": max_weight, "rules": [{"filter": "@heavy", "weight": 2}]}
+        )
+    )
+    # Filesystem timestamps can be coarse, so make each write visibly newer
+    os.utime(path, (mtime, mtime))
+
+
+def test_watcher_reloads_changed_rules(tmp_path: Path) -> None:
+    """when the rules file changes, it reloads and validates the new rules"""
+
+    path = tmp_path / "rules.json"
+    write_rules(path, 4, 1_000)
+    watcher = ConfigWatcher(str(path))
+
+    write_rules(path, 6, 2_000)
+
+    assert watcher.config.max_weight == 4
+    assert watcher.refresh().max_weight == 6
+
+
+def test_watcher_keeps_previous_rules_when_invalid(tmp_path: Path) -> None:
+    """when the changed rules file is invalid, it keeps using the previous rules"""
+
+    path = tmp_path / "rules.json"
+    write_rules(path, 4, 1_000)
+    watcher = ConfigWatcher(str(path))
+
+    # A rule heavier than a whole day fails validation
+    write_rules(path, 1, 2_000)
+    assert watcher.refresh().max_weight == 4
+
+    path.unlink()
+    assert watcher.refresh().max_weight == 4
+
+
+@pytest.mark.asyncio
+async def test_scheduled_runs_use_reloaded_rules(tmp_path: Path) -> None:
+    """when the rules file changes while running on a schedule, the next run uses the new rules"""
+
+    path = tmp_path / "rules.json"
+    write_rules(path, 2, 1_000)
+    watcher = ConfigWatcher(str(path))
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task({"labels": ["heavy"]}) for _ in range(2)])
+    curr_date = datetime(2025, 1, 5).date()
+
+    scheduler = await run_schedule(
+        api=fake_api,
+        max_weight=watcher.config.max_weight,
+        filter="test",
+        rules=watcher.config.rules,
+        dry_run=False,
+        time_zone="UTC",
+        schedule="0 0 * * *",
+        curr_date=curr_date,
+        watcher=watcher,
+    )
+
+    try:
+        write_rules(path, 4, 2_000)
+        await scheduler.get_jobs()[0].func()  # pyright: ignore[reportUnknownMemberType, reportAttributeAccessIssue]
+    finally:
+        scheduler.shutdown()
+
+    # Both tasks fit on the first day once the capacity is raised
+    due_dates = [
+        call.kwargs["due_date"] for call in fake_api.update_task.call_args_list
+    ]
+    assert due_dates == [curr_date, curr_date]
@@ -31,4 +31,27 @@ def params() -> RescheduleParams:
         "dry_run": False,
         "time_zone": "UTC",
         "schedule": None,
+        "workers": None,
+        "solve_timeout": None,
+        "plan_cache": None,
+        "solver": "auto",
+        "history": None,
+        "minimize_churn": False,
+        "verify_incremental": False,
+        "memory_budget": None,
+        "health_port": None,
+        "shards": None,
+        "lease_db": None,
+        "replica_id": None,
+        "log_format": "text",
+        "log_level": "INFO",
+        "log_sample": 0.0,
+        "replay": None,
+        "local_filters": False,
+        "webhook_port": None,
+        "webhook_secret": None,
+        "debounce": 5.0,
+        "scheduler": "apscheduler",
+        "meet_deadlines": False,
+        "group_subtasks": False,
     }
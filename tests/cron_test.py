@@ -0,0 +1,173 @@
+import asyncio
+from datetime import datetime, timedelta, tzinfo
+from zoneinfo import ZoneInfo
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+
+from postpwn.cli import run_schedule
+from postpwn.cron import CronRunner, CronSchedule, CronSyntaxError
+from postpwn.health import RunMonitor
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def test_parses_crontab_fields() -> None:
+    """when parsing a schedule, it expands lists, ranges, steps, names and macros"""
+
+    schedule = CronSchedule.parse("*/20 9-17/4 1,15 jan-mar mon-fri")
+
+    assert schedule.minutes == {0, 20, 40}
+    assert schedule.hours == {9, 13, 17}
+    assert schedule.days == {1, 15}
+    assert schedule.months == {1, 2, 3}
+    assert schedule.weekdays == {1, 2, 3, 4, 5}
+    assert CronSchedule.parse("0 0 * * 7").weekdays == {0}
+    assert CronSchedule.parse("@weekly").expression == "0 0 * * sun"
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["invalid_cron_string", "0 0 * *", "60 * * * *", "*/0 * * * *", "@reboot"]
+    + ["0 0 30 2 *", "0 0 * * someday"],
+)
+def test_rejects_invalid_schedules(expression: str) -> None:
+    """when a schedule isn't valid crontab or can never run, it raises an error"""
+
+    with pytest.raises(CronSyntaxError):
+        _ = CronSchedule.parse(expression)
+
+
+def test_next_run_follows_local_time_across_dst() -> None:
+    """when the clocks change, it runs at the same wall clock time, an hour late if that time was skipped, and once if it repeats"""
+
+    daily = CronSchedule.parse("0 9 * * *")
+    assert daily.next_after(datetime(2025, 3, 8, 10, tzinfo=NEW_YORK)) == datetime(
+        2025, 3, 9, 9, tzinfo=NEW_YORK
+    )
+
+    skipped = CronSchedule.parse("30 2 * * *")
+    run = skipped.next_after(datetime(2025, 3, 9, 0, tzinfo=NEW_YORK))
+    assert (run.hour, run.minute) == (3, 30)
+
+    repeated = CronSchedule.parse("30 1 * * *")
+    first = repeated.next_after(datetime(2025, 11, 2, 0, tzinfo=NEW_YORK))
+    assert repeated.next_after(first).date() == first.date() + timedelta(days=1)
+
+
+def test_either_day_field_matches_when_both_are_restricted() -> None:
+    """when both the day of month and weekday are restricted, it runs on either"""
+
+    schedule = CronSchedule.parse("0 0 13 * fri")
+    start = datetime(2025, 6, 1, tzinfo=NEW_YORK)
+
+    runs = [start := schedule.next_after(start) for _ in range(3)]
+
+    # Friday the 6th, Friday the 13th, then Friday the 20th
+    assert [run.day for run in runs] == [6, 13, 20]
+
+
+@pytest.mark.asyncio
+async def test_runner_runs_the_job_on_schedule() -> None:
+    """when the next run comes around, it runs the job and moves on to the following one"""
+
+    # Just before a minute ticks over
+    real_start = datetime.now(NEW_YORK)
+    offset = real_start.replace(second=59, microsecond=900_000) - real_start
+
+    def clock(time_zone: tzinfo) -> datetime:
+        return datetime.now(time_zone) + offset
+
+    runs: list[datetime] = []
+
+    async def job() -> None:
+        runs.append(clock(NEW_YORK))
+
+    runner = CronRunner(CronSchedule.parse("* * * * *"), "America/New_York", job, clock)
+    runner.start()
+    first = runner.next_run_time
+    try:
+        async with asyncio.timeout(5):
+            while not runs:
+                await asyncio.sleep(0.01)
+        following = runner.next_run_time
+    finally:
+        runner.shutdown()
+
+    assert first is not None
+    assert runs[0] >= first
+    assert following == first + timedelta(minutes=1)
+    assert runner.next_run_time is None
+
+
+@pytest.mark.asyncio
+async def test_native_scheduler_reports_next_run() -> None:
+    """when running on the native scheduler, it reports the next run for readiness checks"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task()])
+    monitor = RunMonitor()
+
+    scheduler = await run_schedule(
+        api=fake_api,
+        max_weight=10,
+        filter="test",
+        rules=None,
+        dry_run=False,
+        time_zone="UTC",
+        schedule="@daily",
+        monitor=monitor,
+        scheduler="native",
+    )
+
+    try:
+        assert isinstance(scheduler, CronRunner)
+        next_run = monitor.next_run()
+        assert next_run is not None
+        assert (next_run.hour, next_run.minute) == (0, 0)
+        assert monitor.readiness()[0]
+    finally:
+        scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("schedule", ["0 9 * * 1", "* * * * 7", "0 9 13 * fri"])
+async def test_both_schedulers_run_the_same_schedule(schedule: str) -> None:
+    """when running on APScheduler or natively, a schedule fires at the same times with weekdays counted from Sunday"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    moment = datetime(2025, 1, 5, 12, 0, tzinfo=NEW_YORK)
+    fire_times: list[list[datetime]] = []
+    for kind in ("apscheduler", "native"):
+        scheduler = await run_schedule(
+            api=fake_api,
+            max_weight=10,
+            filter="test",
+            rules=None,
+            dry_run=True,
+            time_zone="America/New_York",
+            schedule=schedule,
+            scheduler=kind,
+        )
+        try:
+            runs = [moment]
+            for _ in range(5):
+                if isinstance(scheduler, CronRunner):
+                    runs.append(scheduler.schedule.next_after(runs[-1]))
+                else:
+                    trigger = scheduler.get_jobs()[0].trigger  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+                    # APScheduler counts a fire time equal to now as due
+                    runs.append(
+                        trigger.get_next_fire_time(  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
+                            runs[-1], runs[-1] + timedelta(seconds=1)
+                        )
+                    )
+            fire_times.append(runs)
+        finally:
+            scheduler.shutdown()
+
+    apscheduler_runs, native_runs = fire_times
+    assert apscheduler_runs == native_runs
+    if schedule == "0 9 * * 1":
+        assert {run.strftime("%a %H:%M") for run in native_runs[1:]} == {"Mon 09:00"}
@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_server import FakeTodoistServer, ServerConfig
+from helpers.set_env import set_env
+from todoist_api_python.api_async import TodoistAPIAsync
+
+from postpwn.rescheduler import reschedule
+
+
+@pytest.mark.asyncio
+async def test_reschedule_pages_through_local_server() -> None:
+    """when the server pages its results, it fetches every page and applies every update"""
+
+    tasks = [build_task() for _ in range(25)]
+    curr_date = date(2025, 1, 5)
+
+    with FakeTodoistServer(tasks, ServerConfig(page_size=10)) as server:
+        with set_env({"RETRY_ATTEMPTS": "1"}):
+            await reschedule(
+                api=TodoistAPIAsync("VALID_TOKEN", server.session()),
+                filter="!no date",
+                max_weight=10,
+                time_zone="Etc/UTC",
+                curr_date=curr_date,
+            )
+
+    assert server.log.counts["GET tasks"] == 3
+    assert server.log.counts["POST tasks"] == 25
+    assert all(
+        task["due"]["date"] == curr_date.isoformat() for task in server.tasks.values()
+    )
+
+
+@pytest.mark.asyncio
+async def test_reschedule_retries_rate_limited_requests() -> None:
+    """when the server answers with 429, it retries the request until it succeeds"""
+
+    tasks = [build_task()]
+
+    with FakeTodoistServer(tasks, ServerConfig(throttle_first=1)) as server:
+        with set_env({"RETRY_ATTEMPTS": "2"}):
+            await reschedule(
+                api=TodoistAPIAsync("VALID_TOKEN", server.session()),
+                filter="!no date",
+                max_weight=10,
+                time_zone="Etc/UTC",
+                curr_date=date(2025, 1, 5),
+            )
+
+    assert server.log.statuses[429] == 1
+    assert server.log.counts["POST tasks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reschedule_keeps_under_a_sustained_rate_limit() -> None:
+    """when many updates run into the server's rate limit, it paces them and finishes within the retry budget"""
+
+    tasks = [build_task() for _ in range(60)]
+    config = ServerConfig(rate_limit=50, burst=10)
+
+    with FakeTodoistServer(tasks, config) as server:
+        await reschedule(
+            api=TodoistAPIAsync("VALID_TOKEN", server.session()),
+            filter="!no date",
+            max_weight=1000,
+            time_zone="Etc/UTC",
+            curr_date=date(2025, 1, 5),
+        )
+
+    assert server.log.counts["POST tasks"] == 60 + server.log.statuses[429]
+    assert server.log.statuses[429] < 30
+    assert all(task["due"]["date"] == "2025-01-05" for task in server.tasks.values())
@@ -0,0 +1,119 @@
+from dataclasses import replace
+from datetime import date
+
+import pytest
+from dataclass_wizard import DatePattern
+from todoist_api_python.models import Due
+from helpers.data_generators import build_due, build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.set_env import set_env
+
+from postpwn.config import validate_rules
+from postpwn.filters import FilterSyntaxError, compile_filter
+from postpwn.rescheduler import reschedule
+from postpwn.types import Rule, Ruleset
+
+TODAY = date(2025, 1, 5)
+
+
+def due_on(day: date, recurring: bool = False) -> Due:
+    return build_due(
+        {"date": DatePattern.fromisoformat(day.isoformat()), "is_recurring": recurring}
+    )
+
+
+def test_default_filter_matches_locally() -> None:
+    """when evaluating the default filter without its assignee term, it matches the same tasks the server would"""
+
+    task = build_task({"due": due_on(TODAY)})
+    default_filter = compile_filter("!no date & !recurring & no deadline")
+
+    matching = replace(task, deadline=None)
+    undated = replace(matching, due=None)
+    recurring = replace(matching, due=due_on(TODAY, recurring=True))
+    with_deadline = task
+
+    assert default_filter(matching, TODAY)
+    assert not default_filter(undated, TODAY)
+    assert not default_filter(recurring, TODAY)
+    assert not default_filter(with_deadline, TODAY)
+
+
+def test_assignee_terms_are_left_to_the_server() -> None:
+    """when a filter refers to the current user's assignments, it can't be evaluated locally"""
+
+    for query in (
+        "!assigned to:others & !no date",
+        "assigned to: me",
+        "assigned by: me",
+    ):
+        with pytest.raises(FilterSyntaxError):
+            _ = compile_filter(query)
+
+    assert compile_filter("assigned")(build_task({"assignee_id": "someone"}), TODAY)
+
+
+def test_boolean_operators_and_terms() -> None:
+    """when combining terms, it follows Todoist's precedence of ! over & over |"""
+
+    urgent = build_task(
+        {"priority": 4, "labels": ["work"], "due": due_on(date(2025, 1, 1))}
+    )
+    upcoming = build_task({"labels": ["home"], "due": due_on(date(2025, 1, 7))})
+
+    assert compile_filter("p1 & overdue")(urgent, TODAY)
+    assert compile_filter("@wo* | p4 & today")(urgent, TODAY)
+    assert not compile_filter("!(@work | @home)")(upcoming, TODAY)
+    assert compile_filter("3 days, overdue")(upcoming, TODAY)
+    assert not compile_filter("2 days")(upcoming, TODAY)
+    assert compile_filter("due after: tomorrow & due before: 2025-01-08")(
+        upcoming, TODAY
+    )
+
+
+@pytest.mark.parametrize("query", ["#Inbox", "(p1 | p2", "p1 &", "p5"])
+def test_unsupported_filters_are_rejected(query: str) -> None:
+    """when a filter uses syntax the evaluator doesn't know, it raises instead of guessing"""
+
+    with pytest.raises(FilterSyntaxError):
+        _ = compile_filter(query)
+
+    with pytest.raises(ValueError, match="Invalid rule config"):
+        validate_rules(10, [Rule(filter=query, weight=1)])
+
+
+@pytest.mark.asyncio
+async def test_local_filters_share_one_fetch() -> None:
+    """when filtering locally, it fetches tasks once and weighs them by filter rules"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    urgent = [build_task({"priority": 4, "labels": ["work"]}) for _ in range(2)]
+    chores = [build_task({"labels": ["home"]}) for _ in range(2)]
+    fake_api.setup_tasks([*urgent, *chores])
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        await reschedule(
+            api=fake_api,
+            filter="@work",
+            max_weight=2,
+            time_zone="Etc/UTC",
+            curr_date=TODAY,
+            rules=[Rule(filter="p1", weight=2)],
+            rulesets=[
+                Ruleset(
+                    filter="@home | #Chores",
+                    max_weight=1,
+                    rules=[Rule(filter="@home", weight=1)],
+                )
+            ],
+            local_filters=True,
+        )
+
+    assert fake_api.get_tasks.await_count == 1
+    # Projects can't be evaluated locally, so that filter goes to the server
+    assert [call.kwargs["query"] for call in fake_api.filter_tasks.call_args_list] == [
+        "@home | #Chores"
+    ]
+
+    distribution = fake_api.task_distribution()
+    assert [distribution[day]["work"] for day in sorted(distribution)] == [1, 1]
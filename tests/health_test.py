@@ -0,0 +1,100 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+
+from postpwn.cli import run_schedule
+from postpwn.health import HealthServer, RunMonitor
+
+
+async def get(port: int, path: str) -> tuple[int, dict[str, Any]]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_schedule_and_last_run() -> None:
+    """when running on a schedule, it reports the next fire time and becomes ready after a successful run"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task()])
+    monitor = RunMonitor()
+    server = HealthServer(monitor, 0, host="127.0.0.1")
+    await server.start()
+
+    scheduler = await run_schedule(
+        api=fake_api,
+        max_weight=10,
+        filter="test",
+        rules=None,
+        dry_run=False,
+        time_zone="UTC",
+        schedule="0 0 * * *",
+        curr_date=datetime(2025, 1, 5).date(),
+        monitor=monitor,
+    )
+
+    try:
+        status, body = await get(server.port, "/readyz")
+        assert status == 200
+        assert body["phase"] == "idle"
+        assert body["next_run"] is not None
+        assert body["last_success"] is None
+
+        await scheduler.get_jobs()[0].func()  # pyright: ignore[reportUnknownMemberType, reportAttributeAccessIssue]
+
+        status, body = await get(server.port, "/readyz")
+        assert status == 200
+        assert body["last_success"] is not None
+    finally:
+        scheduler.shutdown()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_liveness_fails_when_a_run_stalls() -> None:
+    """when a run has been going for longer than allowed, the liveness check fails"""
+
+    monitor = RunMonitor(stall_after=60)
+    server = HealthServer(monitor, 0, host="127.0.0.1")
+    await server.start()
+
+    try:
+        assert (await get(server.port, "/healthz"))[0] == 200
+
+        with monitor.watch() as stats:
+            stats.started_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+            status, body = await get(server.port, "/healthz")
+
+        assert status == 503
+        assert body["status"] == "stalled"
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_run_is_not_ready() -> None:
+    """when the last run failed, the readiness check fails with the error"""
+
+    monitor = RunMonitor()
+    monitor.next_run = lambda: datetime.now(timezone.utc)
+
+    with pytest.raises(RuntimeError):
+        with monitor.watch():
+            raise RuntimeError("API down")
+
+    ready, body = monitor.readiness()
+
+    assert not ready
+    assert body["last_error"] == "RuntimeError: API down"
@@ -25,15 +25,24 @@ class FakeTodoistAPI:
     def __init__(self, token: str, _: Session | None = None):
         self.token: str = token
         self.tasks: list[Task] = []
+        self.query_tasks: dict[str, list[Task]] = {}
         self.update_task = AsyncMock(
             return_value=build_task({"id": "mock_id", "content": "Updated Task"})
         )
         self.filter_tasks = AsyncMock(
-            side_effect=lambda **kwargs: create_task_generator(self.tasks)  # pyright: ignore[reportUnknownLambdaType]
+            side_effect=lambda **kwargs: create_task_generator(  # pyright: ignore[reportUnknownLambdaType]
+                self.query_tasks.get(kwargs.get("query", ""), self.tasks)  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
+            )
+        )
+
+        self.get_tasks = AsyncMock(
+            side_effect=lambda **_: create_task_generator(self.tasks)  # pyright: ignore[reportUnknownLambdaType]
         )
 
-    def setup_tasks(self, tasks: list[Task]) -> None:
+    def setup_tasks(self, tasks: list[Task], query: str | None = None) -> None:
         self.tasks.extend(tasks)
+        if query is not None:
+            self.query_tasks.setdefault(query, []).extend(tasks)
 
     def task_distribution(
         self,
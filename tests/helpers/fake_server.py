@@ -0,0 +1,247 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from requests import PreparedRequest, Response, Session
+from todoist_api_python._core.endpoints import API_URL
+from todoist_api_python.models import Task
+
+type Latency = Callable[[], float]
+
+
+def constant_latency(ms: float) -> Latency:
+    return lambda: ms / 1000
+
+
+def lognormal_latency(median_ms: float, sigma: float = 0.5) -> Latency:
+    rng = random.Random(0)
+    return lambda: rng.lognormvariate(0, sigma) * median_ms / 1000
+
+
+@dataclass
+class ServerConfig:
+    token: str = "VALID_TOKEN"
+    page_size: int = 200
+    latency: Latency = field(default_factory=lambda: constant_latency(0))
+    # Sustained requests per second before answering 429, None to disable
+    rate_limit: float | None = None
+    burst: int = 10
+    # Answer the first N requests with 429 regardless of the rate limit
+    throttle_first: int = 0
+    failure_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class RequestLog:
+    counts: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+
+class FakeTodoistServer:
+    """In-process HTTP stand-in for the Todoist REST and Sync endpoints."""
+
+    def __init__(self, tasks: list[Task], config: ServerConfig | None = None):
+        self.config = config or ServerConfig()
+        self.tasks: dict[str, dict[str, Any]] = {
+            task.id: task.to_dict() for task in tasks
+        }
+        self.log = RequestLog()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._requests = 0
+        self._allowance = float(self.config.burst)
+        self._last_refill = time.monotonic()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def __enter__(self) -> "FakeTodoistServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def session(self) -> "LocalSession":
+        return LocalSession(f"{self.url}/api/v1")
+
+    def _admit(self) -> int | None:
+        with self._lock:
+            self._requests += 1
+            if self._requests <= self.config.throttle_first:
+                return 429
+
+            if self.config.rate_limit is not None:
+                now = time.monotonic()
+                self._allowance = min(
+                    float(self.config.burst),
+                    self._allowance
+                    + (now - self._last_refill) * self.config.rate_limit,
+                )
+                self._last_refill = now
+                if self._allowance < 1:
+                    return 429
+                self._allowance -= 1
+
+            if self._rng.random() < self.config.failure_rate:
+                return 500
+
+        return None
+
+    def _page(self, query: dict[str, list[str]]) -> dict[str, Any]:
+        offset = int(query.get("cursor", ["0"])[0])
+        limit = min(int(query.get("limit", [self.config.page_size])[0]), 200)
+        limit = min(limit, self.config.page_size)
+
+        with self._lock:
+            tasks = list(self.tasks.values())
+
+        next_offset = offset + limit
+        return {
+            "results": tasks[offset:next_offset],
+            "next_cursor": str(next_offset) if next_offset < len(tasks) else None,
+        }
+
+    def _update(self, task_id: str, data: dict[str, Any]) -> dict[str, Any] | None:
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+
+            due = dict(task["due"] or {"string": "", "is_recurring": False})
+            if "due_date" in data:
+                due["date"] = data["due_date"]
+            if "due_datetime" in data:
+                due["date"] = data["due_datetime"]
+            if "due_string" in data:
+                due["string"] = data["due_string"]
+            task["due"] = due
+
+            return task
+
+    def _sync(self, body: dict[str, Any]) -> dict[str, Any]:
+        response: dict[str, Any] = {"sync_token": str(self._requests)}
+
+        commands = body.get("commands") or []
+        if isinstance(commands, str):
+            commands = json.loads(commands)
+
+        statuses: dict[str, str] = {}
+        for command in commands:
+            args = command.get("args", {})
+            if command.get("type") == "item_update":
+                due = args.get("due") or {}
+                updated = self._update(
+                    args.get("id", ""), {"due_date": due.get("date")}
+                )
+                statuses[command["uuid"]] = "ok" if updated else "error"
+        if commands:
+            response["sync_status"] = statuses
+
+        resource_types = body.get("resource_types") or []
+        if isinstance(resource_types, str):
+            resource_types = json.loads(resource_types)
+        if "items" in resource_types or "all" in resource_types:
+            with self._lock:
+                response["items"] = list(self.tasks.values())
+
+        return response
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _respond(self, status: int, body: Any = None) -> None:
+                server.log.statuses[status] += 1
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                _ = self.wfile.write(payload)
+
+            def _body(self) -> dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if not raw:
+                    return {}
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    return json.loads(raw)
+                return {
+                    key: values[0] for key, values in parse_qs(raw.decode()).items()
+                }
+
+            def _dispatch(self, method: str) -> None:
+                url = urlsplit(self.path)
+                route = url.path.removeprefix("/api/v1/")
+                server.log.counts[f"{method} {route.split('/')[0]}"] += 1
+
+                time.sleep(max(server.config.latency(), 0))
+
+                if self.headers.get("Authorization") != f"Bearer {server.config.token}":
+                    return self._respond(401, {"error": "Unauthorized"})
+
+                status = server._admit()
+                if status is not None:
+                    return self._respond(status, {"error": "Simulated failure"})
+
+                if method == "GET" and route in ("tasks", "tasks/filter"):
+                    return self._respond(200, server._page(parse_qs(url.query)))
+
+                if method == "POST" and route == "sync":
+                    return self._respond(200, server._sync(self._body()))
+
+                if method == "POST" and route.startswith("tasks/"):
+                    task = server._update(route.removeprefix("tasks/"), self._body())
+                    if task is None:
+                        return self._respond(404, {"error": "Task not found"})
+                    return self._respond(200, task)
+
+                return self._respond(404, {"error": "Not found"})
+
+            def do_GET(self) -> None:
+                self._dispatch("GET")
+
+            def do_POST(self) -> None:
+                self._dispatch("POST")
+
+        return Handler
+
+
+class LocalSession(Session):
+    """Session that sends requests meant for the Todoist API to a local server."""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url
+        self.on_response: Callable[[PreparedRequest, Response, float], None] | None = (
+            None
+        )
+
+    def request(
+        self, method: str | bytes, url: str | bytes, *args: Any, **kwargs: Any
+    ) -> Response:  # pyright: ignore[reportIncompatibleMethodOverride]
+        url = str(url).replace(API_URL, self.base_url, 1)
+        started = time.perf_counter()
+        response = super().request(method, url, *args, **kwargs)
+        if self.on_response is not None:
+            self.on_response(response.request, response, time.perf_counter() - started)
+        return response
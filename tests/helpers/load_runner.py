@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+
+from requests import PreparedRequest, Response
+from todoist_api_python.api_async import TodoistAPIAsync
+from todoist_api_python.models import Task
+
+from helpers.data_generators import build_task
+from helpers.fake_server import (
+    FakeTodoistServer,
+    ServerConfig,
+    lognormal_latency,
+)
+from postpwn.rescheduler import reschedule
+from postpwn.types import Rule
+
+RULES = [
+    Rule(filter="@light", weight=1),
+    Rule(filter="@medium", weight=3),
+    Rule(filter="@heavy", weight=5),
+]
+
+
+@dataclass
+class PhaseStats:
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    first_start: float = float("inf")
+    last_end: float = 0.0
+
+    def record(self, started: float, elapsed: float, status: int) -> None:
+        self.latencies.append(elapsed)
+        self.statuses[status] += 1
+        self.first_start = min(self.first_start, started)
+        self.last_end = max(self.last_end, started + elapsed)
+
+    def summary(self, name: str) -> str:
+        if not self.latencies:
+            return f"{name:<6} no requests"
+
+        wall = self.last_end - self.first_start
+        errors = sum(count for status, count in self.statuses.items() if status >= 400)
+        return (
+            f"{name:<6} requests={len(self.latencies):<6} "
+            f"throughput={len(self.latencies) / wall if wall else 0:8.1f}/s "
+            f"{percentiles(self.latencies)} errors={errors} "
+            f"statuses={dict(self.statuses)}"
+        )
+
+
+def percentiles(seconds: list[float]) -> str:
+    quantiles = statistics.quantiles(seconds, n=100, method="inclusive")
+    return (
+        f"p50={quantiles[49] * 1000:7.1f}ms p95={quantiles[94] * 1000:7.1f}ms "
+        f"p99={quantiles[98] * 1000:7.1f}ms max={max(seconds) * 1000:7.1f}ms"
+    )
+
+
+class TimingRecorder:
+    def __init__(self) -> None:
+        self.phases: dict[str, PhaseStats] = defaultdict(PhaseStats)
+        self._lock = threading.Lock()
+
+    def __call__(
+        self, request: PreparedRequest, response: Response, elapsed: float
+    ) -> None:
+        phase = "fetch" if request.method == "GET" else "apply"
+        with self._lock:
+            self.phases[phase].record(
+                time.perf_counter() - elapsed, elapsed, response.status_code
+            )
+
+
+def build_backlog(task_count: int) -> list[Task]:
+    rng = random.Random(task_count)
+    return [
+        build_task(
+            {
+                "labels": [rng.choice(["light", "medium", "heavy"])],
+                "priority": rng.randint(1, 4),
+            }
+        )
+        for _ in range(task_count)
+    ]
+
+
+async def run_load(
+    task_count: int,
+    config: ServerConfig,
+    runs: int,
+    max_weight: int,
+) -> None:
+    tasks = build_backlog(task_count)
+    durations: list[float] = []
+    errors: dict[str, int] = defaultdict(int)
+
+    for run in range(1, runs + 1):
+        with FakeTodoistServer(tasks, config) as server:
+            session = server.session()
+            recorder = TimingRecorder()
+            session.on_response = recorder
+
+            started = time.perf_counter()
+            # A failed run is reported and counted rather than ending the
+            # whole load test, the runs after it still say something
+            try:
+                await reschedule(
+                    api=TodoistAPIAsync(config.token, session),
+                    filter="!no date",
+                    max_weight=max_weight,
+                    time_zone="Etc/UTC",
+                    curr_date=date.today(),
+                    rules=RULES,
+                )
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                errors[type(e).__name__] += 1
+                print(f"run {run}: failed after {elapsed:.2f}s: {e!r}")
+            else:
+                elapsed = time.perf_counter() - started
+                durations.append(elapsed)
+                print(f"run {run}: {task_count} tasks in {elapsed:.2f}s")
+
+            for name in ("fetch", "apply"):
+                print(f"  {recorder.phases[name].summary(name)}")
+
+    print(
+        f"{len(durations)}/{runs} runs completed "
+        f"{percentiles(durations) if durations else ''} errors={dict(errors)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Drive full postpwn runs against a local fake Todoist server."
+    )
+    _ = parser.add_argument("--tasks", type=int, default=1000)
+    _ = parser.add_argument("--page-size", type=int, default=200)
+    _ = parser.add_argument("--latency-ms", type=float, default=20)
+    _ = parser.add_argument("--latency-sigma", type=float, default=0.5)
+    _ = parser.add_argument("--rate-limit", type=float, default=None)
+    _ = parser.add_argument("--burst", type=int, default=50)
+    _ = parser.add_argument("--failure-rate", type=float, default=0.0)
+    _ = parser.add_argument("--max-weight", type=int, default=20)
+    _ = parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    # Per-task log lines would dominate the timings being measured
+    logging.disable(logging.INFO)
+
+    asyncio.run(
+        run_load(
+            task_count=args.tasks,
+            config=ServerConfig(
+                page_size=args.page_size,
+                latency=lognormal_latency(args.latency_ms, args.latency_sigma),
+                rate_limit=args.rate_limit,
+                burst=args.burst,
+                failure_rate=args.failure_rate,
+            ),
+            runs=args.runs,
+            max_weight=args.max_weight,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
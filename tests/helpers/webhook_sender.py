@@ -0,0 +1,60 @@
+import asyncio
+import json
+import uuid
+from typing import Any
+
+from todoist_api_python.models import Task
+
+from postpwn.webhooks import DELIVERY_HEADER, SIGNATURE_HEADER, sign
+
+
+def event_payload(event_name: str, task: Task) -> dict[str, Any]:
+    return {
+        "event_name": event_name,
+        "user_id": task.creator_id,
+        "event_data": task.to_dict(),
+        "version": "10",
+    }
+
+
+async def send_event(
+    port: int,
+    secret: str,
+    event_name: str,
+    task: Task,
+    delivery_id: str | None = None,
+    signature: str | None = None,
+) -> int:
+    # Stands in for Todoist, posting a signed event the way its webhooks do
+    body = json.dumps(event_payload(event_name, task), default=str).encode()
+    return await send_body(port, secret, body, delivery_id, signature)
+
+
+async def send_body(
+    port: int,
+    secret: str,
+    body: bytes,
+    delivery_id: str | None = None,
+    signature: str | None = None,
+) -> int:
+    headers = {
+        "Host": "localhost",
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+        SIGNATURE_HEADER: signature or sign(secret, body),
+        DELIVERY_HEADER: delivery_id or str(uuid.uuid4()),
+    }
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        "POST /webhook HTTP/1.1\r\n".encode()
+        + "".join(f"{name}: {value}\r\n" for name, value in headers.items()).encode()
+        + b"\r\n"
+        + body
+    )
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    return int(response.split()[1])
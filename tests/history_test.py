@@ -0,0 +1,66 @@
+import tracemalloc
+from asyncio import AbstractEventLoop
+from datetime import datetime
+from pathlib import Path
+
+from click.testing import CliRunner
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.set_env import set_env
+
+from postpwn.cli import RescheduleParams, cli, postpwn
+from postpwn.history import RunHistory
+
+
+def test_runs_are_recorded_in_history(
+    loop: AbstractEventLoop, params: RescheduleParams, tmp_path: Path
+) -> None:
+    """when a history path is given, it records each run's stats and shows them"""
+
+    params["history"] = str(tmp_path / "history.db")
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task() for _ in range(3)])
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, datetime(2025, 1, 5, 0, 0, 0), **params)
+
+    [run] = RunHistory(params["history"]).recent()
+    assert run.tasks == 3
+    assert run.moves == 3
+    assert run.api_calls == 4
+    assert run.failures == 0
+    assert run.error is None
+    assert run.peak_memory is None
+
+    result = CliRunner().invoke(cli, ["--history", params["history"], "history"])
+
+    assert result.exit_code == 0
+    assert len(result.output.splitlines()) == 2
+
+
+def test_memory_budget_records_peak_usage(
+    loop: AbstractEventLoop, params: RescheduleParams, tmp_path: Path
+) -> None:
+    """when a memory budget is set, it records each run's peak memory usage"""
+
+    params["history"] = str(tmp_path / "history.db")
+    params["memory_budget"] = 64
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task() for _ in range(3)])
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, datetime(2025, 1, 5, 0, 0, 0), **params)
+
+    [run] = RunHistory(params["history"]).recent()
+    assert run.peak_memory is not None
+    assert 0 < run.peak_memory < 64 * 2**20
+    assert not tracemalloc.is_tracing()
+
+
+def test_history_requires_a_path() -> None:
+    """when showing history without a history path, it exits with a usage error"""
+
+    result = CliRunner().invoke(cli, ["history"])
+
+    assert result.exit_code == 2
+    assert "--history is required" in result.output
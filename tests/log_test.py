@@ -0,0 +1,90 @@
+import json
+import logging
+from collections.abc import Generator
+from datetime import date
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.set_env import set_env
+
+from postpwn import log
+from postpwn.log import JsonFormatter
+from postpwn.rescheduler import reschedule
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+def records() -> Generator[list[logging.LogRecord], None, None]:
+    handler = ListHandler()
+    logger = logging.getLogger("postpwn.rescheduler")
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+
+
+def test_json_formatter_includes_structured_fields() -> None:
+    """when logging in JSON, it writes the message and any extra fields as one object"""
+
+    record = logging.LogRecord(
+        "postpwn.rescheduler", logging.INFO, "", 0, "Moved %d task(s)", (3,), None
+    )
+    record.moves = 3
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "Moved 3 task(s)"
+    assert payload["level"] == "INFO"
+    assert payload["moves"] == 3
+
+
+async def run_reschedule(task_count: int) -> None:
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task() for _ in range(task_count)])
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        await reschedule(
+            api=fake_api,
+            filter="label:test",
+            max_weight=10,
+            time_zone="Etc/UTC",
+            curr_date=date(2025, 1, 5),
+            dry_run=True,
+        )
+
+
+@pytest.mark.asyncio
+async def test_moves_are_aggregated_at_info(records: list[logging.LogRecord]) -> None:
+    """when logging at INFO, it logs a single summary instead of a line per task"""
+
+    await run_reschedule(20)
+
+    messages = [record.getMessage() for record in records]
+    assert not any(
+        message.startswith("Rescheduling ") and " from " in message
+        for message in messages
+    )
+    assert "Rescheduling 20 of 20 planned task(s) across 1 day(s)" in messages
+
+
+@pytest.mark.asyncio
+async def test_sampled_moves_are_logged_at_info(
+    records: list[logging.LogRecord], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """when sampling is enabled, it logs per-task lines for the sampled tasks"""
+
+    monkeypatch.setattr(log, "sample_rate", 1.0)
+
+    await run_reschedule(5)
+
+    task_lines = [record for record in records if hasattr(record, "task_id")]
+    assert len(task_lines) == 5
+    assert all(record.levelno == logging.INFO for record in task_lines)
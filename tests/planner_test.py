@@ -0,0 +1,486 @@
+import asyncio
+import itertools
+import random
+import threading
+from dataclasses import replace
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from postpwn import planner
+from postpwn.plan_cache import PlanCache
+from postpwn.planner import (
+    MAX_DP_CAPACITY,
+    Planner,
+    PlanRequest,
+    solve,
+    tune_granularity,
+)
+from postpwn.solvers import (
+    CELL_BYTES,
+    EXACT_BUDGET,
+    PlanCancelled,
+    PlanItem,
+    choose_strategy,
+    fill_limited_sack,
+    greedy_limited_sack,
+    greedy_sack,
+    solve_day,
+    within_memory,
+)
+
+
+def build_request(count: int, capacity: int) -> PlanRequest:
+    rng = random.Random(count)
+    items = [
+        PlanItem(
+            str(index),
+            rng.randint(1, capacity),
+            rng.randint(1, 4),
+            date(2025, 1, 1).toordinal(),
+        )
+        for index in range(count)
+    ]
+
+    return PlanRequest.from_items(items, (capacity,) * 7, date(2025, 1, 5).toordinal())
+
+
+@pytest.mark.asyncio
+async def test_solve_keeps_event_loop_responsive() -> None:
+    """when a large plan is being solved, other coroutines keep running on the event loop"""
+
+    ticks = 0
+
+    async def heartbeat() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        plans = await Planner().solve([build_request(300, 300)])
+    finally:
+        _ = heartbeat_task.cancel()
+
+    assert len(plans[0]) == 300
+    assert ticks > 1
+
+
+@pytest.mark.asyncio
+async def test_solve_timeout_cancels_planning() -> None:
+    """when planning exceeds the timeout, it raises a timeout error and stops the solve"""
+
+    with pytest.raises(TimeoutError, match="Planning did not finish within"):
+        _ = await Planner(timeout=0.01).solve([build_request(2000, 2000)])
+
+
+def test_cancelled_solve_raises() -> None:
+    """when the cancellation event is set, the solver stops with PlanCancelled"""
+
+    cancelled = threading.Event()
+    cancelled.set()
+
+    with pytest.raises(PlanCancelled):
+        _ = solve(build_request(10, 10), cancelled)
+
+
+@pytest.mark.asyncio
+async def test_identical_inputs_reuse_cached_plan(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """when the same inputs are planned twice, it reuses the memoized plan instead of solving again"""
+
+    request = build_request(20, 10)
+    plan_cache = PlanCache()
+    [first_plan] = await Planner(cache=plan_cache).solve([request])
+
+    def fail_solve(*_: object) -> None:
+        raise AssertionError("solve should not be called")
+
+    monkeypatch.setattr(planner, "solve", fail_solve)
+
+    [second_plan] = await Planner(cache=plan_cache).solve([request])
+
+    assert second_plan == first_plan
+
+
+@pytest.mark.asyncio
+async def test_settled_plans_persist_on_disk(tmp_path: Path) -> None:
+    """when a plan has been applied, a fresh planner sharing the cache directory sees the backlog as settled"""
+
+    request = build_request(20, 10)
+    [plan] = await Planner(cache=PlanCache(str(tmp_path))).solve([request])
+    Planner(cache=PlanCache(str(tmp_path))).settle(request, plan)
+
+    fresh_planner = Planner(cache=PlanCache(str(tmp_path)))
+
+    assert fresh_planner.is_settled(request.settled(plan))
+    assert not fresh_planner.is_settled(request)
+
+
+def brute_force_value(
+    max_weight: int, items: list[PlanItem], limits: tuple[int, ...]
+) -> int:
+    best = 0
+    for size in range(len(items) + 1):
+        for subset in itertools.combinations(items, size):
+            if is_feasible(max_weight, list(subset), limits):
+                best = max(best, sum(item.value for item in subset))
+
+    return best
+
+
+def is_feasible(
+    max_weight: int, items: list[PlanItem], limits: tuple[int, ...]
+) -> bool:
+    counts = [0] * len(limits)
+    for item in items:
+        if item.group >= 0:
+            counts[item.group] += 1
+
+    return sum(item.weight for item in items) <= max_weight and all(
+        count <= limit for count, limit in zip(counts, limits)
+    )
+
+
+def test_limited_sack_matches_brute_force() -> None:
+    """when tasks count against limits, the exact solver finds the best value within every limit"""
+
+    rng = random.Random(7)
+    for _ in range(30):
+        limits = (rng.randint(1, 3), rng.randint(1, 3))
+        items = [
+            PlanItem(
+                str(index), rng.randint(0, 5), rng.randint(1, 4), 0, rng.randint(-1, 1)
+            )
+            for index in range(9)
+        ]
+        max_weight = rng.randint(1, 12)
+
+        batch = fill_limited_sack(max_weight, items, limits)
+
+        assert is_feasible(max_weight, batch, limits)
+        assert sum(item.value for item in batch) == brute_force_value(
+            max_weight, items, limits
+        )
+
+
+def test_greedy_limited_sack_respects_limits() -> None:
+    """when the backlog is too large to solve exactly, the greedy fallback still respects every limit"""
+
+    rng = random.Random(11)
+    limits = (3, 5)
+    items = [
+        PlanItem(
+            str(index), rng.randint(0, 5), rng.randint(1, 4), 0, rng.randint(-1, 1)
+        )
+        for index in range(200)
+    ]
+
+    batch = greedy_limited_sack(20, items, limits)
+
+    assert batch
+    assert is_feasible(20, batch, limits)
+
+
+def test_approximate_solvers_stay_within_their_bounds() -> None:
+    """when approximating, greedy keeps within half of the best value"""
+
+    rng = random.Random(13)
+    for _ in range(30):
+        items = [
+            PlanItem(str(index), rng.randint(1, 8), rng.randint(1, 400), 0)
+            for index in range(10)
+        ]
+        max_weight = rng.randint(1, 20)
+        best = brute_force_value(max_weight, items, ())
+
+        batch = greedy_sack(max_weight, items)
+        assert is_feasible(max_weight, batch, ())
+        assert sum(item.value for item in batch) >= 0.5 * best
+
+
+def test_greedy_falls_back_to_the_best_single_task() -> None:
+    """when one valuable task is crowded out by denser ones, greedy schedules it on its own"""
+
+    items = [PlanItem("small", 1, 2, 0), PlanItem("large", 10, 10, 0)]
+
+    assert greedy_sack(10, items) == [items[1]]
+
+
+def test_auto_strategy_scales_with_backlog_size() -> None:
+    """when the backlog grows past the exact budget, the automatic policy switches to an approximation"""
+
+    items = [PlanItem(str(index), 1, 4, 0) for index in range(100)]
+
+    assert choose_strategy(10, items) == "exact"
+    assert choose_strategy(EXACT_BUDGET, items) == "greedy"
+
+
+def test_memory_budget_steps_down_to_smaller_tables() -> None:
+    """when a day's solver table wouldn't fit the memory budget, it solves the day with a smaller one"""
+
+    items = [PlanItem(str(index), 5, 4, 0) for index in range(100)]
+
+    # Selections of up to 100 tasks, one per unit of capacity
+    exact = 1001 * (CELL_BYTES + 8 * 100)
+    assert within_memory(1000, items, "exact", None) == "exact"
+    assert within_memory(1000, items, "exact", exact) == "exact"
+    assert within_memory(1000, items, "exact", exact - 1) == "greedy"
+    assert solve_day(1000, items, memory_budget=0) == greedy_sack(1000, items)
+
+
+def test_memory_budget_is_part_of_the_plan() -> None:
+    """when a memory budget is set, the plan still fits every day's capacity"""
+
+    request = build_request(200, 50)
+    budgeted = replace(request, strategy="auto", memory_budget=1)
+
+    plan = solve(budgeted)
+
+    assert plan.keys() == set(request.ids)
+    assert request.fingerprint() != budgeted.fingerprint()
+    load: dict[int, int] = {}
+    for id, weight in zip(request.ids, request.weights):
+        load[plan[id]] = load.get(plan[id], 0) + weight
+    assert max(load.values()) <= 50
+
+
+@pytest.mark.asyncio
+async def test_planner_strategy_is_part_of_the_cache_key() -> None:
+    """when the solver strategy changes, it plans again instead of reusing the cached plan"""
+
+    request = build_request(30, 10)
+    cache = PlanCache()
+
+    _ = await Planner(cache=cache, strategy="exact").solve([request])
+    _ = await Planner(cache=cache, strategy="greedy").solve([request])
+
+    assert len(cache.entries) == 2
+
+
+def test_fetch_order_does_not_change_the_plan() -> None:
+    """when the same backlog arrives in a different order, it produces the identical plan"""
+
+    rng = random.Random(17)
+    start = date(2025, 1, 5).toordinal()
+    items = [
+        PlanItem(str(index), rng.randint(1, 4), rng.randint(1, 4), start - index % 3)
+        for index in range(40)
+    ]
+    shuffled = items.copy()
+    rng.shuffle(shuffled)
+
+    request = PlanRequest.from_items(items, (6,) * 7, start)
+    shuffled_request = PlanRequest.from_items(shuffled, (6,) * 7, start)
+
+    assert shuffled_request == request
+    assert list(solve(shuffled_request).items()) == list(solve(request).items())
+
+
+def test_ties_go_to_the_earliest_due_task() -> None:
+    """when two tasks are equally valuable, it schedules the one that has been due longest first"""
+
+    start = date(2025, 1, 5).toordinal()
+    items = [PlanItem("newer", 2, 1, start - 1), PlanItem("older", 2, 1, start - 5)]
+
+    plan = solve(PlanRequest.from_items(items, (2,) * 7, start))
+
+    assert plan == {"older": start, "newer": start + 1}
+
+
+def test_minimize_churn_only_moves_overflow() -> None:
+    """when minimizing churn, tasks on future days stay in place and only the overflow moves"""
+
+    start = date(2025, 1, 5).toordinal()
+    items = [
+        PlanItem("overdue", 2, 1, start - 3),
+        PlanItem("yesterday", 2, 1, start - 1),
+        *(PlanItem(id, 2, 1, start + 2) for id in ("c", "d", "e")),
+    ]
+    request = PlanRequest.from_items(items, (4,) * 7, start)
+
+    plan = solve(replace(request, minimize_churn=True))
+
+    assert plan == {
+        "overdue": start,
+        "yesterday": start,
+        "c": start + 2,
+        "d": start + 2,
+        "e": start + 3,
+    }
+    moved = [item.id for item in items if plan[item.id] != item.due]
+    assert moved == ["overdue", "yesterday", "e"]
+    assert solve(request)["c"] == start + 1
+
+
+def test_deadlines_pin_tasks_before_they_pass() -> None:
+    """when meeting deadlines, a task waits behind more valuable ones only until its deadline allows"""
+
+    start = date(2025, 1, 5).toordinal()
+    items = [
+        PlanItem("deadline", 2, 1, start, deadline=start + 1),
+        *(PlanItem(id, 2, 4, start) for id in ("a", "b", "c")),
+    ]
+    request = PlanRequest.from_items(items, (2,) * 7, start)
+
+    plan = solve(replace(request, meet_deadlines=True))
+
+    assert plan == {"a": start, "deadline": start + 1, "b": start + 2, "c": start + 3}
+    assert solve(request)["deadline"] == start + 3
+
+
+def test_missed_deadlines_are_planned_first(caplog: pytest.LogCaptureFixture) -> None:
+    """when deadlines can't all be met, it warns and plans the late tasks as early as possible"""
+
+    start = date(2025, 1, 5).toordinal()
+    items = [
+        PlanItem("valuable", 2, 4, start),
+        *(PlanItem(id, 2, 1, start + 1, deadline=start) for id in ("d", "e")),
+    ]
+    request = PlanRequest.from_items(items, (2,) * 7, start)
+
+    plan = solve(replace(request, meet_deadlines=True))
+
+    assert plan == {"d": start, "e": start + 1, "valuable": start + 2}
+    assert "1 task(s) can't be planned by their deadline" in caplog.text
+
+
+def test_granularity_is_reduced_losslessly() -> None:
+    """when weights and capacities share a common step, it plans in units of that step with the same result"""
+
+    items = [PlanItem(str(index), 15 * (index % 4 + 1), 1, 0) for index in range(12)]
+    request = PlanRequest.from_items(items, (480,) * 7, date(2025, 1, 5).toordinal())
+
+    tuned = tune_granularity(request)
+
+    assert tuned.capacities == (32,) * 7
+    assert solve(tuned) == solve(request)
+
+
+def test_granularity_is_coarsened_for_large_capacities() -> None:
+    """when capacities are too large for the DP, it coarsens weights without overfilling a day"""
+
+    capacity = MAX_DP_CAPACITY * 7 + 3
+    items = [PlanItem(str(index), 997 + index, 1, 0) for index in range(20)]
+    request = PlanRequest.from_items(
+        items, (capacity,) * 7, date(2025, 1, 5).toordinal()
+    )
+
+    tuned = tune_granularity(request)
+    plan = solve(request)
+
+    assert max(tuned.capacities) <= MAX_DP_CAPACITY
+    assert len(plan) == len(items)
+    for day in set(plan.values()):
+        load = sum(item.weight for item in items if plan[item.id] == day)
+        assert load <= capacity
+
+
+def test_coarsening_keeps_small_days() -> None:
+    """when a day's capacity is smaller than the coarsening step, the day still takes tasks"""
+
+    weekday = MAX_DP_CAPACITY * 2
+    capacities = (weekday,) * 5 + (1, 1)
+    items = [PlanItem(str(index), 1, 1, 0) for index in range(20)]
+    request = PlanRequest.from_items(items, capacities, date(2025, 1, 4).toordinal())
+
+    tuned = tune_granularity(request)
+    plan = solve(request)
+
+    assert tuned.capacities[5:] == (1, 1)
+    # A Saturday and a Sunday come first, each taking one task
+    assert sorted(plan.values())[:2] == [request.start, request.start + 1]
+
+
+@pytest.mark.parametrize("minimize_churn", [False, True])
+def test_incremental_solves_match_full_solves(minimize_churn: bool) -> None:
+    """when tasks are added and removed between solves, reusing the day table gives the same plan as solving from scratch"""
+
+    rng = random.Random(23)
+    start = date(2025, 1, 5).toordinal()
+    items = [
+        PlanItem(
+            str(index), rng.randint(1, 5), rng.randint(1, 4), start + rng.randint(-5, 5)
+        )
+        for index in range(60)
+    ]
+    table = None
+    for step in range(20):
+        if step % 2:
+            items.pop(rng.randrange(len(items)))
+        else:
+            items.append(
+                PlanItem(f"new-{step}", rng.randint(1, 5), rng.randint(1, 4), start)
+            )
+
+        request = replace(
+            PlanRequest.from_items(items, (8,) * 7, start),
+            minimize_churn=minimize_churn,
+        )
+        plan, table = planner.solve_incremental(request, table)
+
+        assert plan == solve(request)
+
+
+@pytest.mark.parametrize(
+    ("minimize_churn", "completed", "resolved"),
+    [
+        # The last day's own choice is all that changes
+        (False, 39, 1),
+        # Today picks a later task instead, so every day after it changes too
+        (False, 0, 10),
+        # Later days only pick from their own tasks, so they are reused
+        (True, 0, 1),
+    ],
+)
+def test_unchanged_days_reuse_their_last_choice(
+    monkeypatch: pytest.MonkeyPatch, minimize_churn: bool, completed: int, resolved: int
+) -> None:
+    """when a task is completed, days whose candidates didn't change are reused and the rest are solved in full"""
+
+    start = date(2025, 1, 5).toordinal()
+    items = [PlanItem(str(index), 2, 1, start + index // 4) for index in range(40)]
+    request = replace(
+        PlanRequest.from_items(items, (8,) * 7, start), minimize_churn=minimize_churn
+    )
+    _, table = planner.solve_incremental(request)
+
+    solved_days: list[int] = []
+    solve_day = planner.solve_day
+
+    def counting_solve_day(*args: object, **kwargs: object) -> list[PlanItem]:
+        solved_days.append(1)
+        return solve_day(*args, **kwargs)  # pyright: ignore[reportArgumentType]
+
+    monkeypatch.setattr(planner, "solve_day", counting_solve_day)
+    smaller = replace(
+        PlanRequest.from_items(
+            [item for item in items if item.id != str(completed)], (8,) * 7, start
+        ),
+        minimize_churn=minimize_churn,
+    )
+    plan, _ = planner.solve_incremental(smaller, table)
+
+    assert len(solved_days) == resolved
+    assert plan == solve(smaller)
+
+
+@pytest.mark.asyncio
+async def test_planner_verifies_incremental_solves() -> None:
+    """when verification is on, incremental plans are checked against a full solve"""
+
+    request = replace(build_request(30, 10), name="backlog")
+    verifying = Planner(strategy="exact", verify=True)
+    _ = await verifying.solve([request])
+
+    changed = replace(
+        PlanRequest.from_items(request.items()[1:], request.capacities, request.start),
+        name="backlog",
+    )
+    [plan] = await verifying.solve([changed])
+
+    assert "backlog" in verifying.tables
+    assert plan == solve(replace(changed, strategy="exact"))
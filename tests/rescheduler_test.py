@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 from unittest.mock import AsyncMock
 
 import pytest
-from helpers.data_generators import build_task
+from helpers.data_generators import build_duration, build_task
 from helpers.fake_api import FakeTodoistAPI
 from helpers.set_env import set_env
 from requests import HTTPError
@@ -319,6 +319,118 @@ def test_reschedule_with_rules_and_daily_weight(
     assert scheduled_dates[fifth_day]["weight_two"] == 1
 
 
+def test_reschedule_with_limits(
+    loop: AbstractEventLoop, params: RescheduleParams, fake_api: FakeTodoistAPI
+) -> None:
+    """when rules have limits, it never schedules more matching tasks on a day than the limit"""
+
+    params["rules"] = "tests/fixtures/limit_rules.json"
+
+    tasks = [
+        *[build_task({"labels": ["quick"]}) for _ in range(5)],
+        *[build_task({"labels": ["weight_two"]}) for _ in range(2)],
+    ]
+
+    fake_api.setup_tasks(tasks)
+
+    curr_datetime = datetime(2025, 1, 5, 0, 0, 0)
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, curr_datetime, **params)
+
+    assert fake_api.update_task.call_count == 7
+
+    scheduled_dates = fake_api.task_distribution()
+
+    # Limited tasks don't use weight, so they share days with weighted tasks
+    assert scheduled_dates[curr_datetime]["quick"] == 2
+    assert scheduled_dates[curr_datetime]["weight_two"] == 1
+
+    second_day = curr_datetime + timedelta(days=1)
+    assert scheduled_dates[second_day]["quick"] == 2
+    assert scheduled_dates[second_day]["weight_two"] == 1
+
+    third_day = curr_datetime + timedelta(days=2)
+    assert scheduled_dates[third_day]["quick"] == 1
+
+
+def test_reschedule_with_duration_weights(
+    loop: AbstractEventLoop, params: RescheduleParams, fake_api: FakeTodoistAPI
+) -> None:
+    """when duration weights are configured, it derives weights from task durations and falls back to label rules"""
+
+    params["rules"] = "tests/fixtures/duration_weight_rules.json"
+
+    timed_tasks = [
+        build_task(
+            {
+                "duration": build_duration({"amount": 30, "unit": "minute"}),
+                "priority": 4,
+            }
+        )
+        for _ in range(3)
+    ]
+    labeled_task = build_task({"labels": ["weight_one"], "priority": 1})
+    labeled_task.duration = None
+    too_long_task = build_task(
+        {"duration": build_duration({"amount": 1, "unit": "day"})}
+    )
+
+    fake_api.setup_tasks([*timed_tasks, labeled_task, too_long_task])
+
+    curr_datetime = datetime(2025, 1, 5, 0, 0, 0)
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, curr_datetime, **params)
+
+    # A full day of work never fits, so that task is left where it is
+    assert fake_api.update_task.call_count == 4
+    updated_ids = [call.args[0] for call in fake_api.update_task.call_args_list]
+    assert too_long_task.id not in updated_ids
+
+    scheduled_dates = fake_api.task_distribution()
+
+    # Two 30 minute tasks fill the first day, the third shares the next day
+    # with the task weighted by its label
+    assert sum(scheduled_dates[curr_datetime].values()) == 2 * 2
+    second_day = curr_datetime + timedelta(days=1)
+    assert scheduled_dates[second_day]["weight_one"] == 1
+    assert scheduled_dates[second_day]["4"] == 1
+
+
+def test_rulesets_are_planned_independently(
+    loop: AbstractEventLoop, params: RescheduleParams, fake_api: FakeTodoistAPI
+) -> None:
+    """when extra rulesets are configured, it plans each against its own capacity in worker processes"""
+
+    params["rules"] = "tests/fixtures/rulesets_rules.json"
+    params["workers"] = 2
+
+    shared_task = build_task({"labels": ["weight_one"]})
+    fake_api.setup_tasks(
+        [shared_task, build_task({"labels": ["weight_one"]})], query=params["filter"]
+    )
+    fake_api.setup_tasks(
+        [shared_task, *[build_task({"labels": ["weight_one"]}) for _ in range(2)]],
+        query="label:other",
+    )
+
+    curr_datetime = datetime(2025, 1, 5, 0, 0, 0)
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, curr_datetime, **params)
+
+    # The shared task is only planned by the first ruleset that claims it
+    assert fake_api.update_task.call_count == 4
+    assert [call.args[0] for call in fake_api.update_task.call_args_list].count(
+        shared_task.id
+    ) == 1
+
+    scheduled_dates = fake_api.task_distribution()
+    assert scheduled_dates[curr_datetime]["weight_one"] == 3
+    assert scheduled_dates[curr_datetime + timedelta(days=1)]["weight_one"] == 1
+
+
 def test_dry_run_doesn_not_update_tasks(
     loop: AbstractEventLoop, params: RescheduleParams, fake_api: FakeTodoistAPI
 ) -> None:
@@ -424,3 +536,32 @@ async def test_retry_respects_env_variable() -> None:
             pass
 
     assert mock_func.call_count == 3
+
+
+def test_subtasks_are_planned_with_their_parents(
+    loop: AbstractEventLoop, params: RescheduleParams, fake_api: FakeTodoistAPI
+) -> None:
+    """when grouping subtasks, a family is planned as one item and moved to a single day"""
+
+    params["rules"] = "tests/fixtures/single_max_weight_rules.json"
+    params["group_subtasks"] = True
+
+    parent = build_task({"labels": ["weight_one"], "priority": 1})
+    child = build_task(
+        {"labels": ["weight_one"], "priority": 4, "parent_id": parent.id}
+    )
+    other = build_task({"labels": ["weight_one"], "priority": 3})
+    fake_api.setup_tasks([parent, child, other])
+
+    curr_datetime = datetime(2025, 1, 5, 12, 0, 0)
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, curr_datetime, **params)
+
+    days = {
+        call.args[0]: call.kwargs["due_date"]
+        for call in fake_api.update_task.call_args_list
+    }
+    # The family is as urgent as its child and as heavy as both tasks
+    assert days[parent.id] == days[child.id] == curr_datetime.date()
+    assert days[other.id] == curr_datetime.date() + timedelta(days=1)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from requests import HTTPError
+
+from postpwn.retry import CircuitOpenError, RetryPolicy
+
+
+@pytest.mark.asyncio
+async def test_one_failure_slows_every_request() -> None:
+    """when one request fails, other requests wait out the same backoff"""
+
+    policy = RetryPolicy(attempts=1, max_delay=0.2)
+    failing = AsyncMock(side_effect=HTTPError("429 Too Many Requests"))
+    succeeding = AsyncMock(return_value="ok")
+
+    with pytest.raises(HTTPError):
+        await policy.call(failing)
+
+    started = time.monotonic()
+    results = await asyncio.gather(policy.call(succeeding), policy.call(succeeding))
+
+    assert results == ["ok", "ok"]
+    assert time.monotonic() - started >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_is_shared_across_calls() -> None:
+    """when the retry budget is used up, later calls fail without retrying"""
+
+    policy = RetryPolicy(attempts=5, max_retries=2, max_delay=0.01)
+    failing = AsyncMock(side_effect=HTTPError("Always fails"))
+
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            await policy.call(failing)
+
+    assert failing.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_when_api_keeps_failing() -> None:
+    """when the API fails repeatedly, it stops calling it until the cooldown passes"""
+
+    policy = RetryPolicy(attempts=1, failure_threshold=3, max_delay=0.01)
+    failing = AsyncMock(side_effect=HTTPError("503 Service Unavailable"))
+
+    for _ in range(3):
+        with pytest.raises(HTTPError):
+            await policy.call(failing)
+
+    with pytest.raises(CircuitOpenError):
+        await policy.call(failing)
+
+    assert failing.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_released_one_at_a_time_after_a_backoff() -> None:
+    """when a backoff ends, waiting requests are let through spaced apart rather than all at once"""
+
+    policy = RetryPolicy(attempts=1, max_delay=0.05)
+    failing = AsyncMock(side_effect=HTTPError("429 Too Many Requests"))
+    with pytest.raises(HTTPError):
+        await policy.call(failing)
+
+    started: list[float] = []
+
+    async def record() -> None:
+        started.append(time.monotonic())
+
+    resume_at, interval = policy.resume_at, policy.interval
+    _ = await asyncio.gather(*(policy.call(record) for _ in range(5)))
+
+    # Each waiter is given its own slot, so however late any of them wake the
+    # last can't start before four intervals into the resumed calls. Those
+    # shrink a little with every success
+    assert started[-1] >= resume_at + 4 * interval * 0.99
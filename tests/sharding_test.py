@@ -0,0 +1,159 @@
+import time
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.set_env import set_env
+
+from postpwn import sharding
+from postpwn.cron import CronSchedule
+from postpwn.rescheduler import reschedule
+from postpwn.sharding import LEASE_SECONDS, HashRing, ShardCoordinator, lease_seconds
+from postpwn.types import Rule, Ruleset
+
+
+def test_hash_ring_moves_few_keys_when_resharding() -> None:
+    """when a shard is added, most keys stay on the shard they were on"""
+
+    keys = [f"#Project {index}" for index in range(1000)]
+    before = HashRing(4)
+    after = HashRing(5)
+
+    moved = sum(before.shard_for(key) != after.shard_for(key) for key in keys)
+
+    assert {before.shard_for(key) for key in keys} == set(range(4))
+    assert moved < len(keys) * 0.35
+
+
+def test_replicas_split_shards_without_overlap(tmp_path: Path) -> None:
+    """when several replicas share a lease database, each shard is held by exactly one of them"""
+
+    lease_db = tmp_path / "leases.db"
+    replicas = [ShardCoordinator(6, lease_db, owner=f"replica-{i}") for i in range(3)]
+
+    held = [
+        replica.leases.claim(replica.owner, 6, replica.ttl)[0] for replica in replicas
+    ]
+
+    assert all(len(shards) == 2 for shards in held)
+    assert set().union(*held) == set(range(6))
+
+
+def test_expired_leases_are_taken_over(tmp_path: Path) -> None:
+    """when a replica stops renewing its leases, another replica takes its shards"""
+
+    lease_db = tmp_path / "leases.db"
+    gone = ShardCoordinator(2, lease_db, owner="gone", ttl=0.1)
+    _ = gone.leases.claim(gone.owner, 2, gone.ttl)
+
+    time.sleep(0.2)
+    survivor = ShardCoordinator(2, lease_db, owner="survivor", ttl=0.1)
+
+    assert survivor.leases.claim(survivor.owner, 2, survivor.ttl) == ({0, 1}, set())
+
+
+def test_restarted_replicas_keep_their_shards(tmp_path: Path) -> None:
+    """when a replica restarts under its default name, it keeps its leases, and shutting down frees them for the others"""
+
+    lease_db = tmp_path / "leases.db"
+    keys = [f"#Project {index}" for index in range(12)]
+    before = ShardCoordinator(2, lease_db)
+    _ = before.owned(keys)
+
+    restarted = ShardCoordinator(2, lease_db)
+    assert all(restarted.owned(keys))
+
+    restarted.close()
+    other = ShardCoordinator(2, lease_db, owner="other")
+    assert all(other.owned(keys))
+
+
+def test_joining_replicas_are_handed_shards_between_runs(tmp_path: Path) -> None:
+    """when a replica joins, shards move over after the current run and every ruleset is planned on every tick"""
+
+    lease_db = tmp_path / "leases.db"
+    keys = [f"#Project {index}" for index in range(12)]
+    first = ShardCoordinator(4, lease_db, owner="first")
+    _ = first.owned(keys)
+    first.hand_over()
+
+    joined = ShardCoordinator(4, lease_db, owner="joined")
+    for _ in range(2):
+        owned = [joined.owned(keys), first.owned(keys)]
+        assert [sum(pair) for pair in zip(*owned)] == [1] * len(keys)
+        joined.hand_over()
+        first.hand_over()
+
+    held = [
+        replica.leases.claim(replica.owner, 4, replica.ttl)[0]
+        for replica in (first, joined)
+    ]
+    assert [len(shards) for shards in held] == [2, 2]
+
+
+def test_leases_outlast_the_gap_between_scheduled_runs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """when runs are further apart than the default lease, replicas keep splitting shards between ticks"""
+
+    now = time.time()
+    monkeypatch.setattr(sharding, "time", SimpleNamespace(time=lambda: now))
+    ttl = lease_seconds(CronSchedule.parse("@daily"), "America/New_York")
+    lease_db = tmp_path / "leases.db"
+    replicas = [
+        ShardCoordinator(4, lease_db, owner=f"replica-{i}", ttl=ttl) for i in range(2)
+    ]
+
+    # A day between ticks, longer than a lease lasts by default
+    day = 24 * 60 * 60
+    assert day > LEASE_SECONDS
+    assert ttl >= 2 * day
+    for _ in range(3):
+        held = [
+            replica.leases.claim(replica.owner, 4, replica.ttl)[0]
+            for replica in replicas
+        ]
+        assert [len(shards) for shards in held] == [2, 2]
+        assert set().union(*held) == set(range(4))
+        now += day
+
+
+@pytest.mark.asyncio
+async def test_sharded_replicas_plan_each_ruleset_once(tmp_path: Path) -> None:
+    """when rulesets are sharded across replicas, every task is moved by exactly one replica"""
+
+    lease_db = tmp_path / "leases.db"
+    replicas = [ShardCoordinator(2, lease_db, owner=f"replica-{i}") for i in range(2)]
+    rules = [Rule(filter="@weight_one", weight=1)]
+    rulesets = [Ruleset(filter="label:other", max_weight=1, rules=rules)]
+
+    shared_task = build_task({"labels": ["weight_one"]})
+    primary_tasks = [shared_task, build_task({"labels": ["weight_one"]})]
+    other_tasks = [shared_task, build_task({"labels": ["weight_one"]})]
+
+    updated_ids: list[str] = []
+    for replica in replicas:
+        fake_api = FakeTodoistAPI("VALID_TOKEN")
+        fake_api.setup_tasks(primary_tasks, query="label:test")
+        fake_api.setup_tasks(other_tasks, query="label:other")
+
+        with set_env({"RETRY_ATTEMPTS": "1"}):
+            await reschedule(
+                api=fake_api,
+                filter="label:test",
+                max_weight=2,
+                time_zone="Etc/UTC",
+                curr_date=date(2025, 1, 5),
+                rules=rules,
+                rulesets=rulesets,
+                shards=replica,
+            )
+
+        updated_ids.extend(call.args[0] for call in fake_api.update_task.call_args_list)
+
+    assert sorted(updated_ids) == sorted(
+        {task.id for task in [*primary_tasks, *other_tasks]}
+    )
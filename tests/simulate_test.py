@@ -0,0 +1,133 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+
+from postpwn.cli import cli
+from postpwn.simulate import Scenario, parse_weight, scenarios, simulate
+from postpwn.snapshot import take_snapshot
+from postpwn.types import Rule, Ruleset
+
+RULES = [Rule(filter="@weight_one", weight=1), Rule(filter="@weight_two", weight=2)]
+
+
+def test_scenarios_cover_the_grid() -> None:
+    """when several capacities and weights are given, it tries every combination"""
+
+    filter, weights = parse_weight("@< 15 min=1,2")
+    grid = scenarios([1.0, 1.5], {filter: weights})
+
+    assert filter == "@< 15 min"
+    assert [scenario.label() for scenario in grid] == [
+        "x1 @< 15 min=1",
+        "x1 @< 15 min=2",
+        "x1.5 @< 15 min=1",
+        "x1.5 @< 15 min=2",
+    ]
+    with pytest.raises(ValueError):
+        _ = parse_weight("@< 15 min")
+
+
+@pytest.mark.parametrize("option", ["@x=-1", "@x=0", "@x=2,0"])
+def test_weights_below_one_are_rejected(option: str) -> None:
+    """when a scenario would make a rule free or negative, it rejects the weight like the rules file does"""
+
+    with pytest.raises(ValueError, match="at least 1"):
+        _ = parse_weight(option)
+
+
+def test_simulation_reports_each_scenario() -> None:
+    """when simulating in worker processes, more capacity clears the backlog sooner and heavier rules take longer"""
+
+    tasks = [
+        *(build_task({"labels": ["weight_one"]}) for _ in range(8)),
+        *(build_task({"labels": ["weight_two"]}) for _ in range(4)),
+    ]
+    rulesets = [Ruleset(filter="label:test", max_weight=4, rules=RULES)]
+    grid = [
+        Scenario(),
+        Scenario(capacity_scale=2),
+        Scenario(weights={"@weight_two": 4}),
+    ]
+
+    with ProcessPoolExecutor(2) as executor:
+        base, doubled, heavier = simulate(
+            rulesets, [tasks], date(2025, 1, 5), grid, executor, strategy="exact"
+        )
+
+    assert base.tasks == 12
+    assert base.days_to_clear == 4
+    assert base.load == [4, 4, 4, 4]
+    assert doubled.days_to_clear == 2
+    assert heavier.days_to_clear == 6
+    assert base.moved == 12
+
+
+def test_simulation_plans_like_a_run(caplog: pytest.LogCaptureFixture) -> None:
+    """when grouping subtasks under a memory budget, it plans families together and counts each of their tasks"""
+
+    parent = build_task({"labels": ["weight_one"]})
+    child = build_task({"labels": ["weight_one"], "parent_id": parent.id})
+    others = [build_task({"labels": ["weight_one"]}) for _ in range(3)]
+    rulesets = [Ruleset(filter="label:test", max_weight=2, rules=RULES)]
+
+    (outcome,) = simulate(
+        rulesets,
+        [[parent, child, *others]],
+        date(2025, 1, 5),
+        [Scenario()],
+        group_subtasks=True,
+        memory_budget=1,
+    )
+
+    assert outcome.tasks == 5
+    assert outcome.unplanned == 0
+    assert outcome.load == [2, 1, 2]
+    assert "take up the whole memory budget" in caplog.text
+
+
+def test_simulate_command_replays_a_snapshot(tmp_path: Path) -> None:
+    """when simulating from a snapshot, it prints a row per scenario"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks(
+        [build_task({"labels": ["weight_one"]}) for _ in range(6)], query="label:test"
+    )
+    snapshot = tmp_path / "backlog.snapshot"
+    asyncio.run(take_snapshot(fake_api, ["label:test"], snapshot, date(2025, 1, 5)))
+    rules = tmp_path / "rules.json"
+    _ = rules.write_text(
+        json.dumps({"max_weight": 2, "rules": [rule.model_dump() for rule in RULES]})
+    )
+
+    result = CliRunner().invoke(
+        cli,
+        [
+            "--filter=label:test",
+            f"--rules={rules}",
+            f"--replay={snapshot}",
+            "--workers=1",
+            # Live logging swaps stdout back out from under the runner
+            "--log-level=warning",
+            "simulate",
+            "--capacity-scale=1",
+            "--capacity-scale=3",
+            "--weight=@weight_one=1,2",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    rows = result.stdout.strip().splitlines()[1:]
+    assert [row.split()[:2] for row in rows] == [
+        ["x1", "@weight_one=1"],
+        ["x1", "@weight_one=2"],
+        ["x3", "@weight_one=1"],
+        ["x3", "@weight_one=2"],
+    ]
+    assert [int(row.split()[3]) for row in rows] == [3, 6, 1, 2]
@@ -0,0 +1,68 @@
+from datetime import date, datetime, time
+
+import pytest
+from helpers.data_generators import build_due, build_duration, build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.set_env import set_env
+from todoist_api_python.models import Task
+
+from postpwn.rescheduler import reschedule
+from postpwn.slots import FreeSlots
+from postpwn.types import WorkingHours
+
+TODAY = date(2025, 1, 5)
+
+
+def timed_task(due: datetime, minutes: int, priority: int = 1) -> Task:
+    return build_task(
+        {
+            "due": build_due({"date": due}, is_datetime=True),
+            "duration": build_duration({"amount": minutes, "unit": "minute"}),
+            "priority": priority,
+        },
+        is_datetime=True,
+    )
+
+
+def test_free_slots_place_tasks_around_reservations() -> None:
+    """when a preferred time is taken, it places the task in the nearest gap after it, then before it"""
+
+    slots = FreeSlots(9 * 60, 12 * 60)
+    slots.reserve(10 * 60, 11 * 60)
+
+    assert slots.place(60, 9 * 60) == 9 * 60
+    assert slots.place(30, 9 * 60 + 30) == 11 * 60
+    assert slots.place(30, 12 * 60) == 11 * 60 + 30
+    assert slots.place(15, 9 * 60) is None
+    assert slots.starts == []
+
+
+@pytest.mark.asyncio
+async def test_moved_timed_tasks_get_free_slots() -> None:
+    """when timed tasks are moved onto a day with working hours, they fill free slots instead of sharing a time"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    meeting = timed_task(datetime(2025, 1, 5, 10), 60)
+    first = timed_task(datetime(2025, 1, 2, 9), 60, priority=4)
+    second = timed_task(datetime(2025, 1, 3, 9), 60)
+    third = timed_task(datetime(2025, 1, 4, 9), 30)
+    fake_api.setup_tasks([meeting, first, second, third])
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        await reschedule(
+            api=fake_api,
+            filter="test",
+            max_weight=10,
+            time_zone="Etc/UTC",
+            curr_date=TODAY,
+            working_hours=WorkingHours(start=time(9), end=time(17)),
+        )
+
+    times = {
+        call.args[0]: call.kwargs["due_datetime"]
+        for call in fake_api.update_task.call_args_list
+    }
+    assert times[meeting.id] == datetime(2025, 1, 5, 10)
+    assert times[first.id] == datetime(2025, 1, 5, 9)
+    assert times[second.id] == datetime(2025, 1, 5, 11)
+    assert times[third.id] == datetime(2025, 1, 5, 12)
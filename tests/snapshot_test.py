@@ -0,0 +1,133 @@
+import asyncio
+from asyncio import AbstractEventLoop
+from datetime import date
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.set_env import set_env
+
+from postpwn.cli import RescheduleParams, cli, postpwn
+from postpwn.filters import deadline_date
+from postpwn.history import RunHistory
+from postpwn.rescheduler import reschedule
+from postpwn.snapshot import Snapshot, SnapshotAPI, take_snapshot
+from postpwn.types import Rule, Ruleset
+
+
+def planned_fields(task: object) -> tuple[object, ...]:
+    return tuple(
+        getattr(task, field)
+        for field in ("id", "content", "labels", "priority", "assignee_id", "parent_id")
+    )
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trips_planned_fields(tmp_path: Path) -> None:
+    """when a backlog is recorded, reading it back gives the fields the planner uses"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    tasks = [
+        build_task({"labels": ["weight_one", "ünïcode"], "priority": 4}),
+        build_task(is_datetime=True),
+        build_task({"labels": []}),
+    ]
+    fake_api.setup_tasks(tasks)
+    path = tmp_path / "backlog.snapshot"
+
+    await take_snapshot(fake_api, ["label:test"], path, date(2025, 1, 5))
+    snapshot = Snapshot(path)
+    loaded = snapshot.tasks()
+
+    assert snapshot.taken_on == date(2025, 1, 5)
+    assert [planned_fields(task) for task in loaded] == [
+        planned_fields(task) for task in tasks
+    ]
+    for original, task in zip(tasks, loaded):
+        assert original.due and task.due
+        assert str(task.due.date) == str(original.due.date)  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
+        assert task.duration == original.duration
+        assert deadline_date(task) == deadline_date(original)
+
+
+@pytest.mark.asyncio
+async def test_replay_plans_like_the_live_run(tmp_path: Path) -> None:
+    """when a recorded backlog is replayed, it plans the same moves as the live run without writing back"""
+
+    rules = [Rule(filter="@weight_one", weight=1), Rule(filter="@weight_two", weight=2)]
+    rulesets = [Ruleset(filter="label:other", max_weight=2, rules=rules)]
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks(
+        [build_task({"labels": ["weight_one"]}) for _ in range(6)], query="label:test"
+    )
+    fake_api.setup_tasks(
+        [build_task({"labels": ["weight_two"]}) for _ in range(3)], query="label:other"
+    )
+    path = tmp_path / "backlog.snapshot"
+    await take_snapshot(fake_api, ["label:test", "label:other"], path, date(2025, 1, 5))
+
+    replay_api = SnapshotAPI(Snapshot(path))
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        for api in (fake_api, replay_api):
+            await reschedule(
+                api=api,
+                filter="label:test",
+                max_weight=3,
+                time_zone="Etc/UTC",
+                curr_date=date(2025, 1, 5),
+                rules=rules,
+                rulesets=rulesets,
+            )
+
+    live_moves = sorted(
+        (call.args[0], call.kwargs.get("due_date") or call.kwargs["due_datetime"])
+        for call in fake_api.update_task.call_args_list
+    )
+    replayed_moves = sorted(
+        (task_id, params.get("due_date") or params["due_datetime"])
+        for task_id, params in replay_api.updates
+    )
+    assert replayed_moves == live_moves
+    assert len(live_moves) == 9
+
+
+def test_replays_are_dry_runs(
+    loop: AbstractEventLoop, params: RescheduleParams, tmp_path: Path
+) -> None:
+    """when a snapshot is replayed, the plan cache and history don't count it as applied, so the next live run still sends its moves"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    fake_api.setup_tasks([build_task() for _ in range(3)], query="label:test")
+    snapshot = tmp_path / "backlog.snapshot"
+    loop.run_until_complete(
+        take_snapshot(fake_api, ["label:test"], snapshot, date(2025, 1, 5))
+    )
+    params["plan_cache"] = str(tmp_path / "plans")
+    params["history"] = str(tmp_path / "history.db")
+
+    # The command plans on the current event loop
+    asyncio.set_event_loop(loop)
+    result = CliRunner().invoke(
+        cli,
+        [
+            "--filter=label:test",
+            f"--replay={snapshot}",
+            f"--plan-cache={params['plan_cache']}",
+            f"--history={params['history']}",
+            "--workers=1",
+            # Live logging swaps stdout back out from under the runner
+            "--log-level=warning",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    with set_env({"RETRY_ATTEMPTS": "1"}):
+        postpwn(fake_api, loop, date(2025, 1, 5), **params)
+
+    assert fake_api.update_task.await_count == 3
+    assert [run.dry_run for run in RunHistory(params["history"]).recent()] == [
+        False,
+        True,
+    ]
@@ -0,0 +1,248 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+from helpers.data_generators import build_task
+from helpers.fake_api import FakeTodoistAPI
+from helpers.webhook_sender import send_body, send_event
+
+from postpwn.cli import DEFAULT_FILTER, make_job, run_schedule, run_webhooks
+from postpwn.webhooks import MAX_BODY_BYTES, TaskBacklog, WebhookReceiver
+
+SECRET = "client-secret"
+
+
+@pytest.mark.asyncio
+async def test_receiver_only_accepts_signed_events() -> None:
+    """when a webhook arrives, it is only applied if signed with the client secret, and only once"""
+
+    backlog = TaskBacklog(FakeTodoistAPI("VALID_TOKEN"))
+    events: list[str] = []
+
+    def on_event(event_name: str, event_data: dict[str, object]) -> None:
+        events.append(event_name)
+        _ = backlog.apply(event_name, event_data)
+
+    receiver = WebhookReceiver(SECRET, on_event, 0, host="127.0.0.1")
+    await receiver.start()
+    task = build_task()
+
+    try:
+        assert (
+            await send_event(receiver.port, "wrong-secret", "item:added", task) == 401
+        )
+        assert await send_event(receiver.port, SECRET, "item:added", task, "1") == 200
+        assert await send_event(receiver.port, SECRET, "item:added", task, "1") == 200
+    finally:
+        await receiver.close()
+
+    assert events == ["item:added"]
+    assert list(backlog.tasks) == [task.id]
+
+
+@pytest.mark.asyncio
+async def test_receiver_rejects_partial_tasks() -> None:
+    """when a signed event carries an incomplete task, it answers 400 and leaves the backlog alone"""
+
+    backlog = TaskBacklog(FakeTodoistAPI("VALID_TOKEN"))
+
+    def on_event(event_name: str, event_data: dict[str, object]) -> None:
+        _ = backlog.apply(event_name, event_data)
+
+    receiver = WebhookReceiver(SECRET, on_event, 0, host="127.0.0.1")
+    await receiver.start()
+
+    try:
+        body = json.dumps(
+            {"event_name": "item:added", "event_data": {"id": "1"}}
+        ).encode()
+        status = await send_body(receiver.port, SECRET, body)
+    finally:
+        await receiver.close()
+
+    assert status == 400
+    assert backlog.tasks == {}
+
+
+@pytest.mark.asyncio
+async def test_receiver_turns_away_oversized_bodies() -> None:
+    """when a webhook announces a body over the size limit, it answers 413 without reading it"""
+
+    receiver = WebhookReceiver(SECRET, lambda *_: None, 0, host="127.0.0.1")
+    await receiver.start()
+
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", receiver.port)
+        writer.write(
+            f"POST /webhook HTTP/1.1\r\nContent-Length: {MAX_BODY_BYTES + 1}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        await receiver.close()
+
+    assert response.split()[1] == b"413"
+
+
+def test_backlog_follows_task_events() -> None:
+    """when tasks are completed or stale updates arrive, the backlog keeps only current active tasks"""
+
+    backlog = TaskBacklog(FakeTodoistAPI("VALID_TOKEN"))
+    kept, done = build_task(), build_task()
+    assert backlog.apply("item:added", kept.to_dict())
+    assert backlog.apply("item:added", done.to_dict())
+
+    stale = build_task(
+        {"id": kept.id, "updated_at": kept.updated_at.replace(year=2000)}
+    )
+
+    assert backlog.apply("item:completed", done.to_dict())
+    assert not backlog.apply("item:updated", stale.to_dict())
+    assert not backlog.apply("note:added", {})
+    assert list(backlog.tasks) == [kept.id]
+
+
+@pytest.mark.asyncio
+async def test_bursts_of_events_are_planned_once() -> None:
+    """when several events arrive close together, they are coalesced into a single run"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    backlog = TaskBacklog(fake_api)
+    runs: list[int] = []
+
+    async def job() -> None:
+        runs.append(len(backlog.tasks))
+
+    receiver, debouncer = await run_webhooks(backlog, job, SECRET, 0, debounce=0.05)
+    try:
+        await asyncio.sleep(0.1)
+        # Sent together, as a one-by-one burst can outlast the debounce on a
+        # busy machine
+        _ = await asyncio.gather(
+            *(
+                send_event(receiver.port, SECRET, "item:added", build_task())
+                for _ in range(5)
+            )
+        )
+        await asyncio.sleep(0.2)
+    finally:
+        await receiver.close()
+
+    assert debouncer.idle()
+    assert runs == [0, 5]
+
+
+@pytest.mark.asyncio
+async def test_events_are_planned_without_fetching() -> None:
+    """when a task is added, it is planned from the backlog without querying the API again"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    backlog = TaskBacklog(fake_api)
+    job = make_job(
+        api=backlog,
+        max_weight=10,
+        filter="all",
+        rules=None,
+        dry_run=False,
+        time_zone="Etc/UTC",
+        curr_date=date(2025, 1, 5),
+    )
+
+    receiver, _ = await run_webhooks(backlog, job, SECRET, 0, debounce=0.05)
+    task = build_task()
+    try:
+        await asyncio.sleep(0.1)
+        _ = await send_event(receiver.port, SECRET, "item:added", task)
+        await asyncio.sleep(0.2)
+    finally:
+        await receiver.close()
+
+    assert fake_api.get_tasks.await_count == 1
+    assert fake_api.filter_tasks.await_count == 0
+    assert [call.args[0] for call in fake_api.update_task.call_args_list] == [task.id]
+
+
+@pytest.mark.asyncio
+async def test_default_filter_is_queried_from_the_server(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """when the filter refers to the current user, event-driven runs query the server for it and a warning says so at startup"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    task = build_task()
+    fake_api.setup_tasks([task])
+    backlog = TaskBacklog(fake_api)
+    job = make_job(
+        api=backlog,
+        max_weight=10,
+        filter=DEFAULT_FILTER,
+        rules=None,
+        dry_run=False,
+        time_zone="Etc/UTC",
+        curr_date=date(2025, 1, 5),
+    )
+
+    receiver, _ = await run_webhooks(
+        backlog, job, SECRET, 0, debounce=0.05, filters=[DEFAULT_FILTER]
+    )
+    try:
+        await asyncio.sleep(0.2)
+    finally:
+        await receiver.close()
+
+    assert f"'{DEFAULT_FILTER}' can't be evaluated locally" in caplog.text
+    assert [call.kwargs["query"] for call in fake_api.filter_tasks.call_args_list] == [
+        DEFAULT_FILTER
+    ]
+
+
+@pytest.mark.asyncio
+async def test_scheduled_and_event_driven_runs_take_turns() -> None:
+    """when running on a schedule and from webhooks, a run never starts while the other is going"""
+
+    fake_api = FakeTodoistAPI("VALID_TOKEN")
+    backlog = TaskBacklog(fake_api)
+    lock = asyncio.Lock()
+    runs: list[int] = []
+
+    async def job() -> None:
+        runs.append(len(backlog.tasks))
+
+    receiver, _ = await run_webhooks(backlog, job, SECRET, 0, debounce=0.05, lock=lock)
+    scheduler = await run_schedule(
+        api=fake_api,
+        max_weight=10,
+        filter="all",
+        rules=None,
+        dry_run=False,
+        time_zone="Etc/UTC",
+        schedule="@daily",
+        backlog=backlog,
+        lock=lock,
+    )
+    try:
+        await asyncio.sleep(0.1)
+        async with lock:
+            scheduled = asyncio.ensure_future(
+                scheduler.get_jobs()[0].func()  # pyright: ignore[reportUnknownMemberType, reportAttributeAccessIssue]
+            )
+            task = build_task()
+            fake_api.setup_tasks([task])
+            _ = await send_event(receiver.port, SECRET, "item:added", task)
+            await asyncio.sleep(0.2)
+
+            # Neither the backlog reload nor the event-driven run got going
+            assert not scheduled.done()
+            assert fake_api.get_tasks.await_count == 1
+            assert runs == [0]
+
+        await scheduled
+        await asyncio.sleep(0.1)
+    finally:
+        scheduler.shutdown()
+        await receiver.close()
+
+    assert fake_api.get_tasks.await_count == 2
+    assert runs == [0, 1]